@@ -5,11 +5,81 @@ d = { 'settings': { 'branch': 'main',
                 'doc_host': 'https://broadwell.github.io',
                 'git_url': 'https://github.com/broadwell/choreo_k',
                 'lib_path': 'choreo_k'},
-  'syms': { 'choreo_k.analyze': { 'choreo_k.analyze.average_frame_movements': ( 'analyze.html#average_frame_movements',
+  'syms': { 'choreo_k.align': { 'choreo_k.align.LivePoseScorer': ('align.html#liveposescorer', 'choreo_k/align.py'),
+                                'choreo_k.align.LivePoseScorer.__init__': ('align.html#liveposescorer.__init__', 'choreo_k/align.py'),
+                                'choreo_k.align.LivePoseScorer.correlations': ( 'align.html#liveposescorer.correlations',
+                                                                                'choreo_k/align.py'),
+                                'choreo_k.align.LivePoseScorer.from_sequence': ( 'align.html#liveposescorer.from_sequence',
+                                                                                 'choreo_k/align.py'),
+                                'choreo_k.align.LivePoseScorer.reset': ('align.html#liveposescorer.reset', 'choreo_k/align.py'),
+                                'choreo_k.align.LivePoseScorer.score': ('align.html#liveposescorer.score', 'choreo_k/align.py'),
+                                'choreo_k.align.align_sequences': ('align.html#align_sequences', 'choreo_k/align.py'),
+                                'choreo_k.align.band_mask': ('align.html#band_mask', 'choreo_k/align.py'),
+                                'choreo_k.align.diagonal_cells': ('align.html#diagonal_cells', 'choreo_k/align.py'),
+                                'choreo_k.align.dtw': ('align.html#dtw', 'choreo_k/align.py'),
+                                'choreo_k.align.pose_cost_matrix': ('align.html#pose_cost_matrix', 'choreo_k/align.py'),
+                                'choreo_k.align.sequence_features': ('align.html#sequence_features', 'choreo_k/align.py'),
+                                'choreo_k.align.smith_waterman': ('align.html#smith_waterman', 'choreo_k/align.py')},
+            'choreo_k.analyze': { 'choreo_k.analyze.IncrementalMovementSeries': ( 'analyze.html#incrementalmovementseries',
+                                                                                  'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalMovementSeries.__init__': ( 'analyze.html#incrementalmovementseries.__init__',
+                                                                                           'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalMovementSeries.movements': ( 'analyze.html#incrementalmovementseries.movements',
+                                                                                            'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalMovementSeries.results': ( 'analyze.html#incrementalmovementseries.results',
+                                                                                          'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalMovementSeries.update': ( 'analyze.html#incrementalmovementseries.update',
+                                                                                         'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalPoseClusters': ( 'analyze.html#incrementalposeclusters',
+                                                                                'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalPoseClusters.__init__': ( 'analyze.html#incrementalposeclusters.__init__',
+                                                                                         'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalPoseClusters.descriptors': ( 'analyze.html#incrementalposeclusters.descriptors',
+                                                                                            'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalPoseClusters.from_clusters': ( 'analyze.html#incrementalposeclusters.from_clusters',
+                                                                                              'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalPoseClusters.labels': ( 'analyze.html#incrementalposeclusters.labels',
+                                                                                       'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalPoseClusters.timeline': ( 'analyze.html#incrementalposeclusters.timeline',
+                                                                                         'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalPoseClusters.update': ( 'analyze.html#incrementalposeclusters.update',
+                                                                                       'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalSimilarityMatrix': ( 'analyze.html#incrementalsimilaritymatrix',
+                                                                                    'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalSimilarityMatrix.__init__': ( 'analyze.html#incrementalsimilaritymatrix.__init__',
+                                                                                             'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalSimilarityMatrix.__reserve__': ( 'analyze.html#incrementalsimilaritymatrix.__reserve__',
+                                                                                                'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalSimilarityMatrix.matrix': ( 'analyze.html#incrementalsimilaritymatrix.matrix',
+                                                                                           'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.IncrementalSimilarityMatrix.update': ( 'analyze.html#incrementalsimilaritymatrix.update',
+                                                                                           'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.StreamingNaNFiller': ('analyze.html#streamingnanfiller', 'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.StreamingNaNFiller.__init__': ( 'analyze.html#streamingnanfiller.__init__',
+                                                                                    'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.StreamingNaNFiller.flush': ( 'analyze.html#streamingnanfiller.flush',
+                                                                                 'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.StreamingNaNFiller.update': ( 'analyze.html#streamingnanfiller.update',
+                                                                                  'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.StreamingSmoother': ('analyze.html#streamingsmoother', 'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.StreamingSmoother.__init__': ( 'analyze.html#streamingsmoother.__init__',
+                                                                                   'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.StreamingSmoother.__outputs__': ( 'analyze.html#streamingsmoother.__outputs__',
+                                                                                      'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.StreamingSmoother.__sample__': ( 'analyze.html#streamingsmoother.__sample__',
+                                                                                     'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.StreamingSmoother.flush': ( 'analyze.html#streamingsmoother.flush',
                                                                                 'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.StreamingSmoother.update': ( 'analyze.html#streamingsmoother.update',
+                                                                                 'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.average_frame_movements': ( 'analyze.html#average_frame_movements',
+                                                                                'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.average_pose_matrices': ('analyze.html#average_pose_matrices', 'choreo_k/analyze.py'),
                                   'choreo_k.analyze.average_poses': ('analyze.html#average_poses', 'choreo_k/analyze.py'),
                                   'choreo_k.analyze.cluster_poses': ('analyze.html#cluster_poses', 'choreo_k/analyze.py'),
                                   'choreo_k.analyze.compare_multiple': ('analyze.html#compare_multiple', 'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.compare_multiple_laplacians': ( 'analyze.html#compare_multiple_laplacians',
+                                                                                    'choreo_k/analyze.py'),
                                   'choreo_k.analyze.compare_sequences_pairwise': ( 'analyze.html#compare_sequences_pairwise',
                                                                                    'choreo_k/analyze.py'),
                                   'choreo_k.analyze.compute_pose_distribution': ( 'analyze.html#compute_pose_distribution',
@@ -18,8 +88,10 @@ d = { 'settings': { 'branch': 'main',
                                   'choreo_k.analyze.corr_time_series_matrix': ( 'analyze.html#corr_time_series_matrix',
                                                                                 'choreo_k/analyze.py'),
                                   'choreo_k.analyze.correlate_time_series': ('analyze.html#correlate_time_series', 'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.fill_nans_linear': ('analyze.html#fill_nans_linear', 'choreo_k/analyze.py'),
                                   'choreo_k.analyze.fill_nans_scipy1': ('analyze.html#fill_nans_scipy1', 'choreo_k/analyze.py'),
                                   'choreo_k.analyze.find_nearest_pose': ('analyze.html#find_nearest_pose', 'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.find_nearest_poses': ('analyze.html#find_nearest_poses', 'choreo_k/analyze.py'),
                                   'choreo_k.analyze.get_cluster_averages_and_indices': ( 'analyze.html#get_cluster_averages_and_indices',
                                                                                          'choreo_k/analyze.py'),
                                   'choreo_k.analyze.get_feature_vectors': ('analyze.html#get_feature_vectors', 'choreo_k/analyze.py'),
@@ -27,26 +99,79 @@ d = { 'settings': { 'branch': 'main',
                                   'choreo_k.analyze.movements_time_series': ('analyze.html#movements_time_series', 'choreo_k/analyze.py'),
                                   'choreo_k.analyze.plot_interpose_similarity': ( 'analyze.html#plot_interpose_similarity',
                                                                                   'choreo_k/analyze.py'),
+                                  'choreo_k.analyze.pose_distribution_timeline': ( 'analyze.html#pose_distribution_timeline',
+                                                                                   'choreo_k/analyze.py'),
                                   'choreo_k.analyze.process_movement_series': ( 'analyze.html#process_movement_series',
                                                                                 'choreo_k/analyze.py'),
                                   'choreo_k.analyze.render_pose_distribution': ( 'analyze.html#render_pose_distribution',
                                                                                  'choreo_k/analyze.py'),
                                   'choreo_k.analyze.smooth_series': ('analyze.html#smooth_series', 'choreo_k/analyze.py')},
+            'choreo_k.benchmark': { 'choreo_k.benchmark.benchmark_function': ('benchmark.html#benchmark_function', 'choreo_k/benchmark.py'),
+                                    'choreo_k.benchmark.compare_benchmarks': ('benchmark.html#compare_benchmarks', 'choreo_k/benchmark.py'),
+                                    'choreo_k.benchmark.git_commit': ('benchmark.html#git_commit', 'choreo_k/benchmark.py'),
+                                    'choreo_k.benchmark.precision_report': ('benchmark.html#precision_report', 'choreo_k/benchmark.py'),
+                                    'choreo_k.benchmark.run_benchmarks': ('benchmark.html#run_benchmarks', 'choreo_k/benchmark.py'),
+                                    'choreo_k.benchmark.synthetic_pose_series': ( 'benchmark.html#synthetic_pose_series',
+                                                                                  'choreo_k/benchmark.py')},
+            'choreo_k.instrument': { 'choreo_k.instrument.Instruments': ('instrument.html#instruments', 'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.__init__': ( 'instrument.html#instruments.__init__',
+                                                                                   'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.count': ( 'instrument.html#instruments.count',
+                                                                                'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.disable': ( 'instrument.html#instruments.disable',
+                                                                                  'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.enable': ( 'instrument.html#instruments.enable',
+                                                                                 'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.export_chrome_trace': ( 'instrument.html#instruments.export_chrome_trace',
+                                                                                              'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.record': ( 'instrument.html#instruments.record',
+                                                                                 'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.report': ( 'instrument.html#instruments.report',
+                                                                                 'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.reset': ( 'instrument.html#instruments.reset',
+                                                                                'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.summary': ( 'instrument.html#instruments.summary',
+                                                                                  'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.timed': ( 'instrument.html#instruments.timed',
+                                                                                'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.Instruments.timer': ( 'instrument.html#instruments.timer',
+                                                                                'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.StageTimer': ('instrument.html#stagetimer', 'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.StageTimer.__enter__': ( 'instrument.html#stagetimer.__enter__',
+                                                                                   'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.StageTimer.__exit__': ( 'instrument.html#stagetimer.__exit__',
+                                                                                  'choreo_k/instrument.py'),
+                                     'choreo_k.instrument.StageTimer.__init__': ( 'instrument.html#stagetimer.__init__',
+                                                                                  'choreo_k/instrument.py')},
             'choreo_k.matrixify': { 'choreo_k.matrixify.compare_laplacians': ('matrixify.html#compare_laplacians', 'choreo_k/matrixify.py'),
                                     'choreo_k.matrixify.compare_poses_cosine': ( 'matrixify.html#compare_poses_cosine',
                                                                                  'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.compute_dtype': ('matrixify.html#compute_dtype', 'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.correlate_pose_matrices': ( 'matrixify.html#correlate_pose_matrices',
+                                                                                    'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.cosine_similarities': ( 'matrixify.html#cosine_similarities',
+                                                                                'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.feature_dtype': ('matrixify.html#feature_dtype', 'choreo_k/matrixify.py'),
                                     'choreo_k.matrixify.get_laplacian_matrix': ( 'matrixify.html#get_laplacian_matrix',
                                                                                  'choreo_k/matrixify.py'),
                                     'choreo_k.matrixify.get_normalized_coords': ( 'matrixify.html#get_normalized_coords',
                                                                                   'choreo_k/matrixify.py'),
                                     'choreo_k.matrixify.get_pose_matrix': ('matrixify.html#get_pose_matrix', 'choreo_k/matrixify.py'),
                                     'choreo_k.matrixify.matrixify_pose': ('matrixify.html#matrixify_pose', 'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.matrixify_poses': ('matrixify.html#matrixify_poses', 'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.mirror_poses': ('matrixify.html#mirror_poses', 'choreo_k/matrixify.py'),
                                     'choreo_k.matrixify.normalize_and_compare_poses_cosine': ( 'matrixify.html#normalize_and_compare_poses_cosine',
                                                                                                'choreo_k/matrixify.py'),
                                     'choreo_k.matrixify.normalize_pose': ('matrixify.html#normalize_pose', 'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.normalize_poses': ('matrixify.html#normalize_poses', 'choreo_k/matrixify.py'),
                                     'choreo_k.matrixify.normalize_symmetrify_and_compare_poses_cosine': ( 'matrixify.html#normalize_symmetrify_and_compare_poses_cosine',
                                                                                                           'choreo_k/matrixify.py'),
-                                    'choreo_k.matrixify.symmetrify_pose': ('matrixify.html#symmetrify_pose', 'choreo_k/matrixify.py')},
+                                    'choreo_k.matrixify.set_feature_dtype': ('matrixify.html#set_feature_dtype', 'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.stack_poses': ('matrixify.html#stack_poses', 'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.standardize_pose_matrices': ( 'matrixify.html#standardize_pose_matrices',
+                                                                                      'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.symmetrify_pose': ('matrixify.html#symmetrify_pose', 'choreo_k/matrixify.py'),
+                                    'choreo_k.matrixify.symmetrize_poses': ('matrixify.html#symmetrize_poses', 'choreo_k/matrixify.py')},
             'choreo_k.modify': { 'choreo_k.modify.add_flipped_zeroified_figures': ( 'modify.html#add_flipped_zeroified_figures',
                                                                                     'choreo_k/modify.py'),
                                  'choreo_k.modify.add_poseflow_figures': ('modify.html#add_poseflow_figures', 'choreo_k/modify.py'),
@@ -109,6 +234,8 @@ d = { 'settings': { 'branch': 'main',
                                                                                                          'choreo_k/movenet_detector.py'),
                                            'choreo_k.movenet_detector.Detector.__detect__': ( 'movenet_detector.html#detector.__detect__',
                                                                                               'choreo_k/movenet_detector.py'),
+                                           'choreo_k.movenet_detector.Detector.__detect_tflite__': ( 'movenet_detector.html#detector.__detect_tflite__',
+                                                                                                     'choreo_k/movenet_detector.py'),
                                            'choreo_k.movenet_detector.Detector.__determine_crop_region__': ( 'movenet_detector.html#detector.__determine_crop_region__',
                                                                                                              'choreo_k/movenet_detector.py'),
                                            'choreo_k.movenet_detector.Detector.__determine_torso_and_body_range__': ( 'movenet_detector.html#detector.__determine_torso_and_body_range__',
@@ -121,12 +248,16 @@ d = { 'settings': { 'branch': 'main',
                                                                                             'choreo_k/movenet_detector.py'),
                                            'choreo_k.movenet_detector.Detector.__init_crop_region__': ( 'movenet_detector.html#detector.__init_crop_region__',
                                                                                                         'choreo_k/movenet_detector.py'),
+                                           'choreo_k.movenet_detector.Detector.__init_tflite_model__': ( 'movenet_detector.html#detector.__init_tflite_model__',
+                                                                                                         'choreo_k/movenet_detector.py'),
                                            'choreo_k.movenet_detector.Detector.__keypoints_and_edges_for_display__': ( 'movenet_detector.html#detector.__keypoints_and_edges_for_display__',
                                                                                                                        'choreo_k/movenet_detector.py'),
                                            'choreo_k.movenet_detector.Detector.__progress__': ( 'movenet_detector.html#detector.__progress__',
                                                                                                 'choreo_k/movenet_detector.py'),
                                            'choreo_k.movenet_detector.Detector.__run_inference__': ( 'movenet_detector.html#detector.__run_inference__',
                                                                                                      'choreo_k/movenet_detector.py'),
+                                           'choreo_k.movenet_detector.Detector.__score_frame__': ( 'movenet_detector.html#detector.__score_frame__',
+                                                                                                   'choreo_k/movenet_detector.py'),
                                            'choreo_k.movenet_detector.Detector.__swap_rgb_bgr__': ( 'movenet_detector.html#detector.__swap_rgb_bgr__',
                                                                                                     'choreo_k/movenet_detector.py'),
                                            'choreo_k.movenet_detector.Detector.__torso_visible__': ( 'movenet_detector.html#detector.__torso_visible__',
@@ -153,6 +284,29 @@ d = { 'settings': { 'branch': 'main',
                                                                                                         'choreo_k/movenet_detector.py'),
                                            'choreo_k.movenet_detector.display_img_array': ( 'movenet_detector.html#display_img_array',
                                                                                             'choreo_k/movenet_detector.py')},
+            'choreo_k.paint': { 'choreo_k.paint.ImageWriter': ('paint.html#imagewriter', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ImageWriter.__enter__': ('paint.html#imagewriter.__enter__', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ImageWriter.__exit__': ('paint.html#imagewriter.__exit__', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ImageWriter.__init__': ('paint.html#imagewriter.__init__', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ImageWriter.__work__': ('paint.html#imagewriter.__work__', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ImageWriter.close': ('paint.html#imagewriter.close', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ImageWriter.filename': ('paint.html#imagewriter.filename', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ImageWriter.write': ('paint.html#imagewriter.write', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ParallelRenderer': ('paint.html#parallelrenderer', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ParallelRenderer.__dispatch__': ( 'paint.html#parallelrenderer.__dispatch__',
+                                                                                  'choreo_k/paint.py'),
+                                'choreo_k.paint.ParallelRenderer.__enter__': ('paint.html#parallelrenderer.__enter__', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ParallelRenderer.__exit__': ('paint.html#parallelrenderer.__exit__', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ParallelRenderer.__init__': ('paint.html#parallelrenderer.__init__', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ParallelRenderer.__write__': ('paint.html#parallelrenderer.__write__', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ParallelRenderer.close': ('paint.html#parallelrenderer.close', 'choreo_k/paint.py'),
+                                'choreo_k.paint.ParallelRenderer.submit': ('paint.html#parallelrenderer.submit', 'choreo_k/paint.py'),
+                                'choreo_k.paint.blank_image': ('paint.html#blank_image', 'choreo_k/paint.py'),
+                                'choreo_k.paint.canvas_array': ('paint.html#canvas_array', 'choreo_k/paint.py'),
+                                'choreo_k.paint.edge_color_groups': ('paint.html#edge_color_groups', 'choreo_k/paint.py'),
+                                'choreo_k.paint.image_encoding': ('paint.html#image_encoding', 'choreo_k/paint.py'),
+                                'choreo_k.paint.paint_poses': ('paint.html#paint_poses', 'choreo_k/paint.py'),
+                                'choreo_k.paint.render_frames': ('paint.html#render_frames', 'choreo_k/paint.py')},
             'choreo_k.pifpafpose_detector': { 'choreo_k.pifpafpose_detector.Detector': ( 'pifpafpose_detector.html#detector',
                                                                                          'choreo_k/pifpafpose_detector.py'),
                                               'choreo_k.pifpafpose_detector.Detector.__detect_pil_image__': ( 'pifpafpose_detector.html#detector.__detect_pil_image__',
@@ -163,17 +317,105 @@ d = { 'settings': { 'branch': 'main',
                                                                                                       'choreo_k/pifpafpose_detector.py'),
                                               'choreo_k.pifpafpose_detector.Detector.detect_video': ( 'pifpafpose_detector.html#detector.detect_video',
                                                                                                       'choreo_k/pifpafpose_detector.py'),
+                                              'choreo_k.pifpafpose_detector.Detector.draw_poses': ( 'pifpafpose_detector.html#detector.draw_poses',
+                                                                                                    'choreo_k/pifpafpose_detector.py'),
+                                              'choreo_k.pifpafpose_detector.Detector.export_onnx': ( 'pifpafpose_detector.html#detector.export_onnx',
+                                                                                                     'choreo_k/pifpafpose_detector.py'),
                                               'choreo_k.pifpafpose_detector.Detector.init_model': ( 'pifpafpose_detector.html#detector.init_model',
                                                                                                     'choreo_k/pifpafpose_detector.py'),
                                               'choreo_k.pifpafpose_detector.Detector.overlay_poses': ( 'pifpafpose_detector.html#detector.overlay_poses',
                                                                                                        'choreo_k/pifpafpose_detector.py'),
                                               'choreo_k.pifpafpose_detector.Detector.plot_poses': ( 'pifpafpose_detector.html#detector.plot_poses',
-                                                                                                    'choreo_k/pifpafpose_detector.py')},
-            'choreo_k.visualize': { 'choreo_k.visualize.draw_figure': ('visualize.html#draw_figure', 'choreo_k/visualize.py'),
+                                                                                                    'choreo_k/pifpafpose_detector.py'),
+                                              'choreo_k.pifpafpose_detector.OnnxModel': ( 'pifpafpose_detector.html#onnxmodel',
+                                                                                          'choreo_k/pifpafpose_detector.py'),
+                                              'choreo_k.pifpafpose_detector.OnnxModel.__call__': ( 'pifpafpose_detector.html#onnxmodel.__call__',
+                                                                                                   'choreo_k/pifpafpose_detector.py'),
+                                              'choreo_k.pifpafpose_detector.OnnxModel.__init__': ( 'pifpafpose_detector.html#onnxmodel.__init__',
+                                                                                                   'choreo_k/pifpafpose_detector.py'),
+                                              'choreo_k.pifpafpose_detector.OnnxModel.eval': ( 'pifpafpose_detector.html#onnxmodel.eval',
+                                                                                               'choreo_k/pifpafpose_detector.py'),
+                                              'choreo_k.pifpafpose_detector.OnnxModel.to': ( 'pifpafpose_detector.html#onnxmodel.to',
+                                                                                             'choreo_k/pifpafpose_detector.py')},
+            'choreo_k.pipeline': { 'choreo_k.pipeline.analyze_poses': ('pipeline.html#analyze_poses', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.find_videos': ('pipeline.html#find_videos', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.index_outputs': ('pipeline.html#index_outputs', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.is_up_to_date': ('pipeline.html#is_up_to_date', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.load_detector': ('pipeline.html#load_detector', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.main': ('pipeline.html#main', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.pipeline_config': ('pipeline.html#pipeline_config', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.pixel_coordinates': ('pipeline.html#pixel_coordinates', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.print_report': ('pipeline.html#print_report', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.process_video': ('pipeline.html#process_video', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.read_summary': ('pipeline.html#read_summary', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.run_pipeline': ('pipeline.html#run_pipeline', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.video_outputs': ('pipeline.html#video_outputs', 'choreo_k/pipeline.py'),
+                                   'choreo_k.pipeline.video_signature': ('pipeline.html#video_signature', 'choreo_k/pipeline.py')},
+            'choreo_k.progress': { 'choreo_k.progress.Progress': ('progress.html#progress', 'choreo_k/progress.py'),
+                                   'choreo_k.progress.Progress.__enter__': ('progress.html#progress.__enter__', 'choreo_k/progress.py'),
+                                   'choreo_k.progress.Progress.__exit__': ('progress.html#progress.__exit__', 'choreo_k/progress.py'),
+                                   'choreo_k.progress.Progress.__init__': ('progress.html#progress.__init__', 'choreo_k/progress.py'),
+                                   'choreo_k.progress.Progress.__report__': ('progress.html#progress.__report__', 'choreo_k/progress.py'),
+                                   'choreo_k.progress.Progress.close': ('progress.html#progress.close', 'choreo_k/progress.py'),
+                                   'choreo_k.progress.Progress.state': ('progress.html#progress.state', 'choreo_k/progress.py'),
+                                   'choreo_k.progress.Progress.update': ('progress.html#progress.update', 'choreo_k/progress.py'),
+                                   'choreo_k.progress.in_notebook': ('progress.html#in_notebook', 'choreo_k/progress.py'),
+                                   'choreo_k.progress.set_log_level': ('progress.html#set_log_level', 'choreo_k/progress.py')},
+            'choreo_k.search': { 'choreo_k.search.PoseIndex': ('search.html#poseindex', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.__add_stacked__': ( 'search.html#poseindex.__add_stacked__',
+                                                                                'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.__assign__': ('search.html#poseindex.__assign__', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.__candidates__': ('search.html#poseindex.__candidates__', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.__init__': ('search.html#poseindex.__init__', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.__len__': ('search.html#poseindex.__len__', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.__lookup__': ('search.html#poseindex.__lookup__', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.__queries__': ('search.html#poseindex.__queries__', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.__reserve__': ('search.html#poseindex.__reserve__', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.__rows__': ('search.html#poseindex.__rows__', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.add': ('search.html#poseindex.add', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.add_pose_series': ( 'search.html#poseindex.add_pose_series',
+                                                                                'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.add_store': ('search.html#poseindex.add_store', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.describe': ('search.html#poseindex.describe', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.descriptors': ('search.html#poseindex.descriptors', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.list_ids': ('search.html#poseindex.list_ids', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.save': ('search.html#poseindex.save', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.search': ('search.html#poseindex.search', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.search_sequence': ( 'search.html#poseindex.search_sequence',
+                                                                                'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.times': ('search.html#poseindex.times', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.train': ('search.html#poseindex.train', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.trained': ('search.html#poseindex.trained', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.vectors': ('search.html#poseindex.vectors', 'choreo_k/search.py'),
+                                 'choreo_k.search.PoseIndex.video_id': ('search.html#poseindex.video_id', 'choreo_k/search.py'),
+                                 'choreo_k.search.descriptor_keys': ('search.html#descriptor_keys', 'choreo_k/search.py'),
+                                 'choreo_k.search.load_index': ('search.html#load_index', 'choreo_k/search.py'),
+                                 'choreo_k.search.pose_features': ('search.html#pose_features', 'choreo_k/search.py'),
+                                 'choreo_k.search.top_matches': ('search.html#top_matches', 'choreo_k/search.py')},
+            'choreo_k.store': { 'choreo_k.store.PoseStore': ('store.html#posestore', 'choreo_k/store.py'),
+                                'choreo_k.store.PoseStore.__init__': ('store.html#posestore.__init__', 'choreo_k/store.py'),
+                                'choreo_k.store.PoseStore.__len__': ('store.html#posestore.__len__', 'choreo_k/store.py'),
+                                'choreo_k.store.PoseStore.frame_range': ('store.html#posestore.frame_range', 'choreo_k/store.py'),
+                                'choreo_k.store.PoseStore.time_range': ('store.html#posestore.time_range', 'choreo_k/store.py'),
+                                'choreo_k.store.PoseStore.to_pose_data': ('store.html#posestore.to_pose_data', 'choreo_k/store.py'),
+                                'choreo_k.store.StoredFigure': ('store.html#storedfigure', 'choreo_k/store.py'),
+                                'choreo_k.store.StoredFigure.__init__': ('store.html#storedfigure.__init__', 'choreo_k/store.py'),
+                                'choreo_k.store.figure_confidences': ('store.html#figure_confidences', 'choreo_k/store.py'),
+                                'choreo_k.store.load_poses': ('store.html#load_poses', 'choreo_k/store.py'),
+                                'choreo_k.store.save_poses': ('store.html#save_poses', 'choreo_k/store.py')},
+            'choreo_k.visualize': { 'choreo_k.visualize.contact_sheet': ('visualize.html#contact_sheet', 'choreo_k/visualize.py'),
+                                    'choreo_k.visualize.draw_figure': ('visualize.html#draw_figure', 'choreo_k/visualize.py'),
+                                    'choreo_k.visualize.draw_poses': ('visualize.html#draw_poses', 'choreo_k/visualize.py'),
                                     'choreo_k.visualize.excerpt_pose': ('visualize.html#excerpt_pose', 'choreo_k/visualize.py'),
+                                    'choreo_k.visualize.excerpt_poses': ('visualize.html#excerpt_poses', 'choreo_k/visualize.py'),
                                     'choreo_k.visualize.fig2img': ('visualize.html#fig2img', 'choreo_k/visualize.py'),
+                                    'choreo_k.visualize.get_video_stats': ('visualize.html#get_video_stats', 'choreo_k/visualize.py'),
                                     'choreo_k.visualize.overlay_poses': ('visualize.html#overlay_poses', 'choreo_k/visualize.py'),
                                     'choreo_k.visualize.overlay_video': ('visualize.html#overlay_video', 'choreo_k/visualize.py'),
                                     'choreo_k.visualize.plot_delaunay': ('visualize.html#plot_delaunay', 'choreo_k/visualize.py'),
                                     'choreo_k.visualize.plot_poses': ('visualize.html#plot_poses', 'choreo_k/visualize.py'),
-                                    'choreo_k.visualize.viz_dist_matrices': ('visualize.html#viz_dist_matrices', 'choreo_k/visualize.py')}}}
+                                    'choreo_k.visualize.pose_bbox': ('visualize.html#pose_bbox', 'choreo_k/visualize.py'),
+                                    'choreo_k.visualize.read_video_frames': ('visualize.html#read_video_frames', 'choreo_k/visualize.py'),
+                                    'choreo_k.visualize.viz_dist_matrices': ('visualize.html#viz_dist_matrices', 'choreo_k/visualize.py'),
+                                    'choreo_k.visualize.write_overlay_video': ( 'visualize.html#write_overlay_video',
+                                                                                'choreo_k/visualize.py')}}}
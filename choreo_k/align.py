@@ -0,0 +1,244 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/05_align.ipynb.
+
+# %% auto 0
+__all__ = ['ALIGNMENT_METHODS', 'sequence_features', 'pose_cost_matrix', 'band_mask', 'diagonal_cells', 'dtw', 'smith_waterman',
+           'align_sequences', 'LivePoseScorer']
+
+# %% ../nbs/05_align.ipynb 3
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from choreo_k.matrixify import matrixify_poses, stack_poses, correlate_pose_matrices
+from choreo_k.modify import TOTAL_COORDS
+
+
+def sequence_features(pose_data, figure_index=0, figure_type='figures'):
+    """ Stack the condensed distance matrices of one figure across a pose sequence
+        into a (frames, 136) feature array. Frames in which the figure is missing
+        get NaN rows, so the frame positions of the sequence are preserved.
+    """
+    poses = stack_poses(pose_data, figure_type, max_figures=figure_index+1)
+    if poses.shape[1] <= figure_index:
+        return np.full((len(pose_data), poses.shape[2]*(poses.shape[2]-1)//2), np.nan)
+    return matrixify_poses(poses[:,figure_index])
+
+
+def pose_cost_matrix(features1, features2, metric='correlation', missing_cost=1.0):
+    """ Compute the full (len(features1), len(features2)) matrix of pose
+        dissimilarities in one vectorized step. The default metric is 1 minus
+        the Pearson (Mantel) correlation of the poses' distance matrices; any
+        metric supported by scipy's cdist can be used instead. Comparisons
+        involving a missing pose (NaN features) cost missing_cost, which for the
+        correlation metric is the same as a correlation of 0.
+    """
+    features1 = np.asarray(features1, dtype=float)
+    features2 = np.asarray(features2, dtype=float)
+    if metric == 'correlation':
+        cost = 1 - correlate_pose_matrices(features1, features2)
+    else:
+        cost = cdist(features1, features2, metric=metric)
+    cost[np.isnan(cost)] = missing_cost
+    return cost
+
+
+def band_mask(rows, cols, window):
+    """ Sakoe-Chiba band: True for the cells of a (rows, cols) alignment grid
+        that are within `window` steps of the (rescaled) diagonal.
+    """
+    i = np.arange(rows)[:,np.newaxis]
+    j = np.arange(cols)[np.newaxis,:]
+    scale = (rows - 1) / max(cols - 1, 1)
+    return np.abs(i - j * scale) <= max(window, 1)
+
+
+def diagonal_cells(k, rows, cols):
+    """ Row and column indices (1-based, as in the accumulated matrices) of the
+        cells on anti-diagonal k = i + j. Every cell on an anti-diagonal only
+        depends on the two previous anti-diagonals, so each one can be filled in
+        with a single vectorized step.
+    """
+    i = np.arange(max(1, k-cols), min(rows, k-1)+1)
+    return i, k - i
+
+
+def dtw(cost, window=None, subsequence=False):
+    """ Dynamic time warping over a precomputed cost matrix (see
+        pose_cost_matrix()), with an optional Sakoe-Chiba band of `window` frames.
+        With subsequence=True, the first sequence (the rows) is aligned to the
+        best-matching stretch of the second sequence rather than to all of it.
+        Returns [path, score], where path is an (steps, 2) array of matched
+        (row, column) indices and score is the total cost along the path.
+    """
+    cost = np.asarray(cost)
+    rows, cols = cost.shape
+    if window is not None:
+        cost = np.where(band_mask(rows, cols, window), cost, np.inf)
+
+    accumulated = np.full((rows+1, cols+1), np.inf, dtype=cost.dtype)
+    accumulated[0,0] = 0
+    if subsequence:
+        accumulated[0,:] = 0
+
+    for k in range(2, rows+cols+1):
+        i, j = diagonal_cells(k, rows, cols)
+        best_previous = np.minimum(np.minimum(accumulated[i-1,j-1], accumulated[i-1,j]), accumulated[i,j-1])
+        accumulated[i,j] = cost[i-1,j-1] + best_previous
+
+    i = rows
+    j = int(np.argmin(accumulated[rows,1:])) + 1 if subsequence else cols
+    score = accumulated[i,j]
+    if not np.isfinite(score):
+        return [np.zeros((0,2), dtype=int), np.inf]
+
+    path = [(i-1, j-1)]
+    while i > 1 or (j > 1 and not subsequence):
+        steps = [(i-1, j-1), (i-1, j), (i, j-1)]
+        i, j = min(steps, key=lambda step: accumulated[step])
+        path.append((i-1, j-1))
+    return [np.array(path[::-1]), score]
+
+
+def smith_waterman(similarity, gap_penalty=0.2, match_threshold=0.8):
+    """ Smith-Waterman local alignment over a precomputed pose similarity matrix
+        (e.g., 1 - pose_cost_matrix()). Pairs of poses more similar than
+        match_threshold add to an alignment's score, less similar pairs subtract
+        from it, and skipping a pose in either sequence costs gap_penalty.
+        Returns [path, score] for the best-scoring local alignment, where path is
+        an (steps, 2) array of matched (row, column) indices.
+    """
+    match_scores = np.asarray(similarity) - match_threshold
+    rows, cols = match_scores.shape
+
+    scores = np.zeros((rows+1, cols+1), dtype=match_scores.dtype)
+    for k in range(2, rows+cols+1):
+        i, j = diagonal_cells(k, rows, cols)
+        scores[i,j] = np.maximum(np.maximum(scores[i-1,j-1] + match_scores[i-1,j-1], 0),
+                                 np.maximum(scores[i-1,j], scores[i,j-1]) - gap_penalty)
+
+    i, j = np.unravel_index(np.argmax(scores), scores.shape)
+    score = scores[i,j]
+
+    path = []
+    while i > 0 and j > 0 and scores[i,j] > 0:
+        if np.isclose(scores[i,j], scores[i-1,j-1] + match_scores[i-1,j-1]):
+            path.append((i-1, j-1))
+            i, j = i-1, j-1
+        elif np.isclose(scores[i,j], scores[i-1,j] - gap_penalty):
+            i -= 1
+        else:
+            j -= 1
+    return [np.array(path[::-1], dtype=int).reshape(-1, 2), score]
+
+
+ALIGNMENT_METHODS = ['dtw', 'subsequence', 'local']
+
+def align_sequences(seq1, seq2, method='dtw', figure_type='figures', figure_index=0, window=None, metric='correlation', gap_penalty=0.2, match_threshold=0.8):
+    """ Align two pose sequences (lists of frame pose data) by the poses of one
+        figure in each. method is one of ALIGNMENT_METHODS:
+          'dtw': global dynamic time warping (optionally banded via window)
+          'subsequence': find the best match for all of seq1 within seq2
+          'local': Smith-Waterman local alignment of the most similar stretches
+        Returns [path, score]; path holds matched (seq1 frame, seq2 frame) indices.
+        For the DTW methods, lower scores are better; for 'local', higher.
+    """
+    if method not in ALIGNMENT_METHODS:
+        raise ValueError("Alignment method must be one of " + ", ".join(ALIGNMENT_METHODS))
+
+    cost = pose_cost_matrix(sequence_features(seq1, figure_index, figure_type),
+                            sequence_features(seq2, figure_index, figure_type), metric=metric)
+    if method == 'local':
+        return smith_waterman(1 - cost, gap_penalty=gap_penalty, match_threshold=match_threshold)
+    return dtw(cost, window=window, subsequence=(method == 'subsequence'))
+
+
+class LivePoseScorer:
+    """ Scores poses one at a time as they arrive (e.g., from a webcam) against
+        precomputed reference features, for use with detect_webcam(scorer=...).
+        Give it either
+          reference_features: a (frames, 136) array from sequence_features() of a
+            reference performance, which is followed with an online form of
+            subsequence DTW: each live pose advances the alignment by one step,
+            during which the reference may pause, advance one frame or skip one
+            (so it can run at 0-2x the reference tempo);
+          cluster_averages: a {label: condensed distance matrix} dict, as from
+            get_cluster_averages_and_indices(), for a nearest-average lookup.
+        If memory is set, the alignment forgets older poses with a time constant
+        of that many frames, so it can re-synchronize if the performer jumps.
+        Each pose costs one (reference frames x 136) matrix-vector product.
+    """
+
+    def __init__(self, reference_features=None, cluster_averages=None, open_begin=True, memory=None):
+        if (reference_features is None) == (cluster_averages is None):
+            raise ValueError("Provide either reference_features or cluster_averages")
+        if cluster_averages is not None:
+            self.labels = list(cluster_averages.keys())
+            reference_features = np.array([cluster_averages[label] for label in self.labels])
+        else:
+            self.labels = None
+        # Standardize the references once, so each comparison is a single product
+        references = np.asarray(reference_features, dtype=float)
+        references = references - references.mean(axis=-1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.references = references / np.sqrt(np.square(references).sum(axis=-1, keepdims=True))
+        self.open_begin = open_begin
+        self.decay = 1.0 if memory is None else 1.0 - 1.0 / memory
+        self.reset()
+
+    @classmethod
+    def from_sequence(cls, pose_data, figure_index=0, figure_type='figures', **kwargs):
+        """ Build a scorer that follows a reference pose sequence """
+        return cls(reference_features=sequence_features(pose_data, figure_index, figure_type), **kwargs)
+
+    def reset(self):
+        """ Forget the alignment state, e.g., before a new take """
+        self.accumulated = None
+        self.weight = 0.0
+        self.total_poses = 0
+
+    def correlations(self, coords_and_confidence):
+        """ Pearson correlations of one pose with every reference """
+        pose = np.asarray(coords_and_confidence, dtype=float)
+        if pose.shape[0] != TOTAL_COORDS:
+            return None
+        features = matrixify_poses(pose)
+        features = features - features.mean()
+        norm = np.sqrt(np.square(features).sum())
+        if norm == 0 or np.isnan(norm):
+            return None
+        return np.nan_to_num(self.references @ (features / norm), nan=0)
+
+    def score(self, coords_and_confidence):
+        """ Score the next pose; returns a dict with its 'similarity' (0-1 scale
+            correlation) and either the matched 'reference_frame' plus the mean
+            'path_similarity' of the alignment so far, or the nearest 'cluster'.
+            Returns None if the pose is missing.
+        """
+        correlations = self.correlations(coords_and_confidence)
+        if correlations is None:
+            return None
+        self.total_poses += 1
+
+        if self.labels is not None:
+            best = int(np.argmax(correlations))
+            return {'cluster': self.labels[best], 'similarity': float(correlations[best])}
+
+        cost = 1 - correlations
+        if self.accumulated is None:
+            if self.open_begin:
+                self.accumulated = cost
+            else:
+                self.accumulated = np.full(cost.shape, np.inf)
+                self.accumulated[0] = cost[0]
+        else:
+            previous = self.accumulated
+            paused = previous
+            advanced = np.concatenate([[np.inf], previous[:-1]])
+            skipped = np.concatenate([[np.inf, np.inf], previous[:-2]])
+            self.accumulated = cost + self.decay * np.minimum(np.minimum(paused, advanced), skipped)
+        # Total weight of the poses on every path (all paths have the same length)
+        self.weight = 1 + self.decay * self.weight
+
+        best = int(np.argmin(self.accumulated))
+        return {'reference_frame': best,
+                'similarity': float(correlations[best]),
+                'path_similarity': float(1 - self.accumulated[best] / self.weight)}
@@ -1,11 +1,14 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/04_analyze.ipynb.
 
 # %% auto 0
-__all__ = ['CELL_HEIGHT', 'smooth_series', 'corr_time_series_matrix', 'correlate_time_series', 'fill_nans_scipy1',
-           'movements_time_series', 'process_movement_series', 'average_poses', 'get_feature_vectors', 'cluster_poses',
-           'get_cluster_averages_and_indices', 'find_nearest_pose', 'render_pose_distribution',
-           'compute_pose_distribution', 'condense_labels', 'compare_multiple', 'plot_interpose_similarity',
-           'average_frame_movements', 'member_frame_movements', 'compare_sequences_pairwise']
+__all__ = ['CLUSTER_METHODS', 'CELL_HEIGHT', 'smooth_series', 'StreamingSmoother', 'StreamingNaNFiller',
+           'corr_time_series_matrix', 'correlate_time_series', 'IncrementalSimilarityMatrix', 'fill_nans_scipy1',
+           'fill_nans_linear', 'movements_time_series', 'process_movement_series', 'IncrementalMovementSeries',
+           'average_poses', 'get_feature_vectors', 'cluster_poses', 'get_cluster_averages_and_indices',
+           'find_nearest_pose', 'find_nearest_poses', 'pose_distribution_timeline', 'render_pose_distribution',
+           'compute_pose_distribution', 'average_pose_matrices', 'IncrementalPoseClusters', 'condense_labels',
+           'compare_multiple', 'compare_multiple_laplacians', 'plot_interpose_similarity', 'average_frame_movements',
+           'member_frame_movements', 'compare_sequences_pairwise']
 
 # %% ../nbs/04_analyze.ipynb 3
 import openpifpaf
@@ -16,10 +19,15 @@ import matplotlib.pyplot as plt
 from skbio.stats.distance import mantel
 from scipy.spatial.distance import squareform
 from scipy.interpolate import interp1d
-from sklearn.cluster import OPTICS
-from Bio import pairwise2
+from sklearn.cluster import OPTICS, HDBSCAN, MiniBatchKMeans
+from sklearn.neighbors import NearestNeighbors
 
-#from choreo_k.matrixify import get_pose_matrix, get_normalized_coords, compare_poses_cosine, get_laplacian_matrix
+from choreo_k.modify import TOTAL_COORDS, count_figures_and_time, flip_detections
+from choreo_k.align import align_sequences
+from choreo_k.visualize import plot_poses, excerpt_poses, get_video_stats
+from choreo_k.instrument import timer, timed
+from choreo_k.progress import Progress, logger
+from choreo_k.matrixify import get_pose_matrix, get_laplacian_matrix, compare_laplacians, matrixify_pose, matrixify_poses, stack_poses, correlate_pose_matrices, standardize_pose_matrices, feature_dtype, compute_dtype, normalize_poses, cosine_similarities
 
 import warnings
 warnings.filterwarnings(
@@ -30,35 +38,184 @@ warnings.filterwarnings(
 def smooth_series(x, window_len=11, window='flat'):
     """ Smooth a time series via a sliding window average
         From https://scipy-cookbook.readthedocs.io/items/SignalSmooth.html
+        A 2D array is treated as a stack of series (one per row) that are all
+        smoothed at once along the last axis.
     """
-    if x.ndim != 1:
-        raise(ValueError, "smooth only accepts 1 dimension arrays.")
+    if x.ndim not in [1, 2]:
+        raise ValueError("smooth only accepts 1 or 2 dimension arrays.")
 
-    if x.size < window_len:
-        raise(ValueError, "Input vector needs to be bigger than window size.")
+    if x.shape[-1] < window_len:
+        raise ValueError("Input vector needs to be bigger than window size.")
 
     if window_len<3:
-        print("WARNING: window length too small for smoothing, returning input data")
+        logger.warning("Window length too small for smoothing, returning input data")
         return x
 
     if not window in ['flat', 'hanning', 'hamming', 'bartlett', 'blackman']:
-        raise(ValueError, "Window is one of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
+        raise ValueError("Window is one of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
 
-    s=np.r_[x[window_len-1:0:-1],x,x[-2:-window_len-1:-1]]
+    s=np.concatenate([x[...,window_len-1:0:-1],x,x[...,-2:-window_len-1:-1]], axis=-1)
     if window == 'flat': #moving average
         w=np.ones(window_len,'d')
     else:
         w=eval('np.'+window+'(window_len)')
 
-    y=np.convolve(w/w.sum(),s,mode='valid')
+    # Same as np.convolve(w/w.sum(),s,mode='valid'), but for every row at once
+    y=np.lib.stride_tricks.sliding_window_view(s, window_len, axis=-1) @ (w/w.sum())[::-1]
 
     # Move the window 1/2 width back to avoid lag
     if window_len % 2 == 0:
-        return y[int(window_len/2)-1:-(int(window_len/2))]
+        return y[...,int(window_len/2)-1:-(int(window_len/2))]
     else:
-        return y[int(window_len/2):-(int(window_len/2))]
+        return y[...,int(window_len/2):-(int(window_len/2))]
+
+
+class StreamingSmoother:
+    """ Incremental version of smooth_series() for unbounded series, e.g., live
+        movement values from a webcam. Samples (scalars, or one array per time
+        step, such as one value per figure) are fed in with update(), which
+        returns whichever smoothed samples have become available; flush() returns
+        the rest once the series ends. Because the batch smoothing window is
+        centered, each output lags its input by about half a window, but the
+        complete output is identical to smooth_series() over the whole series
+        (with time along the first axis). Only ~2 windows of samples are kept.
+    """
 
+    def __init__(self, window_len=11, window='flat'):
+        if not window in ['flat', 'hanning', 'hamming', 'bartlett', 'blackman']:
+            raise ValueError("Window is one of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
+        self.window_len = window_len
+        if window == 'flat': #moving average
+            w = np.ones(window_len,'d')
+        else:
+            w = eval('np.'+window+'(window_len)')
+        self.weights = (w/w.sum())[::-1]
+        # Offset of the batch output within the 'valid' convolution (see smooth_series)
+        if window_len % 2 == 0:
+            self.offset = int(window_len/2)-1
+        else:
+            self.offset = int(window_len/2)
+        self.head = []      # The first window_len samples, for the mirrored start
+        self.recent = []    # The most recent samples
+        self.recent_start = 0
+        self.total_samples = 0
+        self.next_output = 0
+
+    def __sample__(self, indices, total_samples):
+        # Mirror out-of-range indices around the first/last sample, as smooth_series() pads
+        indices = np.abs(indices)
+        indices = np.where(indices > total_samples-1, 2*(total_samples-1) - indices, indices)
+        return np.array([self.recent[i-self.recent_start] if i >= self.recent_start else self.head[i] for i in indices])
+
+    def __outputs__(self, last_output, total_samples):
+        outputs = []
+        for t in range(self.next_output, last_output):
+            indices = t + self.offset - (self.window_len-1) + np.arange(self.window_len)
+            outputs.append(np.tensordot(self.weights, self.__sample__(indices, total_samples), axes=1))
+        self.next_output = max(self.next_output, last_output)
+        return outputs
+
+    def update(self, samples):
+        """ Add a chunk of samples (time along the first axis); returns the
+            smoothed samples that can now be computed, as an array.
+        """
+        samples = [np.asarray(sample, dtype=float) for sample in samples]
+        if self.window_len < 3:
+            return np.array(samples)
+        for sample in samples:
+            if len(self.head) < self.window_len:
+                self.head.append(sample)
+            self.recent.append(sample)
+            self.total_samples += 1
+        # Output t needs samples up to t+offset, and the mirrored start of the
+        # series needs samples up to (window_len-1)-offset
+        if self.total_samples < self.window_len - self.offset:
+            return np.array([])
+        outputs = self.__outputs__(self.total_samples - self.offset, self.total_samples)
+        # Only keep the samples that the next outputs' windows can reach
+        keep_from = max(0, self.next_output + self.offset - self.window_len + 1)
+        self.recent = self.recent[keep_from-self.recent_start:]
+        self.recent_start = keep_from
+        return np.array(outputs)
+
+    def flush(self):
+        """ End the series, returning the remaining smoothed samples """
+        if self.window_len < 3:
+            return np.array([])
+        if self.total_samples < self.window_len:
+            raise ValueError("Input vector needs to be bigger than window size.")
+        return np.array(self.__outputs__(self.total_samples, self.total_samples))
+
+
+class StreamingNaNFiller:
+    """ Incremental version of fill_nans_linear() / fill_nans_scipy1(pkind='linear')
+        for unbounded series. Samples (scalars, or one array per time step, such
+        as one value per figure) are fed in with update(); a sample is returned
+        as soon as all of its gaps can be filled, i.e., once the next known value
+        of each figure with a gap has arrived. NaNs before a figure's first known
+        value stay NaN, and flush() returns any trailing samples with their
+        unfillable NaNs. Gaps longer than max_gap samples (by default 150, or 5
+        seconds at 30 fps) are left unfilled, and samples stop waiting for a
+        figure as soon as its gap is that long, so a figure that leaves for good
+        holds up the others for at most max_gap samples, and the memory used is
+        bounded. Otherwise the output is identical to the batch version.
+        max_gap=None fills gaps of any length, waiting as long as it takes.
+    """
 
+    def __init__(self, max_gap=150):
+        self.max_gap = max_gap
+        self.pending = []           # [index, sample] pairs waiting for gaps to close
+        self.last_values = None     # Last known value of each figure
+        self.last_indices = None    # Index of that value (-1 if none yet)
+        self.total_samples = 0
+
+    def update(self, samples):
+        """ Add a chunk of samples (time along the first axis); returns the
+            samples that are now complete, as an array.
+        """
+        outputs = []
+        for sample in samples:
+            sample = np.array(sample, dtype=float)
+            if self.last_values is None:
+                self.last_values = np.full(sample.shape, np.nan)
+                self.last_indices = np.full(sample.shape, -1)
+            index = self.total_samples
+            self.total_samples += 1
+
+            # Fill in the gaps that this sample closes (if they aren't too long)
+            known = np.isfinite(sample)
+            closing = known & (self.last_indices >= 0)
+            if self.max_gap is not None:
+                closing &= index - self.last_indices <= self.max_gap
+            for pending_index, pending_sample in self.pending:
+                # Samples before a figure's first known value stay NaN
+                gap = closing & np.isnan(pending_sample) & (pending_index > self.last_indices)
+                fraction = (pending_index - self.last_indices[gap]) / (index - self.last_indices[gap])
+                pending_sample[gap] = self.last_values[gap] + fraction * (sample[gap] - self.last_values[gap])
+            self.last_values[known] = sample[known]
+            self.last_indices[known] = index
+            self.pending.append([index, sample])
+
+            # Each figure is only waited for while its current gap could still be
+            # filled; a sample is complete when it isn't waiting for any figure
+            open_gaps = self.last_indices >= 0
+            if self.max_gap is not None:
+                open_gaps &= index - self.last_indices < self.max_gap
+            while len(self.pending) > 0:
+                pending_index, pending_sample = self.pending[0]
+                if (np.isnan(pending_sample) & open_gaps & (self.last_indices < pending_index)).any():
+                    break
+                outputs.append(self.pending.pop(0)[1])
+        return np.array(outputs)
+
+    def flush(self):
+        """ End the series, returning the remaining samples (trailing NaNs can't be filled) """
+        outputs = [pending_sample for pending_index, pending_sample in self.pending]
+        self.pending = []
+        return np.array(outputs)
+
+
+@timed('analyze.corr_time_series_matrix')
 def corr_time_series_matrix(pose_data, method='distance'):
     """ Generate a full time-series pose similarity heatmap for all available
         poses and frames from the video. This code can use either pose
@@ -66,8 +223,10 @@ def corr_time_series_matrix(pose_data, method='distance'):
         take longer to calculate but are more accurate.
     """
     pose_correlations = []
+    progress = Progress(len(pose_data), 'Comparing frames')
     for i, pi in enumerate(pose_data):
-        print("Comparing frame",i,"to the rest")
+        logger.debug("Comparing frame %d to the rest", i)
+        progress.update()
         corr_row = []
         if method == 'distance':
             mi = get_pose_matrix(pi)
@@ -86,7 +245,8 @@ def corr_time_series_matrix(pose_data, method='distance'):
                     if mj is None:
                         corr_row.append(float(0))
                     else:
-                        corr_row.append(mantel(mi, mj)[0])
+                        with timer('analyze.mantel'):
+                            corr_row.append(mantel(mi, mj)[0])
                 else: # method == 'laplacian'
                     mj = get_laplacian_matrix(pj, figure_index=0, figure_type='flipped_figures')
                     if mj is None:
@@ -94,21 +254,28 @@ def corr_time_series_matrix(pose_data, method='distance'):
                     else:
                         corr_row.append(1 - abs(np.subtract(mi.todense(), mj.todense()).sum()))
         pose_correlations.append(corr_row)
+    progress.close()
 
     return pose_correlations
 
 
+@timed('analyze.correlate_time_series')
 def correlate_time_series(pose_data1, pose_data2, method='correlate', figure_type='figures'):
     if pose_data2 is None:
         pose_data2 = pose_data1
+    if method == 'distance':
+        # Cosine similarities of all of the normalized poses, as one matrix product
+        normalized1 = normalize_poses(stack_poses(pose_data1, figure_type, max_figures=1)[:,0])
+        normalized2 = normalized1 if pose_data2 is pose_data1 else normalize_poses(stack_poses(pose_data2, figure_type, max_figures=1)[:,0])
+        return np.nan_to_num(cosine_similarities(normalized1, normalized2), nan=0).tolist()
     pose_correlations = []
+    progress = Progress(len(pose_data1), 'Comparing frames')
     for i, pi in enumerate(pose_data1):
-        print("Comparing frame",i,"to the rest")
+        logger.debug("Comparing frame %d to the rest", i)
+        progress.update()
         corr_row = []
         if method == 'correlate': # Distance matrix correlation
             mi = get_pose_matrix(pi, figure_type=figure_type)
-        elif method == 'distance': # Cosine similarity of normalized keypoints
-            mi = get_normalized_coords(pi, figure_type=figure_type)
         else:
             mi = get_laplacian_matrix(pi, figure_type=figure_type)
         for j, pj in enumerate(pose_data2):
@@ -119,13 +286,8 @@ def correlate_time_series(pose_data1, pose_data2, method='correlate', figure_typ
                 if mj is None:
                     corr_row.append(float(0))
                 else:
-                    corr_row.append(mantel(mi, mj)[0])
-            elif method == 'distance':
-                mj = get_normalized_coords(pj, figure_type=figure_type)
-                if mj is None:
-                    corr_row.append(float(0))
-                else:
-                    corr_row.append(compare_poses_cosine(mi, mj))
+                    with timer('analyze.mantel'):
+                        corr_row.append(mantel(mi, mj)[0])
             else:
                 mj = get_laplacian_matrix(pj, figure_index=0, figure_type=figure_type)
                 if mj is None:
@@ -133,10 +295,66 @@ def correlate_time_series(pose_data1, pose_data2, method='correlate', figure_typ
                 else:
                     corr_row.append(1 - abs(np.subtract(mi.todense(), mj.todense()).sum()))
         pose_correlations.append(corr_row)
+    progress.close()
         
     return pose_correlations
 
 
+class IncrementalSimilarityMatrix:
+    """ Incremental version of corr_time_series_matrix() (distance matrix method)
+        for a growing pose series, e.g., from a live capture or a resumed
+        detection. update() takes the new frames and fills in only the new rows
+        and columns of the similarity matrix, as one (new frames x all frames)
+        matrix product, so it costs O(new frames x history) instead of
+        recomputing every pair. The standardized pose matrices of the earlier
+        frames are kept for this. As in the batch version, frames without the
+        figure have 0 similarity to every other frame and 1 to themselves.
+        The matrix has the given dtype (see matrixify.FEATURE_DTYPE).
+    """
+
+    def __init__(self, figure_index=0, figure_type='flipped_figures', dtype=None):
+        self.figure_index = figure_index
+        self.figure_type = figure_type
+        self.dtype = feature_dtype(dtype)
+        self.total_frames = 0
+        self.features = np.zeros((0, TOTAL_COORDS*(TOTAL_COORDS-1)//2), dtype=compute_dtype(dtype))
+        self.similarities = np.zeros((0, 0), dtype=self.dtype)
+
+    def __reserve__(self, total_frames):
+        # Grow the buffers to (at least) double size, so appending is amortized O(1) per cell
+        if total_frames <= len(self.features):
+            return
+        capacity = max(total_frames, 2 * len(self.features), 256)
+        features = np.zeros((capacity, self.features.shape[1]), dtype=self.features.dtype)
+        features[:self.total_frames] = self.features[:self.total_frames]
+        similarities = np.zeros((capacity, capacity), dtype=self.dtype)
+        similarities[:self.total_frames,:self.total_frames] = self.similarities[:self.total_frames,:self.total_frames]
+        self.features, self.similarities = features, similarities
+
+    @property
+    def matrix(self):
+        """ The (frames, frames) similarity matrix so far, as a view """
+        return self.similarities[:self.total_frames,:self.total_frames]
+
+    def update(self, new_frames):
+        """ Add frames to the series; returns the matrix's new rows, as a
+            (new frames, all frames) view
+        """
+        start, stop = self.total_frames, self.total_frames + len(new_frames)
+        self.__reserve__(stop)
+        poses = stack_poses(new_frames, self.figure_type, max_figures=self.figure_index+1)[:,self.figure_index]
+        self.features[start:stop] = np.nan_to_num(standardize_pose_matrices(matrixify_poses(poses, dtype=self.features.dtype), self.features.dtype))
+        self.total_frames = stop
+
+        # Missing poses have all-zero features, so their correlations are 0
+        with timer('analyze.incremental_similarities'):
+            new_rows = self.features[start:stop] @ self.features[:stop].T
+        new_rows[np.arange(stop-start), np.arange(start, stop)] = 1
+        self.similarities[start:stop,:stop] = new_rows
+        self.similarities[:stop,start:stop] = new_rows.T
+        return self.similarities[start:stop,:stop]
+
+
 def fill_nans_scipy1(padata, pkind='linear'):
     """ Fill in missing values from a time series, after the first non-NAN value
         and up to the last non-NAN value. Note that scipy.interpolated.interp1d
@@ -162,22 +380,50 @@ def fill_nans_scipy1(padata, pkind='linear'):
     return interpolated
 
 
-def movements_time_series(pose_data, pose_index=-1, method='distance', figure_type='flipped_figures', video_file=None):
+def fill_nans_linear(series):
+    """ Vectorized equivalent of fill_nans_scipy1(pkind='linear') for a stack of
+        series (one per row): gaps between known values are filled by linear
+        interpolation, while values before the first and after the last known
+        value of each row are left as NaNs.
+    """
+    series = np.atleast_2d(np.asarray(series, dtype=float))
+    total_points = series.shape[-1]
+    indexes = np.arange(total_points)
+    known = np.isfinite(series)
+
+    # Positions of the closest known values at or before/after each point
+    prev_indexes = np.maximum.accumulate(np.where(known, indexes, -1), axis=-1)
+    next_indexes = np.minimum.accumulate(np.where(known, indexes, total_points)[:,::-1], axis=-1)[:,::-1]
+    inside = (prev_indexes >= 0) & (next_indexes < total_points)
+
+    rows = np.arange(series.shape[0])[:,np.newaxis]
+    prev_values = series[rows, np.clip(prev_indexes, 0, total_points-1)]
+    next_values = series[rows, np.clip(next_indexes, 0, total_points-1)]
+    spans = next_indexes - prev_indexes
+    fractions = np.where(spans > 0, (indexes - prev_indexes) / np.maximum(spans, 1), 0)
+
+    interpolated = prev_values + fractions * (next_values - prev_values)
+    interpolated[~inside] = np.nan
+    return interpolated
+
+
+@timed('analyze.movements_time_series')
+def movements_time_series(pose_data, pose_index=-1, method='distance', figure_type='flipped_figures', video_file=None, threshold=.7, chunk_size=1000):
     """ Calculate a time series of the differences between each pair of poses in a
         sequence. This works with a single figure (pose_index=0) or all the figures
         in the video (pose_index=-1). It can be run on its own, but typically this is
         a helper function for process_movement_series() (below).
+        The movements are returned as a (frames-1, figures, TOTAL_COORDS) array, in
+        which movements[f-1] holds the per-keypoint movement of each figure from
+        frame f-1 to frame f (or a single value per figure, for method='laplacian').
+        Movements are NaN where a figure is missing from either frame or its mean
+        keypoint confidence is not above the threshold in both frames.
     """
     
-    per_frame_movements = []
-    frame_timecodes = []
-
-    pose_indices = []
+    frame_timecodes = [frame['time'] for frame in pose_data]
 
     max_figures, total_time, total_figures = count_figures_and_time(pose_data, figure_type)
 
-    threshold = .7
-
     #print("FIGURES PER FRAME IN TIME SERIES:",max_figures)
 
     # Typically the pose index is only specified if you know there's only one dancer
@@ -185,41 +431,34 @@ def movements_time_series(pose_data, pose_index=-1, method='distance', figure_ty
     if pose_index != -1:
         max_figures = 1
 
-    for f, frame in enumerate(pose_data):
-        frame_movements = []
-        frame_timecodes.append(frame['time'])
-        if f < len(pose_data)-1:
-            for p in range(max_figures):
-                this_motion = np.nan
-                movers = np.array([])
-                # figure p must be available for both f and f-1
-                # NOTE check p < len(pose_data[f][figure_type]) in case the data for that frame has been
-                # truncated to [] (for example if extraneous data from the end of the video has been removed)
-                if p < len(pose_data[f-1][figure_type]) and p < len(pose_data[f][figure_type]) and pose_data[f-1][figure_type][p].data.shape[0] != 0 and pose_data[f][figure_type][p].data.shape[0] != 0:
-                    p1_conf = sum([c[2] for c in pose_data[f-1][figure_type][p].data]) / float(len(pose_data[f-1][figure_type][p].data))
-                    p2_conf = sum([c[2] for c in pose_data[f][figure_type][p].data]) / float(len(pose_data[f][figure_type][p].data))
-                    # XXX USE A BETTER CRITERION FOR SKIPPING POSES IF CONFIDENCE IS LOW
-                    if p1_conf > threshold and p2_conf > threshold:
-                        if method == 'distance':
-                            plot_type = 'distance'
-                            dmatrix1 = squareform(get_pose_matrix(pose_data[f-1], p, figure_type))
-                            dmatrix2 = squareform(get_pose_matrix(pose_data[f], p, figure_type))
-                            diffmatrix = np.absolute(dmatrix1 - dmatrix2)
-                            movers = diffmatrix.sum(axis=1)
-                            this_motion = movers.sum(axis=0) # For debugging
-                        else:
-                            plot_type = 'delaunay'
-                            # Per-keypoint movements are not useful for Laplacian comparisons
-                            similarity = compare_laplacians(pose_data[f-1], pose_data[f], p, figure_type)
-                            # Can we get meaningful movement values if laplacians are of different sizes?
-                            if similarity is not None:
-                                movers = np.array([1 - similarity])
-                
-                frame_movements.append(movers)    
-        
-        per_frame_movements.append(frame_movements)
+    poses = stack_poses(pose_data, figure_type, max_figures)
+
+    # XXX USE A BETTER CRITERION FOR SKIPPING POSES IF CONFIDENCE IS LOW
+    # (missing figures have NaN confidences, which never pass the threshold)
+    confident = poses[...,2].mean(axis=-1) > threshold
+    usable = confident[:-1] & confident[1:]
+
+    total_steps = max(len(pose_data)-1, 0)
 
-    return [per_frame_movements, frame_timecodes, max_figures]
+    if method == 'distance':
+        movements = np.full((total_steps, max_figures, TOTAL_COORDS), np.nan)
+        # Each frame's distance matrices are computed once and then differenced with
+        # the next frame's; chunking keeps the (frames, figures, 17, 17) tensor bounded
+        for start in range(0, total_steps, chunk_size):
+            dmatrices = matrixify_poses(poses[start:start+chunk_size+1], square=True)
+            movements[start:start+chunk_size] = np.absolute(np.diff(dmatrices, axis=0)).sum(axis=-1)
+    else:
+        # Per-keypoint movements are not useful for Laplacian comparisons
+        movements = np.full((total_steps, max_figures, 1), np.nan)
+        for f, p in zip(*np.nonzero(usable)):
+            similarity = compare_laplacians(pose_data[f], pose_data[f+1], p, figure_type)
+            # Can we get meaningful movement values if laplacians are of different sizes?
+            if similarity is not None:
+                movements[f,p,0] = 1 - similarity
+
+    movements[~usable] = np.nan
+
+    return [movements, frame_timecodes, max_figures]
 
 
 def process_movement_series(pose_data, pose_index=-1, figure_type='flipped_figures', video_file=None, method='distance', interpolate=True, viz=True):
@@ -229,65 +468,44 @@ def process_movement_series(pose_data, pose_index=-1, figure_type='flipped_figur
         method is used.
     """
     
-    print("GETTING MOVEMENT TIME SERIES")
-    per_frame_results, frame_timecodes, max_figures = movements_time_series(pose_data, pose_index, method, figure_type, video_file)
+    logger.info("Getting movement time series")
+    movements, frame_times, max_figures = movements_time_series(pose_data, pose_index, method, figure_type, video_file)
 
-    print("CALCULATING CHARACTERISTICS OF TIME SERIES")
+    logger.info("Calculating characteristics of time series")
 
     window_length = 5
     if video_file is not None:
         fps, total_frames = get_video_stats(video_file)
         window_length = max(window_length, int(round(fps/2.0)))
 
-    movers = [] # To get the aggregate avg movement of each keypoint (not for Laplacian)
-    movement_series = []
-    frame_times = []
-
-    smoothed_movement_series = []
-
-    for j in range(max_figures):
-        movement_series.append([])  
-        smoothed_movement_series.append([])
+    # One row per figure, one column per frame; there is no movement into the first frame
+    movement_series = np.full((max_figures, len(frame_times)), np.nan)
+    per_frame_movements = np.zeros((len(frame_times), movements.shape[-1]))
 
-    per_frame_movements = []
-    
-    for f, frame in enumerate(per_frame_results):
-        frame_movements = np.zeros(TOTAL_COORDS)
-        frame_times.append(frame_timecodes[f])
-        for j in range(max_figures):
-            if j >= len(frame) or frame[j].shape[0] == 0:
-                #print("POSE",j,"HAS NO MOVEMENT DATA")
-                movement_series[j].append(np.nan)
-            elif method == 'distance':
-                frame_movements = np.add(frame_movements, frame[j])
-                movement_series[j].append(sum(frame[j]))
-                movers.append(np.array(frame[j]))
-            else: # method == 'laplacian'
-                movement_series[j].append(frame[j][0])
-            movers.append(frame[j])
-        per_frame_movements.append(frame_movements)
-
-    figure_time_series = np.array(movers)
+    if method == 'distance':
+        movement_series[:,1:] = movements.sum(axis=-1).T
+        # Aggregate movement of each keypoint across all figures in each frame
+        per_frame_movements[1:] = np.nansum(movements, axis=1)
+    else: # method == 'laplacian'
+        movement_series[:,1:] = movements[...,0].T
 
     # Not sure if there's a meaningful way to aggregate the per-keypoint data
     # for the graph Laplacian approach (e.g., to be able to quantify how much
     # each keypoint moved during the video).
     if method == 'distance':
+        figure_time_series = movements.reshape(-1, movements.shape[-1])
         movement_means = np.nanmean(figure_time_series, axis=0)
         movement_stdevs = np.nanstd(figure_time_series, axis=0)
 
     # Window length is half of fps (or ~5, whichever is larger)
-    for j in range(max_figures):
-        if interpolate:
-            if np.isnan(np.nanmax(movement_series[j])):
-                #print("Movement series is all nans, skipping")
-                continue
-            smoothed_movement_series[j] = smooth_series(fill_nans_scipy1(np.asarray(movement_series[j]), pkind='linear'),window_length).tolist()
-        else:
-            smoothed_movement_series[j] = smooth_series(np.array(movement_series[j]),window_length).tolist()
+    # Figures that never move are left as all-NaN rows
+    if interpolate:
+        smoothed_movement_series = smooth_series(fill_nans_linear(movement_series), window_length).tolist()
+    else:
+        smoothed_movement_series = smooth_series(movement_series, window_length).tolist()
 
     if viz:
-        print("VISUALIZING TIME SERIES CHARACTERISTICS")
+        logger.info("Visualizing time series characteristics")
     
         if method == 'distance':
             plt.figure()
@@ -309,13 +527,114 @@ def process_movement_series(pose_data, pose_index=-1, figure_type='flipped_figur
         return [smoothed_movement_series, frame_times]
     
 
+class IncrementalMovementSeries:
+    """ Incremental version of process_movement_series() (without the plots) for a
+        growing pose series. update() computes the movements into each new frame
+        from the frame before it, keeping running per-keypoint sums for the
+        means and standard deviations, so it only costs O(new frames); results()
+        then smooths the whole (figures, frames) series, which is linear in its
+        length, and returns the same values as process_movement_series(). New
+        figures can appear in later frames; earlier frames have NaN movements for
+        them. window_length is the smoothing window, or half of fps if that is
+        larger.
+    """
+
+    def __init__(self, pose_index=-1, method='distance', figure_type='flipped_figures', threshold=.7, interpolate=True, fps=None, window_length=5):
+        self.pose_index = pose_index
+        self.method = method
+        self.figure_type = figure_type
+        self.threshold = threshold
+        self.interpolate = interpolate
+        self.window_length = window_length if fps is None else max(window_length, int(round(fps/2.0)))
+        self.max_figures = 1 if pose_index != -1 else 0
+        self.frame_times = []
+        self.movement_chunks = []  # (steps, figures, coords) arrays; earlier ones may have fewer figures
+        self.last_frame = None
+        coords = TOTAL_COORDS if method == 'distance' else 1
+        self.sums = np.zeros(coords)
+        self.squared_sums = np.zeros(coords)
+        self.counts = np.zeros(coords)
+
+    def update(self, new_frames):
+        """ Add frames to the series; returns the movements into the new frames
+            from the frames before them, shaped (new frames, figures, coords) as
+            in movements_time_series() (the very first frame's row is NaN)
+        """
+        if self.pose_index == -1:
+            self.max_figures = max([self.max_figures] + [len(frame.get(self.figure_type, [])) for frame in new_frames])
+
+        # The last frame seen so far is restacked, in case new figures have appeared
+        frames = ([] if self.last_frame is None else [self.last_frame]) + list(new_frames)
+        poses = stack_poses(frames, self.figure_type, self.max_figures)
+        confident = poses[...,2].mean(axis=-1) > self.threshold
+        usable = confident[:-1] & confident[1:]
+
+        if self.method == 'distance':
+            movements = np.absolute(np.diff(matrixify_poses(poses, square=True), axis=0)).sum(axis=-1)
+        else: # method == 'laplacian'
+            movements = np.full((max(len(frames)-1, 0), self.max_figures, 1), np.nan)
+            for f, p in zip(*np.nonzero(usable)):
+                similarity = compare_laplacians(frames[f], frames[f+1], p, self.figure_type)
+                if similarity is not None:
+                    movements[f,p,0] = 1 - similarity
+        movements[~usable] = np.nan
+
+        self.movement_chunks.append(movements)
+        flattened = movements.reshape(-1, len(self.sums))
+        self.sums += np.nansum(flattened, axis=0)
+        self.squared_sums += np.nansum(np.square(flattened), axis=0)
+        self.counts += np.isfinite(flattened).sum(axis=0)
+
+        if self.last_frame is None and len(frames) > 0:
+            movements = np.concatenate([np.full((1,) + movements.shape[1:], np.nan), movements])
+        self.frame_times.extend(frame['time'] for frame in new_frames)
+        if len(new_frames) > 0:
+            self.last_frame = new_frames[-1]
+        return movements
+
+    def movements(self):
+        """ All of the movements so far, as a (frames-1, figures, coords) array """
+        coords = len(self.sums)
+        padded = np.full((sum(len(chunk) for chunk in self.movement_chunks), self.max_figures, coords), np.nan)
+        step = 0
+        for chunk in self.movement_chunks:
+            padded[step:step+len(chunk),:chunk.shape[1]] = chunk
+            step += len(chunk)
+        return padded
+
+    def results(self):
+        """ The same list as process_movement_series(..., viz=False) would return
+            for all of the frames so far
+        """
+        movements = self.movements()
+        movement_series = np.full((self.max_figures, len(self.frame_times)), np.nan)
+        per_frame_movements = np.zeros((len(self.frame_times), movements.shape[-1]))
+        if self.method == 'distance':
+            movement_series[:,1:] = movements.sum(axis=-1).T
+            per_frame_movements[1:] = np.nansum(movements, axis=1)
+        else:
+            movement_series[:,1:] = movements[...,0].T
+
+        if self.interpolate:
+            smoothed_movement_series = smooth_series(fill_nans_linear(movement_series), self.window_length).tolist()
+        else:
+            smoothed_movement_series = smooth_series(movement_series, self.window_length).tolist()
+
+        if self.method != 'distance':
+            return [smoothed_movement_series, list(self.frame_times)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            movement_means = self.sums / self.counts
+            movement_stdevs = np.sqrt(np.maximum(self.squared_sums / self.counts - np.square(movement_means), 0))
+        return [smoothed_movement_series, list(self.frame_times), per_frame_movements, movement_means, movement_stdevs]
+
+
 def average_poses(pose_series, descriptors, source_figures='zeroified_figures', flip=True):
     # Descriptors are [[frame_index, pose_index] ...]
     # XXX Add an option to average all frames/poses across a range, or an entire video?
     all_poses = []
     for descriptor in descriptors:
         all_poses.append(pose_series[descriptor[0]][source_figures][descriptor[1]].data)
-    print(len(all_poses))
+    logger.debug("Averaging %d poses", len(all_poses))
     poses_array = np.array(all_poses)
     avg_array = np.sum(poses_array, axis=0)/len(poses_array)
     this_annotation = openpifpaf.Annotation(keypoints=COCO_KEYPOINTS, skeleton=COCO_PERSON_SKELETON).set(avg_array, fixed_score=None)
@@ -326,34 +645,84 @@ def average_poses(pose_series, descriptors, source_figures='zeroified_figures',
         this_annotation = flip_detections([this_annotation])[0]
     return this_annotation
 
-def get_feature_vectors(pose_series, figure_type='aligned_figures', method='distance'):
-    # Convert matrices into feature vectors to send to the clustering algorithm
-    features = []
-    descriptors = []
-    for f, frame_info in enumerate(pose_series):
-        for p, pose_info in enumerate(frame_info[figure_type]):
-            if method == 'distance':
-                pose_matrix = get_pose_matrix(frame_info, p)
-            else: # method == 'laplacian'
-                pose_matrix = get_laplacian_matrix(frame_info, p)
-            if pose_matrix is not None:
-                features.append(pose_matrix)
-                descriptors.append([f,p])
+@timed('analyze.get_feature_vectors')
+def get_feature_vectors(pose_series, figure_type='aligned_figures', method='distance', chunk_size=1000, dtype=None):
+    """ Convert poses into feature vectors to send to the clustering algorithm.
+        With method='distance' the condensed distance matrices of all of the poses
+        are computed in batches of chunk_size frames and returned as a single
+        (poses, 136) array of the given dtype (see matrixify.FEATURE_DTYPE);
+        descriptors are [[frame_index, pose_index] ...].
+    """
+    if method != 'distance': # method == 'laplacian'
+        features = []
+        descriptors = []
+        for f, frame_info in enumerate(pose_series):
+            for p, pose_info in enumerate(frame_info[figure_type]):
+                pose_matrix = get_laplacian_matrix(frame_info, figure_index=p, figure_type=figure_type)
+                if pose_matrix is not None:
+                    features.append(pose_matrix)
+                    descriptors.append([f,p])
+        return([features, descriptors])
+
+    poses = stack_poses(pose_series, figure_type)
+    present = ~np.isnan(poses[...,:2]).any(axis=(-2,-1))
+    features = np.concatenate([matrixify_poses(poses[start:start+chunk_size][present[start:start+chunk_size]], dtype=dtype)
+                               for start in range(0, max(len(pose_series),1), chunk_size)])
+    descriptors = np.argwhere(present).tolist()
     return([features, descriptors])
 
 
-def cluster_poses(poses_series, figure_type='aligned_figures', min_samples=50):
+CLUSTER_METHODS = ['optics', 'hdbscan', 'kmeans', 'sample']
+
+@timed('analyze.cluster_poses')
+def cluster_poses(poses_series, figure_type='aligned_figures', min_samples=50, method='optics', n_clusters=50, sample_size=20000, n_jobs=-1, random_state=0, dtype=None):
+    """ Cluster the poses in a series by their distance matrix feature vectors.
+        Available methods (see CLUSTER_METHODS):
+          'optics': sklearn OPTICS over all poses (the original approach; exact,
+                    but effectively quadratic, so only practical for short videos)
+          'hdbscan': HDBSCAN using a tree index, with the same min_samples
+          'kmeans': MiniBatchKMeans into n_clusters clusters (no noise label)
+          'sample': OPTICS over a random sample of sample_size poses, after which
+                    every other pose takes the label of its nearest sampled pose
+        n_jobs is passed to the neighbor searches; -1 uses all cores. The feature
+        vectors have the given dtype (see matrixify.FEATURE_DTYPE).
+        Returns [labels, descriptors], with -1 labels for noise as in OPTICS.
+    """
     # min_samples can be set according to some rule, e.g., a fraction or multiple of
     # frames per second * median number of people in a frame
-    print("Getting feature vectors")
-    [poses_features, descriptors] = get_feature_vectors(poses_series, figure_type)
-    data_array = np.array(poses_features)
-    print(data_array.shape)
-    print(len(descriptors))
-
-    print("Fitting OPTICS")
-    #labels = DBSCAN(eps=100000).fit_predict(features_array)
-    labels = OPTICS(min_samples=min_samples, metric='sqeuclidean').fit_predict(data_array)
+    if method not in CLUSTER_METHODS:
+        raise ValueError("Clustering method must be one of " + ", ".join(CLUSTER_METHODS))
+
+    logger.info("Getting feature vectors")
+    [poses_features, descriptors] = get_feature_vectors(poses_series, figure_type, dtype=compute_dtype(dtype))
+    data_array = np.asarray(poses_features)
+    logger.debug("Feature array shape %s, %d descriptors", data_array.shape, len(descriptors))
+
+    if method == 'optics':
+        logger.info("Fitting OPTICS")
+        #labels = DBSCAN(eps=100000).fit_predict(features_array)
+        labels = OPTICS(min_samples=min_samples, metric='sqeuclidean', n_jobs=n_jobs).fit_predict(data_array)
+
+    elif method == 'hdbscan':
+        logger.info("Fitting HDBSCAN")
+        # Squared euclidean distances aren't supported by the tree indexes, but
+        # euclidean distances give the same neighbor orderings
+        labels = HDBSCAN(min_samples=min_samples, min_cluster_size=min_samples, algorithm='auto', n_jobs=n_jobs).fit_predict(data_array)
+
+    elif method == 'kmeans':
+        logger.info("Fitting MiniBatchKMeans")
+        labels = MiniBatchKMeans(n_clusters=n_clusters, batch_size=4096, n_init=3, random_state=random_state).fit_predict(data_array)
+
+    else: # method == 'sample'
+        rng = np.random.default_rng(random_state)
+        sample_indices = np.sort(rng.choice(len(data_array), min(sample_size, len(data_array)), replace=False))
+        logger.info("Fitting OPTICS on %d sampled poses", len(sample_indices))
+        sample_labels = OPTICS(min_samples=min_samples, metric='sqeuclidean', n_jobs=n_jobs).fit_predict(data_array[sample_indices])
+        logger.info("Assigning remaining poses to nearest sampled pose")
+        nearest = NearestNeighbors(n_neighbors=1, n_jobs=n_jobs).fit(data_array[sample_indices])
+        nearest_indices = nearest.kneighbors(data_array, return_distance=False)[:,0]
+        labels = sample_labels[nearest_indices]
+        labels[sample_indices] = sample_labels
 
     return [labels, descriptors]
 
@@ -375,32 +744,81 @@ def get_cluster_averages_and_indices(labels, descriptors, pose_series, figure_ty
 
     total_poses = len(label_keys)
 
+    if video_file is not None:
+        # Cut out the first pose of every cluster in one pass through the video
+        first_indices = {}
+        for j, label in enumerate(labels):
+            first_indices.setdefault(label, j)
+        first_descriptors = [descriptors[first_indices[label]] for label in label_keys]
+        first_excerpts = dict(zip(label_keys, excerpt_poses(video_file, pose_series, first_descriptors, source_figure=figure_type)))
+
     for label in label_keys:
         indices = [j for j, x in enumerate(labels) if x == label]
         descs = [descriptors[indices[k]] for k in range(len(indices))]
-        print("CLUSTER",label,"|",len(indices),"POSES")
+        logger.info("Cluster %s | %d poses", label, len(indices))
         cluster_indices[label] = indices
-        print(descriptors[indices[0]],"CLUSTER",label,'FIRST POSE')
-        if video_file is not None:
-            fig = excerpt_pose(video_file, pose_series[descriptors[indices[0]][0]], descriptors[indices[0]][1], show=True, source_figure=figure_type, flip_figures=flip_figures)
+        logger.info("%s cluster %s first pose", descriptors[indices[0]], label)
+        if video_file is not None and first_excerpts[label] is not None:
+            plt.imshow(first_excerpts[label])
+            plt.axis('off')
+            plt.show()
         avg_pose = average_poses(pose_series, descs)
         cluster_averages[label] = matrixify_pose(avg_pose.data)
         cluster_avg_poses[label] = avg_pose
-        print("CLUSTER",label,'AVERAGE POSE')
+        logger.info("Cluster %s average pose", label)
         plot_poses(avg_pose)
 
     return [cluster_averages, cluster_indices, cluster_avg_poses]
 
 
 def find_nearest_pose(pose_matrix, cluster_averages):
-    best_corr = 0
-    best_label = -1
-    for label in cluster_averages:
-        corr = mantel(pose_matrix, cluster_averages[label])[0]
-        if corr > best_corr:
-            best_label = label
-            best_corr = corr
-    return best_label
+    return find_nearest_poses(np.asarray(pose_matrix)[np.newaxis,:], cluster_averages)[0]
+
+
+@timed('analyze.find_nearest_poses')
+def find_nearest_poses(pose_matrices, cluster_averages, chunk_size=None, dtype=None):
+    """ Find the label of the most highly correlated cluster average for each row
+        of an (N, 136) array of pose matrices. As with the Mantel comparisons
+        this replaces, a pose is only assigned to a cluster if the correlation is
+        positive, otherwise its label is -1. Setting chunk_size limits the number
+        of poses that are compared at once, to keep the correlation matrix small.
+        The correlations are computed in the given dtype (see matrixify.FEATURE_DTYPE).
+    """
+    pose_matrices = np.asarray(pose_matrices)
+    cluster_labels = np.array(list(cluster_averages.keys()))
+    average_matrices = np.array([cluster_averages[label] for label in cluster_labels])
+
+    nearest_labels = np.full(pose_matrices.shape[0], -1, dtype=int)
+    if len(cluster_labels) == 0:
+        return nearest_labels
+
+    if chunk_size is None:
+        chunk_size = max(pose_matrices.shape[0], 1)
+    for start in range(0, pose_matrices.shape[0], chunk_size):
+        correlations = correlate_pose_matrices(pose_matrices[start:start+chunk_size], average_matrices, dtype=compute_dtype(dtype))
+        correlations = np.nan_to_num(correlations, nan=0)
+        best = correlations.argmax(axis=1)
+        matched = correlations[np.arange(len(best)), best] > 0
+        nearest_labels[start:start+chunk_size][matched] = cluster_labels[best[matched]]
+    return nearest_labels
+
+
+def pose_distribution_timeline(cluster_indices, descriptors, clustered, total_clusters, total_frames):
+    """ Count pose cluster occurrences per frame in a compact (clusters, frames)
+        timeline array. cluster_indices gives each pose's row in the timeline
+        (its cluster's position among the sorted cluster labels, or -1 if it has
+        no cluster), and descriptors its [frame_index, pose_index]. Poses that
+        were clustered directly count 2, poses assigned to their nearest cluster
+        count 1.
+    """
+    cluster_indices = np.asarray(cluster_indices, dtype=int).reshape(-1)
+    frame_indices = np.asarray(descriptors, dtype=int).reshape(-1, 2)[:,0]
+    counts = np.where(np.asarray(clustered, dtype=bool).reshape(-1), 2, 1)
+
+    included = (cluster_indices >= 0) & (frame_indices < total_frames)
+    timeline = np.zeros((total_clusters, total_frames), dtype=np.int32)
+    np.add.at(timeline, (cluster_indices[included], frame_indices[included]), counts[included])
+    return timeline
 
 
 CELL_HEIGHT=120
@@ -409,44 +827,34 @@ CELL_HEIGHT=120
 def render_pose_distribution(heatmap, poses_series, labels, descriptors, closest_matches=None, show=True, video_file=None, time_index=None, cell_height=CELL_HEIGHT, xlim=None):
     """ Draw a pose cluster timeline based on a precomputed clustering and
         assigment of non-clustered poses to clusters via compute_pose_distribution()
-        below. Passing in the heatmap from the previous step saves a lot of time.
+        below. Passing in the (clusters, frames) timeline from the previous step as
+        the heatmap saves a lot of time. Each cluster's row is stretched to
+        cell_height at render time.
     """
     
+    labels = np.asarray(labels)
+    label_keys = np.unique(labels[labels >= 0])
+
+    if xlim is not None:
+        map_end = xlim
+    elif closest_matches is not None:
+        map_end = len(poses_series)
+    else:
+        map_end = heatmap.shape[1]
+
     # This will overwrite the heatmap; useful for changing appearance
     # of the plot without recomputing everything
-    label_keys = []
-    for label in labels:
-        if label != -1 and label not in label_keys:
-            label_keys.append(label)
-    label_keys.sort()
-
     if closest_matches is not None:
-
-        if xlim is not None:
-            map_end = xlim
-        else:
-            map_end = len(poses_series)
-        heatmap = np.zeros((len(label_keys)*cell_height, map_end), dtype=int)
-
-        for l, label in enumerate(labels):
-            f,p = descriptors[l]
-            if f >= map_end:
-                continue
-            if label >= 0:
-                label_index = label_keys.index(label)
-                for r in range(cell_height):
-                    heatmap[(label_index*cell_height)+r,f] += 2
-            else:
-                if (f,p) in closest_matches:
-                    closest_match = closest_matches[(f,p)]
-                    for r in range(cell_height):
-                        heatmap[(closest_match*cell_height)+r,f] += 1 
+        cluster_indices = [closest_matches.get((f,p), -1) for f,p in descriptors]
+        cluster_indices = np.where(labels >= 0, np.searchsorted(label_keys, labels), cluster_indices)
+        heatmap = pose_distribution_timeline(cluster_indices, descriptors, labels >= 0, len(label_keys), map_end)
     
     fig = plt.figure(figsize=(12,6), constrained_layout=True)
     fig.dpi=100
     ax = plt.gca()
-    im = ax.imshow(heatmap, cmap='viridis_r')
-    print(cell_height/2, ((len(label_keys)*cell_height)+cell_height/2, cell_height))
+    # Each timeline row covers cell_height units vertically, each frame one unit horizontally
+    im = ax.imshow(heatmap[:,:map_end], cmap='viridis_r', interpolation='nearest',
+                   extent=(-0.5, map_end-0.5, len(label_keys)*cell_height, 0))
     ax.set_yticks(np.arange(cell_height/2, (len(label_keys)*cell_height)+cell_height/2, cell_height))
     ax.set_yticklabels(np.arange(len(label_keys)))
     
@@ -463,42 +871,117 @@ def render_pose_distribution(heatmap, poses_series, labels, descriptors, closest
         
     return heatmap
 
-def compute_pose_distribution(poses_series, labels, descriptors, figure_type='zeroified_figures', cluster_averages=None):
-    """ Assign non-clustered poses to clusters (can take a long time) and generate
-        a clustering timeline heatmap of the pose occurrences.
+@timed('analyze.compute_pose_distribution')
+def compute_pose_distribution(poses_series, labels, descriptors, figure_type='zeroified_figures', cluster_averages=None, chunk_size=10000):
+    """ Assign non-clustered poses to clusters and generate a compact
+        (clusters, frames) timeline of the pose occurrences, which can be passed
+        to render_pose_distribution(). All of the unassigned poses are compared
+        to the cluster averages at once (chunk_size poses at a time).
     """
     
-    label_keys = []
-    for label in labels:
-        if label != -1 and label not in label_keys:
-            label_keys.append(label)
-    label_keys.sort()
-    
-    heatmap = np.zeros((len(label_keys)*CELL_HEIGHT, len(poses_series)), dtype=int)
+    labels = np.asarray(labels)
+    descriptors = np.asarray(descriptors, dtype=int).reshape(-1, 2)
+    label_keys = np.unique(labels[labels >= 0])
 
-    closest_matches = {}
+    # Row of each pose in the timeline, -1 until it is assigned to a cluster
+    cluster_indices = np.where(labels >= 0, np.searchsorted(label_keys, labels), -1)
 
-    for l, label in enumerate(labels):
-        f,p = descriptors[l]
-        if label >= 0:
-            label_index = label_keys.index(label)
-            for r in range(CELL_HEIGHT):
-                heatmap[(label_index*CELL_HEIGHT)+r,f] += 2
-                closest_matches[(f,p)] = label_index
-        else:
-            if cluster_averages is None:
-                continue
-            print("Assigning item",l,"of",len(labels),"frame",f,"pose",p)
-            pose_matrix = matrixify_pose(poses_series[f][figure_type][p].data)
-            if pose_matrix is not None:
-                match_index = find_nearest_pose(pose_matrix,cluster_averages)
-                if match_index in label_keys:
-                    closest_match = label_keys.index(match_index)
-                    for r in range(CELL_HEIGHT):
-                        heatmap[(closest_match*CELL_HEIGHT)+r,f] += 1
-                        closest_matches[(f,p)] = closest_match   
+    unassigned = np.nonzero(labels < 0)[0]
+
+    if cluster_averages is not None:
+        logger.info("Assigning %d unclustered poses of %d to %d clusters", len(unassigned), len(labels), len(cluster_averages))
+
+        for start in range(0, len(unassigned), chunk_size):
+            chunk = unassigned[start:start+chunk_size]
+            unassigned_poses = np.full((len(chunk), TOTAL_COORDS, 3), np.nan)
+            for i, (f,p) in enumerate(descriptors[chunk]):
+                pose_data = poses_series[f][figure_type][p].data
+                if pose_data.shape[0] == TOTAL_COORDS:
+                    unassigned_poses[i] = pose_data[:,:3]
+            match_labels = find_nearest_poses(matrixify_poses(unassigned_poses), cluster_averages)
+
+            matched = np.isin(match_labels, label_keys)
+            cluster_indices[chunk[matched]] = np.searchsorted(label_keys, match_labels[matched])
+
+    timeline = pose_distribution_timeline(cluster_indices, descriptors, labels >= 0, len(label_keys), len(poses_series))
+
+    assigned = np.nonzero(cluster_indices >= 0)[0]
+    closest_matches = {(int(f),int(p)): int(c) for (f,p), c in zip(descriptors[assigned], cluster_indices[assigned])}
     
-    return heatmap, closest_matches
+    return timeline, closest_matches
+
+
+def average_pose_matrices(labels, descriptors, pose_series, figure_type='zeroified_figures'):
+    """ The condensed distance matrix of each cluster's average pose, as in the
+        cluster_averages of get_cluster_averages_and_indices(), but without its
+        plots (and without flipping, which doesn't change the distances)
+    """
+    labels = np.asarray(labels)
+    descriptors = np.asarray(descriptors, dtype=int).reshape(-1, 2)
+    poses = stack_poses(pose_series, figure_type)[descriptors[:,0], descriptors[:,1]]
+    return {label: matrixify_poses(poses[labels == label].mean(axis=0)) for label in np.unique(labels[labels >= 0]).tolist()}
+
+
+class IncrementalPoseClusters:
+    """ Assigns the poses of a growing pose series to existing pose clusters, by
+        their nearest cluster average (as in compute_pose_distribution()), so
+        that new frames don't require reclustering everything. Each update costs
+        O(new poses x clusters). cluster_averages is a {label: condensed distance
+        matrix} dict, e.g., from get_cluster_averages_and_indices() or
+        average_pose_matrices().
+    """
+
+    def __init__(self, cluster_averages, figure_type='zeroified_figures'):
+        self.cluster_averages = cluster_averages
+        self.label_keys = np.array(sorted(cluster_averages.keys()))
+        self.figure_type = figure_type
+        self.total_frames = 0
+        self.label_chunks = []
+        self.descriptor_chunks = []
+
+    @classmethod
+    def from_clusters(cls, labels, descriptors, pose_series, figure_type='zeroified_figures'):
+        """ Continue from a batch clustering (e.g., cluster_poses()) of the frames
+            so far; their labels are kept as they are
+        """
+        clusters = cls(average_pose_matrices(labels, descriptors, pose_series, figure_type), figure_type)
+        clusters.label_chunks.append(np.asarray(labels, dtype=int))
+        clusters.descriptor_chunks.append(np.asarray(descriptors, dtype=int).reshape(-1, 2))
+        clusters.total_frames = len(pose_series)
+        return clusters
+
+    def update(self, new_frames):
+        """ Add frames to the series; returns [labels, descriptors] of their poses,
+            with descriptors [[frame_index, pose_index] ...] counting from the
+            start of the series and -1 labels for poses that match no cluster
+        """
+        features, descriptors = get_feature_vectors(new_frames, self.figure_type)
+        descriptors = np.asarray(descriptors, dtype=int).reshape(-1, 2)
+        descriptors[:,0] += self.total_frames
+        labels = find_nearest_poses(np.asarray(features).reshape(-1, TOTAL_COORDS*(TOTAL_COORDS-1)//2), self.cluster_averages)
+        self.total_frames += len(new_frames)
+        self.label_chunks.append(labels)
+        self.descriptor_chunks.append(descriptors)
+        return [labels, descriptors]
+
+    @property
+    def labels(self):
+        return np.concatenate(self.label_chunks) if self.label_chunks else np.zeros(0, dtype=int)
+
+    @property
+    def descriptors(self):
+        return np.concatenate(self.descriptor_chunks) if self.descriptor_chunks else np.zeros((0, 2), dtype=int)
+
+    def timeline(self):
+        """ The (clusters, frames) pose distribution timeline so far, as from
+            pose_distribution_timeline(), with each cluster's row in the order of
+            the sorted cluster labels
+        """
+        labels = self.labels
+        matched = np.isin(labels, self.label_keys)
+        cluster_indices = np.where(matched, np.searchsorted(self.label_keys, labels), -1)
+        return pose_distribution_timeline(cluster_indices, self.descriptors, np.zeros(len(labels), dtype=bool),
+                                          len(self.label_keys), self.total_frames)
 
 
 def condense_labels(labels, cluster_map):
@@ -513,32 +996,52 @@ def condense_labels(labels, cluster_map):
     return new_labels
 
 
-def compare_multiple(pose_data, method='distance', figure_type='aligned_figures'):
+@timed('analyze.compare_multiple')
+def compare_multiple(pose_data, method='distance', figure_type='aligned_figures', chunk_size=1000, dtype=None):
     """ For multi-dancer videos: Get the mean and standard deviation of inter-pose
-        similarities for each frame
+        similarities for each frame. With method='distance', the distance matrices
+        of all figures are computed once per frame and all of the pairwise Pearson
+        (Mantel) correlations are computed together, chunk_size frames at a time,
+        in the given dtype (see matrixify.FEATURE_DTYPE).
+    """
+    if method != 'distance':
+        return compare_multiple_laplacians(pose_data, figure_type)
+
+    poses = stack_poses(pose_data, figure_type)
+    pairs_i, pairs_j = np.triu_indices(poses.shape[1], k=1)
+
+    frame_means = []
+    frame_stdevs = []
+    for start in range(0, len(pose_data), chunk_size):
+        correlations = correlate_pose_matrices(matrixify_poses(poses[start:start+chunk_size], dtype=compute_dtype(dtype)), dtype=compute_dtype(dtype))
+        frame_similarities = correlations[:, pairs_i, pairs_j]
+        # Frames with fewer than two figures have no similarities (NaN mean/stdev)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            frame_means.extend(np.nanmean(frame_similarities, axis=1).tolist())
+            frame_stdevs.extend(np.nanstd(frame_similarities, axis=1).tolist())
+
+    return [frame_means, frame_stdevs]
+
+
+@timed('analyze.compare_multiple_laplacians')
+def compare_multiple_laplacians(pose_data, figure_type='aligned_figures'):
+    """ Laplacian version of compare_multiple(); the Laplacians can't be batched,
+        but each figure's matrix is only computed once per frame.
     """
     frame_means = []
     frame_stdevs = []
     for f, frame in enumerate(pose_data):
-        print("Processing frame",f,"of",len(pose_data))
+        laplacians = [get_laplacian_matrix(frame, figure_index=i, figure_type=figure_type) for i in range(len(frame[figure_type]))]
+        laplacians = [None if lm is None else lm.todense() for lm in laplacians]
         frame_similarities = []
-        for i, figure_i in enumerate(frame[figure_type]):
-            for j, figure_j in enumerate(frame[figure_type]):
+        for i, mi in enumerate(laplacians):
+            for j, mj in enumerate(laplacians):
                 if i < j:
-                    if method == 'distance':
-                        mi = get_pose_matrix(frame, i)
-                        mj = get_pose_matrix(frame, j)
-                        if mi is None or mj is None:
-                            similarity = np.nan
-                        else:
-                            similarity = mantel(mi, mj)[0]
-                    else: # method == 'laplacian'
-                        mi = get_laplacian_matrix(frame, i)
-                        mj = get_laplacian_matrix(frame, j)
-                        if mi is None or mj is None:
-                            similarity = np.nan
-                        else:
-                            similarity = 1 - abs(np.subtract(mi.todense(), mj.todense()).sum())
+                    if mi is None or mj is None:
+                        similarity = np.nan
+                    else:
+                        similarity = 1 - abs(np.subtract(mi, mj).sum())
                     frame_similarities.append(similarity)
     
         frame_means.append(np.nanmean(frame_similarities))
@@ -550,7 +1053,7 @@ def compare_multiple(pose_data, method='distance', figure_type='aligned_figures'
 def plot_interpose_similarity(pose_series, frame_means, frame_stdevs, video_file, show=False, min_clip=.2):
     """ For multi-pose videos """
     fps, total_frames = get_video_stats(video_file)
-    print(fps,total_frames)
+    logger.debug("Video FPS %s, %d frames", fps, total_frames)
     window_length = max(5, int(round(fps/2.0)))
 
     timecodes = []
@@ -599,7 +1102,7 @@ def average_frame_movements(movement_series, poses_series, show=False, max_clip=
         process_movement_series.
     """
     if len(movement_series) == 0:
-        print("ERROR: empty movement series")
+        logger.error("Empty movement series")
     # Each row should have the same length, so use the first one
     total_frames = min(len(movement_series[0]), len(poses_series))
     total_poses = len(movement_series)
@@ -653,13 +1156,13 @@ def member_frame_movements(movement_series, poses_series, max_clip=3, show=False
         for all of the dancers and plot them.
     """
     
-    print(len(movement_series),"DANCERS TO CHECK")
+    logger.info("%d dancers to check", len(movement_series))
     total_frames = min(len(movement_series[0]), len(poses_series))
     # Remove series for dancers who never move (due to clipping of sequence)
     valid_series = []
     for d, dancer in enumerate(movement_series):
         if (len(dancer[:total_frames]) == 0) or np.isnan(np.nanmax(dancer[:total_frames])):
-          print("DANCER NEVER MOVES, SKIPPING")
+          logger.info("Dancer %d never moves, skipping", d)
           continue
         else:
             for v, val in enumerate(dancer[:total_frames]):
@@ -705,11 +1208,11 @@ def member_frame_movements(movement_series, poses_series, max_clip=3, show=False
     else:
         return condensed_array
 
-def compare_sequences_pairwise(seq1, seq2, figure_type='figures'):
-    def pose_match_score(matrix1, matrix2):
-        return mantel(matrix1, matrix2)[0]
-
-    matrix_seq1 = [get_pose_matrix(frame, 0, figure_type) for frame in seq1]
-    matrix_seq2 = [get_pose_matrix(frame, 0, figure_type) for frame in seq2]
-
-    pairwise2.align.localcx(matrix_seq1, matrix_seq2, pose_match_score, gap_char=[])
+@timed('analyze.compare_sequences_pairwise')
+def compare_sequences_pairwise(seq1, seq2, figure_type='figures', method='local', window=None):
+    """ Align two pose sequences by their first figure's poses, using the
+        alignment methods in choreo_k.align ('local' Smith-Waterman alignment by
+        default, or 'dtw'/'subsequence' dynamic time warping). Returns
+        [path, score], where path holds matched (seq1 frame, seq2 frame) indices.
+    """
+    return align_sequences(seq1, seq2, method=method, figure_type=figure_type, figure_index=0, window=window)
@@ -0,0 +1,237 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/08_benchmark.ipynb.
+
+# %% auto 0
+__all__ = ['STANDING_POSE', 'KEYPOINT_SWING', 'BENCHMARK_SCALES', 'synthetic_pose_series', 'benchmark_function', 'git_commit',
+           'run_benchmarks', 'compare_benchmarks', 'precision_report']
+
+# %% ../nbs/08_benchmark.ipynb 3
+import contextlib
+import datetime
+import io
+import json
+import platform
+import subprocess
+import time
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import adjusted_rand_score
+
+from choreo_k.modify import TOTAL_COORDS, interpolate_missing_coords
+from choreo_k.matrixify import matrixify_poses, stack_poses, correlate_pose_matrices
+from choreo_k.analyze import corr_time_series_matrix, movements_time_series, cluster_poses, compare_multiple, compute_pose_distribution
+from choreo_k.store import StoredFigure
+
+
+# A standing COCO-17 pose, in pixels with y=0 at the top, about 300 pixels tall
+STANDING_POSE = np.array([[0, -140], [6, -146], [-6, -146], [14, -142], [-14, -142],
+                          [30, -110], [-30, -110], [44, -70], [-44, -70], [50, -30], [-50, -30],
+                          [20, -10], [-20, -10], [22, 60], [-22, 60], [24, 130], [-24, 130]], dtype=float)
+
+# How far each keypoint swings while dancing, relative to the torso (wrists and ankles the most)
+KEYPOINT_SWING = np.array([.3, .3, .3, .3, .3, .6, .6, 1.2, 1.2, 2., 2., .4, .4, .9, .9, 1.4, 1.4])
+
+
+def synthetic_pose_series(total_frames=1000, dancers=3, fps=25, dropout=0.05, low_confidence=0.1, seed=0, image_width=1920, image_height=1080):
+    """ Generates a pose series like detect_video's output, for benchmarks and
+        tests that shouldn't need a video or a model: `dancers` figures doing
+        similar, slightly out-of-sync movements while drifting around the stage.
+        Each figure is replaced by an empty one (a dropout) with probability
+        `dropout`, and each keypoint gets a low confidence (sometimes 0) with
+        probability `low_confidence`. The 'flipped_figures', 'aligned_figures' and
+        'zeroified_figures' are the same as the 'figures', so that every analysis
+        function can run on the series directly.
+    """
+    rng = np.random.default_rng(seed)
+    times = np.arange(total_frames) / fps
+
+    # Shared choreography: a few movement "phrases" per keypoint, each a sinusoid
+    frequencies = rng.uniform(.2, 1.5, (3, 1, 1))
+    directions = rng.normal(0, 1, (3, TOTAL_COORDS, 2)) * KEYPOINT_SWING[np.newaxis, :, np.newaxis] * 12
+    phases = rng.uniform(0, 2 * np.pi, (3, 1, 1))
+    lags = rng.normal(0, .15, dancers)
+
+    home = np.stack([np.linspace(.2, .8, dancers) * image_width, np.full(dancers, .6 * image_height)], axis=1)
+    drift = rng.uniform(.05, .2, (dancers, 2)) * [image_width, image_height] / 4
+
+    keypoints = np.empty((total_frames, dancers, TOTAL_COORDS, 3))
+    for d in range(dancers):
+        t = (times + lags[d])[:, np.newaxis, np.newaxis, np.newaxis]
+        movement = (np.sin(2 * np.pi * frequencies * t + phases) * directions).sum(axis=1)
+        center = home[d] + drift[d] * np.sin(2 * np.pi * times[:, np.newaxis] / 20 + d)
+        keypoints[:, d, :, :2] = center[:, np.newaxis, :] + STANDING_POSE + movement + rng.normal(0, 2, (total_frames, TOTAL_COORDS, 2))
+    keypoints[..., 2] = rng.uniform(.6, 1., (total_frames, dancers, TOTAL_COORDS))
+    low = rng.random((total_frames, dancers, TOTAL_COORDS)) < low_confidence
+    keypoints[..., 2][low] = rng.uniform(0, .3, low.sum())
+    keypoints[..., 2][low & (rng.random(low.shape) < .3)] = 0
+    dropped = rng.random((total_frames, dancers)) < dropout
+
+    pose_series = []
+    for f in range(total_frames):
+        figures = [StoredFigure(np.zeros((0, 3)) if dropped[f, d] else keypoints[f, d], float(keypoints[f, d, :, 2].mean())) for d in range(dancers)]
+        pose_series.append({'frame_id': f + 1, 'time': times[f], 'figures': figures, 'flipped_figures': figures,
+                            'aligned_figures': figures, 'zeroified_figures': figures,
+                            'image_height': image_height, 'image_width': image_width})
+    return pose_series
+
+
+# [frames, dancers] sizes to time each function at (corr_time_series_matrix does
+# a Mantel test with permutations for every pair of frames, so it gets small ones)
+BENCHMARK_SCALES = {'corr_time_series_matrix': [[15, 1], [30, 1]],
+                    'movements_time_series': [[1000, 2], [10000, 4]],
+                    'interpolate_missing_coords': [[100, 2], [500, 4]],
+                    'cluster_poses': [[1000, 2], [2500, 2]],
+                    'compare_multiple': [[1000, 3], [10000, 6]],
+                    'compute_pose_distribution': [[1000, 3], [10000, 4]]}
+
+
+def benchmark_function(name, pose_series):
+    """ Does any untimed preparation for one of the BENCHMARK_SCALES functions and
+        returns a no-argument function that runs it on pose_series
+    """
+    if name == 'corr_time_series_matrix':
+        return lambda: corr_time_series_matrix(pose_series)
+    if name == 'movements_time_series':
+        return lambda: movements_time_series(pose_series)
+    if name == 'interpolate_missing_coords':
+        return lambda: interpolate_missing_coords(pose_series)
+    if name == 'cluster_poses':
+        return lambda: cluster_poses(pose_series, min_samples=20)
+    if name == 'compare_multiple':
+        return lambda: compare_multiple(pose_series)
+    if name == 'compute_pose_distribution':
+        # Cluster a sample of the poses and assign all of the rest
+        features = matrixify_poses(stack_poses(pose_series, 'zeroified_figures'))
+        descriptors = np.argwhere(~np.isnan(features).any(axis=-1))
+        labels = np.full(len(descriptors), -1)
+        sample = np.arange(0, len(descriptors), 10)
+        total_clusters = min(20, len(sample))
+        labels[sample] = np.arange(len(sample)) % total_clusters
+        cluster_averages = {label: features[tuple(descriptors[sample[labels[sample] == label]].T)].mean(axis=0) for label in range(total_clusters)}
+        return lambda: compute_pose_distribution(pose_series, labels, descriptors.tolist(), cluster_averages=cluster_averages)
+    raise ValueError("Benchmark must be one of " + ", ".join(BENCHMARK_SCALES.keys()))
+
+
+def git_commit(path='.'):
+    """ The commit the code is at, if it's in a git repository """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=path, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names=None, scales=None, repeats=3, output_file=None, seed=0, quiet=True):
+    """ Times each named function (default: all of BENCHMARK_SCALES) `repeats`
+        times at each of its scales (or the given [[frames, dancers], ...] scales),
+        on synthetic_pose_series() data. With quiet=True, the functions' printed
+        output is discarded. Returns the results, and writes them to output_file
+        as JSON if it is given.
+    """
+    names = list(BENCHMARK_SCALES.keys()) if names is None else names
+    results = []
+    for name in names:
+        for total_frames, dancers in (BENCHMARK_SCALES[name] if scales is None else scales):
+            pose_series = synthetic_pose_series(total_frames, dancers, seed=seed)
+            function = benchmark_function(name, pose_series)
+            seconds = []
+            for r in range(repeats):
+                with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+                    start = time.perf_counter()
+                    function()
+                    seconds.append(time.perf_counter() - start)
+            results.append({'benchmark': name, 'frames': total_frames, 'dancers': dancers, 'seconds': seconds,
+                            'best': min(seconds), 'median': float(np.median(seconds))})
+            print(name, total_frames, "frames", dancers, "dancers:", round(min(seconds), 4), "s")
+
+    report = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+              'commit': git_commit(),
+              'python': platform.python_version(),
+              'numpy': np.__version__,
+              'machine': platform.platform(),
+              'repeats': repeats,
+              'results': results}
+    if output_file is not None:
+        with open(output_file, 'w') as json_file:
+            json.dump(report, json_file, indent=1)
+    return report
+
+
+def compare_benchmarks(baseline, current, tolerance=0.1):
+    """ Compares two run_benchmarks() reports (or JSON files of them) by the best
+        time of each benchmark and scale. Prints and returns the comparisons as
+        [benchmark, frames, dancers, baseline seconds, current seconds, ratio],
+        flagging those more than `tolerance` (10%) slower as regressions.
+    """
+    reports = []
+    for report in [baseline, current]:
+        if isinstance(report, str):
+            with open(report) as json_file:
+                report = json.load(json_file)
+        reports.append({(r['benchmark'], r['frames'], r['dancers']): r['best'] for r in report['results']})
+
+    comparisons = []
+    for key, baseline_seconds in reports[0].items():
+        if key not in reports[1]:
+            continue
+        ratio = reports[1][key] / baseline_seconds
+        comparisons.append([*key, baseline_seconds, reports[1][key], ratio])
+        print(*key, round(baseline_seconds, 4), "->", round(reports[1][key], 4), "s", "REGRESSION" if ratio > 1 + tolerance else "")
+    return comparisons
+
+
+def precision_report(dtypes=('float32', 'float16'), total_frames=1000, dancers=3, max_poses=2000, n_clusters=20, seed=0, output_file=None):
+    """ How much the pose similarity results change when the features and
+        similarity matrices are computed at lower precision (see
+        matrixify.FEATURE_DTYPE), on up to max_poses poses of synthetic_pose_series()
+        data. For each dtype, compared to float64:
+          correlation errors (max, mean and 99th percentile absolute difference),
+          the share of poses whose most similar pose is unchanged, and the
+          agreement (adjusted Rand index) of k-means clusterings of the features.
+        Prints and returns the results, writing them to output_file as JSON if given.
+    """
+    pose_series = synthetic_pose_series(total_frames, dancers, seed=seed)
+    poses = stack_poses(pose_series, 'zeroified_figures')
+    poses = poses[~np.isnan(poses).any(axis=(-2, -1))][:max_poses]
+    pairs = np.triu_indices(len(poses), k=1)
+
+    def nearest(correlations):
+        correlations = np.array(correlations, dtype=np.float64)
+        np.fill_diagonal(correlations, -np.inf)
+        return correlations.argmax(axis=1)
+
+    def clusters(features):
+        return MiniBatchKMeans(n_clusters=n_clusters, batch_size=4096, n_init=3, random_state=seed).fit_predict(features)
+
+    reference_features = matrixify_poses(poses, dtype=np.float64)
+    reference = correlate_pose_matrices(reference_features, dtype=np.float64)
+    reference_nearest = nearest(reference)
+    reference_clusters = clusters(reference_features)
+
+    results = []
+    for dtype in dtypes:
+        start = time.perf_counter()
+        features = matrixify_poses(poses, dtype=dtype)
+        correlations = correlate_pose_matrices(features, dtype=dtype)
+        seconds = time.perf_counter() - start
+        errors = np.abs(correlations[pairs].astype(np.float64) - reference[pairs])
+        results.append({'dtype': np.dtype(dtype).name,
+                        'poses': len(poses),
+                        'max_error': float(errors.max()),
+                        'mean_error': float(errors.mean()),
+                        'p99_error': float(np.percentile(errors, 99)),
+                        'same_nearest': float((nearest(correlations) == reference_nearest).mean()),
+                        'cluster_agreement': float(adjusted_rand_score(reference_clusters, clusters(features.astype(np.float32)))),
+                        'matrix_bytes': int(correlations.nbytes),
+                        'seconds': seconds})
+        print(results[-1]['dtype'], len(poses), "poses: max error", "%.2e" % results[-1]['max_error'], "mean", "%.2e" % results[-1]['mean_error'],
+              "| same nearest pose", round(results[-1]['same_nearest'], 4), "| cluster ARI", round(results[-1]['cluster_agreement'], 4),
+              "|", results[-1]['matrix_bytes'] // 2**20, "MB", round(seconds, 3), "s")
+
+    report = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+              'commit': git_commit(),
+              'reference_bytes': int(reference.nbytes),
+              'results': results}
+    if output_file is not None:
+        with open(output_file, 'w') as json_file:
+            json.dump(report, json_file, indent=1)
+    return report
@@ -0,0 +1,131 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/09_instrument.ipynb.
+
+# %% auto 0
+__all__ = ['NULL_TIMER', 'instruments', 'timer', 'timed', 'count', 'StageTimer', 'Instruments']
+
+# %% ../nbs/09_instrument.ipynb 3
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+
+class StageTimer:
+    """ Context manager that records one timing of a named stage """
+    __slots__ = ['instruments', 'name', 'start']
+
+    def __init__(self, instruments, name):
+        self.instruments = instruments
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.instruments.record(self.name, self.start, time.perf_counter_ns())
+
+
+# Returned by timer() while instrumentation is off, so a disabled timer costs
+# one attribute check and an empty with block
+NULL_TIMER = contextlib.nullcontext()
+
+
+class Instruments:
+    """ Collects named stage timings and counters. Instrumentation is off until
+        enable() is called; until then timer() and count() do (almost) nothing.
+        Each use of a timer is one sample, so for stages that run once per video
+        frame, the summary's p50/p95 are per-frame figures. With trace=True,
+        every timing is also kept as an event for export_chrome_trace().
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.tracing = False
+        self.reset()
+
+    def enable(self, trace=False):
+        self.enabled = True
+        self.tracing = trace
+
+    def disable(self):
+        self.enabled = False
+        self.tracing = False
+
+    def reset(self):
+        self.durations = defaultdict(list)
+        self.counters = defaultdict(int)
+        self.events = []
+        self.origin = time.perf_counter_ns()
+
+    def timer(self, name):
+        """ Use as `with instruments.timer('stage'):` around a stage """
+        if not self.enabled:
+            return NULL_TIMER
+        return StageTimer(self, name)
+
+    def timed(self, name):
+        """ Decorator that times every call of a function as stage `name` """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with StageTimer(self, name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    def record(self, name, start, end):
+        """ Add a timing (in perf_counter_ns() nanoseconds) for a stage """
+        self.durations[name].append(end - start)
+        if self.tracing:
+            self.events.append([name, start, end, threading.get_ident()])
+
+    def summary(self):
+        """ Per-stage totals and distributions (in seconds), plus the counters """
+        stages = {}
+        for name, durations in self.durations.items():
+            seconds = np.array(durations) / 1e9
+            stages[name] = {'calls': len(seconds), 'total': float(seconds.sum()), 'mean': float(seconds.mean()),
+                            'p50': float(np.percentile(seconds, 50)), 'p95': float(np.percentile(seconds, 95)),
+                            'max': float(seconds.max())}
+        return {'stages': stages, 'counters': dict(self.counters)}
+
+    def report(self):
+        """ Print the summary as a table, slowest stages first """
+        summary = self.summary()
+        print(f"{'STAGE':<40}{'CALLS':>8}{'TOTAL s':>11}{'P50 ms':>10}{'P95 ms':>10}")
+        for name, stage in sorted(summary['stages'].items(), key=lambda item: -item[1]['total']):
+            print(f"{name:<40}{stage['calls']:>8}{stage['total']:>11.3f}{stage['p50']*1000:>10.2f}{stage['p95']*1000:>10.2f}")
+        for name, value in sorted(summary['counters'].items()):
+            print(f"{name:<40}{value:>8}")
+        return summary
+
+    def export_chrome_trace(self, path):
+        """ Write the traced timings (see enable(trace=True)) as a Chrome trace
+            JSON file, for viewing in chrome://tracing or Perfetto
+        """
+        events = [{'name': name, 'ph': 'X', 'ts': (start - self.origin) / 1000, 'dur': (end - start) / 1000,
+                   'pid': os.getpid(), 'tid': tid} for name, start, end, tid in self.events]
+        events += [{'name': name, 'ph': 'C', 'ts': 0, 'pid': os.getpid(), 'args': {name: value}} for name, value in self.counters.items()]
+        with open(path, 'w') as trace_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)
+        return path
+
+
+# The instruments used throughout choreo_k
+instruments = Instruments()
+
+timer = instruments.timer
+timed = instruments.timed
+count = instruments.count
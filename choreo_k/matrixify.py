@@ -1,23 +1,58 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/02_matrixify.ipynb.
 
 # %% auto 0
-__all__ = ['matrixify_pose', 'get_normalized_coords', 'normalize_pose', 'symmetrify_pose',
+__all__ = ['FLOAT_DTYPES', 'FEATURE_DTYPE', 'set_feature_dtype', 'feature_dtype', 'compute_dtype', 'matrixify_pose',
+           'matrixify_poses', 'stack_poses', 'get_normalized_coords', 'normalize_pose', 'symmetrify_pose',
            'normalize_symmetrify_and_compare_poses_cosine', 'normalize_and_compare_poses_cosine',
-           'compare_poses_cosine', 'get_pose_matrix', 'get_laplacian_matrix', 'compare_laplacians']
+           'compare_poses_cosine', 'normalize_poses', 'mirror_poses', 'symmetrize_poses', 'cosine_similarities',
+           'standardize_pose_matrices', 'correlate_pose_matrices', 'get_pose_matrix', 'get_laplacian_matrix',
+           'compare_laplacians']
 
 # %% ../nbs/02_matrixify.ipynb 3
 import copy
 import numpy as np
 import os
+import warnings
 from scipy.spatial.distance import pdist, cosine
 from sklearn.preprocessing import normalize
 from scipy.sparse import lil_matrix
 import networkx as nx
 
-#from choreo_k.modify import flip_detections, flip_detections_y_first
+from choreo_k.modify import TOTAL_COORDS, flip_detections, flip_detections_y_first
+from choreo_k.progress import logger
 
+# Precision policy for pose features (distance matrices, normalized coordinates)
+# and the similarity matrices computed from them. Functions with a dtype argument
+# return that dtype, or FEATURE_DTYPE if it's None. float32 is plenty for
+# similarity heatmaps and clustering (see benchmark.precision_report()) and
+# halves the memory traffic; float16 is meant for storing results, so float16
+# features are computed in float32 (numpy has no fast float16 arithmetic) and
+# only converted at the end.
+FLOAT_DTYPES = ['float64', 'float32', 'float16']
+FEATURE_DTYPE = np.dtype('float64')
 
-def matrixify_pose(coords_and_confidence):
+def set_feature_dtype(dtype='float64'):
+    """ Set the default precision (one of FLOAT_DTYPES) of pose features and
+        similarity matrices
+    """
+    global FEATURE_DTYPE
+    if np.dtype(dtype).name not in FLOAT_DTYPES:
+        raise ValueError("Feature dtype must be one of " + ", ".join(FLOAT_DTYPES))
+    FEATURE_DTYPE = np.dtype(dtype)
+
+
+def feature_dtype(dtype=None):
+    """ The dtype of results for a per-call dtype argument (None: FEATURE_DTYPE) """
+    return FEATURE_DTYPE if dtype is None else np.dtype(dtype)
+
+
+def compute_dtype(dtype=None):
+    """ The dtype that results of feature_dtype(dtype) are computed in """
+    dtype = feature_dtype(dtype)
+    return np.dtype('float32') if dtype == np.float16 else dtype
+
+
+def matrixify_pose(coords_and_confidence, dtype=None):
     """ DISTANCE MATRIX: compute a pose's L1-normed inter-keypoint distance matrix.
         To compare any two poses, we can measure the degree of correlation between
         their distance matrices via a statistical test, such as the Mantel test.
@@ -31,16 +66,55 @@ def matrixify_pose(coords_and_confidence):
             return None
     coords = coords_and_confidence[:,:2]
     condensed_distance_matrix = normalize(pdist(coords, 'sqeuclidean').reshape(1, -1))[0,:]
-    return condensed_distance_matrix
+    return condensed_distance_matrix.astype(feature_dtype(dtype), copy=False)
 
 
-def get_normalized_coords(frame, figure_index=0, figure_type='figures', norm='l2'):
+def matrixify_poses(coords_and_confidence, square=False, dtype=None):
+    """ Batched version of matrixify_pose(): takes an array of poses with shape
+        (..., keypoints, 2+) and computes all of their L2-normed squared distance
+        matrices at once. By default these are returned in condensed form, so the
+        last axis matches matrixify_pose() (136 elements for 17 keypoints); with
+        square=True the full (..., keypoints, keypoints) matrices are returned.
+        Poses that contain NaNs (e.g., missing figures from stack_poses()) come
+        back as NaN rows rather than None. The result has the given dtype (see
+        FEATURE_DTYPE).
+    """
+    coords = np.asarray(coords_and_confidence)[..., :2].astype(compute_dtype(dtype), copy=False)
+    offsets = coords[..., :, np.newaxis, :] - coords[..., np.newaxis, :, :]
+    dmatrices = np.square(offsets).sum(axis=-1)
+    # Each distance appears twice in the square matrix, once in the condensed form
+    norms = np.sqrt(np.square(dmatrices).sum(axis=(-2, -1)) / 2)
+    norms = np.where(norms == 0, 1, norms)
+    dmatrices /= norms[..., np.newaxis, np.newaxis]
+    if square:
+        return dmatrices.astype(feature_dtype(dtype), copy=False)
+    rows, cols = np.triu_indices(coords.shape[-2], k=1)
+    return dmatrices[..., rows, cols].astype(feature_dtype(dtype), copy=False)
+
+
+def stack_poses(pose_data, figure_type='flipped_figures', max_figures=None):
+    """ Gather the keypoints of every figure in a pose series into a single
+        (frames, figures, TOTAL_COORDS, 3) array that can be handed to the
+        batched functions above. Figures that are missing from a frame, or that
+        have been emptied or truncated, are filled with NaNs.
+    """
+    if max_figures is None:
+        max_figures = max([len(frame.get(figure_type, [])) for frame in pose_data], default=0)
+    stacked = np.full((len(pose_data), max_figures, TOTAL_COORDS, 3), np.nan)
+    for f, frame in enumerate(pose_data):
+        for p, figure in enumerate(frame.get(figure_type, [])[:max_figures]):
+            if figure.data.shape[0] == TOTAL_COORDS:
+                stacked[f, p] = figure.data[:, :3]
+    return stacked
+
+
+def get_normalized_coords(frame, figure_index=0, figure_type='figures', norm='l2', dtype=None):
     if figure_type not in frame or figure_index > len(frame[figure_type])-1:
         return None
     coords_and_confidence = frame[figure_type][figure_index].data
     if coords_and_confidence.shape[0] == 0:
         return None
-    coords = np.copy(coords_and_confidence)
+    coords = np.array(coords_and_confidence, dtype=feature_dtype(dtype))
 
     normalized_coords = normalize(coords_and_confidence[:,:2], norm=norm, axis=0)
     coords[:,:2] = normalized_coords[:,:2]
@@ -104,6 +178,105 @@ def compare_poses_cosine(p1, p2):
     return 1 - cosine(p1[:,:2].flatten(), p2[:,:2].flatten())
 
 
+def normalize_poses(poses, norm='l2', y_first=False, dtype=None):
+    """ Batched version of get_normalized_coords(): takes an array of poses shaped
+        (..., TOTAL_COORDS, 2+) and scales each pose's x and y coordinates to unit
+        norm ('l2', 'l1' or 'max') separately, as sklearn's normalize(axis=0)
+        does. The results are flattened to (..., 2*TOTAL_COORDS) rows of
+        [x0, y0, x1, y1, ...] (of the given dtype, see FEATURE_DTYPE), which can
+        be compared with cosine_similarities(). Poses with NaNs give NaN rows.
+        With y_first=True the input is in MoveNet's [y, x, confidence] order.
+    """
+    coords = np.asarray(poses)[..., :2].astype(compute_dtype(dtype), copy=False)
+    if y_first:
+        coords = coords[..., ::-1]
+    if norm == 'l2':
+        norms = np.sqrt(np.square(coords).sum(axis=-2, keepdims=True))
+    elif norm == 'l1':
+        norms = np.abs(coords).sum(axis=-2, keepdims=True)
+    elif norm == 'max':
+        norms = np.abs(coords).max(axis=-2, keepdims=True)
+    else:
+        raise ValueError("Norm must be one of l2, l1, max")
+    normalized = coords / np.where(norms == 0, 1, norms)
+    return normalized.reshape(normalized.shape[:-2] + (-1,)).astype(feature_dtype(dtype), copy=False)
+
+
+def mirror_poses(poses, y_first=False):
+    """ Mirror an array of poses shaped (..., TOTAL_COORDS, 3) horizontally around
+        the middle of each pose's x range, like flip_detections(flip_x=True).
+        Keypoints with a confidence of 0 don't count towards the range, and
+        undetected (0, 0, 0) keypoints are left as they are.
+        (flip_detections() takes its range from the first and last keypoints
+        only, so the two can differ for poses with missing keypoints.)
+    """
+    poses = np.array(poses, dtype=float)
+    x = poses[..., 1 if y_first else 0]
+    confident = poses[..., 2] != 0
+    with warnings.catch_warnings():
+        # Poses with no confident keypoints have no range to mirror around
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        middles = (np.nanmax(np.where(confident, x, np.nan), axis=-1, keepdims=True) +
+                   np.nanmin(np.where(confident, x, np.nan), axis=-1, keepdims=True)) / 2
+    undetected = (poses == 0).all(axis=-1)
+    poses[..., 1 if y_first else 0] = np.where(undetected | np.isnan(middles), x, 2 * middles - x)
+    return poses
+
+
+def symmetrize_poses(poses, norm='l2', y_first=False, dtype=None):
+    """ Batched version of symmetrify_pose(): each pose's normalized coordinates
+        (see normalize_poses()) followed by those of its mirror image (see
+        mirror_poses()), as (..., 4*TOTAL_COORDS) rows, so that the cosine
+        similarity of two rows counts both a pose and its reflection
+    """
+    return np.concatenate([normalize_poses(poses, norm, y_first, dtype),
+                           normalize_poses(mirror_poses(poses, y_first), norm, y_first, dtype)], axis=-1)
+
+
+def cosine_similarities(vectors1, vectors2=None, dtype=None):
+    """ Cosine similarities between every pair of rows of two stacks of vectors
+        (e.g., from normalize_poses() or symmetrize_poses()), shaped (..., N, D)
+        and (..., M, D), as a single (batched) matrix product; the batched
+        equivalent of compare_poses_cosine(). If vectors2 is None, the rows of
+        vectors1 are compared with each other. Rows with NaNs or all zeros
+        produce NaN similarities.
+    """
+    def unit_rows(vectors):
+        vectors = np.asarray(vectors).astype(compute_dtype(dtype), copy=False)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return vectors / np.sqrt(np.square(vectors).sum(axis=-1, keepdims=True))
+
+    unit1 = unit_rows(vectors1)
+    unit2 = unit1 if vectors2 is None else unit_rows(vectors2)
+    return (unit1 @ np.swapaxes(unit2, -1, -2)).astype(feature_dtype(dtype), copy=False)
+
+
+def standardize_pose_matrices(matrices, dtype=None):
+    """ Center each condensed distance matrix (the last axis) and scale it to unit
+        length, so that the dot product of two standardized matrices is their
+        Pearson correlation. Rows with NaNs or no variance become NaN rows.
+    """
+    matrices = np.asarray(matrices).astype(compute_dtype(dtype), copy=False)
+    centered = matrices - matrices.mean(axis=-1, keepdims=True)
+    norms = np.sqrt(np.square(centered).sum(axis=-1, keepdims=True))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (centered / norms).astype(feature_dtype(dtype), copy=False)
+
+
+def correlate_pose_matrices(matrices1, matrices2=None, dtype=None):
+    """ Pearson correlations between every pair of rows of two stacks of condensed
+        distance matrices, shaped (..., N, 136) and (..., M, 136), computed as a
+        single (batched) matrix product. This is the statistic that mantel()
+        reports for each pair, minus the permutation test. If matrices2 is None,
+        the rows of matrices1 are correlated with each other. Rows with NaNs or
+        no variance produce NaN correlations. The correlations have the given
+        dtype (see FEATURE_DTYPE).
+    """
+    standardized1 = standardize_pose_matrices(matrices1, compute_dtype(dtype))
+    standardized2 = standardized1 if matrices2 is None else standardize_pose_matrices(matrices2, compute_dtype(dtype))
+    return (standardized1 @ np.swapaxes(standardized2, -1, -2)).astype(feature_dtype(dtype), copy=False)
+
+
 def get_pose_matrix(frame, figure_index=0, figure_type='flipped_figures'):
     if figure_type not in frame or figure_index > len(frame[figure_type])-1:
         return None
@@ -134,7 +307,7 @@ def get_laplacian_matrix(frame, normalized=True, show=False, figure_index=0, fig
         tri = Delaunay(points)
     except:
         # Not sure why this happens -- maybe the points are all in a line or something
-        print("Error computing Delaunay triangulation")
+        logger.warning("Error computing Delaunay triangulation")
         return None
 
     if show:
@@ -20,6 +20,9 @@ import numpy as np
 import openpifpaf
 from openpifpaf.plugins.coco.constants import COCO_KEYPOINTS, COCO_PERSON_SKELETON
 
+from choreo_k.instrument import timed, count
+from choreo_k.progress import Progress, logger
+
 TOTAL_COORDS = 17
 D_THRESH = 0.01
 
@@ -574,6 +577,7 @@ def left_hip_btwn_shoulder_knee_ankle(coords, missing_coords):
         coords[11] = average_coords(coords[5], coords[15])
         missing_coords.remove(11) 
         return [coords, missing_coords]
+    return [coords, missing_coords]
 
 def right_hip_btwn_shoulder_knee_ankle(coords, missing_coords):
     if 12 in missing_coords and 6 not in missing_coords and 14 not in missing_coords:
@@ -584,6 +588,7 @@ def right_hip_btwn_shoulder_knee_ankle(coords, missing_coords):
         coords[12] = average_coords(coords[6], coords[16])
         missing_coords.remove(12)
         return [coords, missing_coords]
+    return [coords, missing_coords]
     
 def left_ankle_from_knee(coords, missing_coords):
     if 15 in missing_coords and 11 not in missing_coords and 13 not in missing_coords:
@@ -661,6 +666,7 @@ def correct_pose(input_coords):
     return corrected_coords
 
 
+@timed('modify.add_flipped_zeroified_figures')
 def add_flipped_zeroified_figures(input_frames, add_flipped=True, add_zerofied=True, figure_type='figures'):
     output_frames = copy.deepcopy(input_frames)
     
@@ -668,7 +674,7 @@ def add_flipped_zeroified_figures(input_frames, add_flipped=True, add_zerofied=T
         if add_flipped:
             flipped_detections = flip_detections(frame_info[figure_type])
             output_frames[i]['flipped_figures'] = flipped_detections
-        if add_zeroified:
+        if add_zerofied:
             zeroified_detections = zeroify_detections(frame_info[figure_type])
             output_frames[i]['zeroified_figures'] = zeroified_detections
     
@@ -708,6 +714,7 @@ def is_usable_pose(frame_info, threshold=0.2, figure_type='figures'):
     return True
 
 
+@timed('modify.interpolate_missing_poses')
 def interpolate_missing_poses(input_frames, threshold=.2, video_file=None, figure_type='figures', trim_ends=True):
     # Assumes SINGLE PERSON sequence. If a pose is missing entirely or disqualified
     # due to low confidence scores, use the closest available pose, looking either
@@ -717,17 +724,17 @@ def interpolate_missing_poses(input_frames, threshold=.2, video_file=None, figur
     max_figures, total_time, total_figures = count_figures_and_time(frame_series, figure_type)
     
     if max_figures == 0:
-        print("No figures found in sequence, returning None")
+        logger.warning("No figures found in sequence, returning None")
         return None
     elif max_figures > 1:
-        print("WARNING: some frames have multiple figures; only one will be used")
+        logger.warning("Some frames have multiple figures; only one will be used")
     
     for i, frame_info in enumerate(input_frames):
         
         if is_usable_pose(frame_info, threshold):
             frame_series[i] = frame_info
         else:
-            print("LOOKING FORE AND AFT FOR ALTERNATIVE TO FRAME",i)
+            logger.debug("Looking fore and aft for alternative to frame %d", i)
             usable_index = -1
             backwards_match = -1
             forwards_match = -1
@@ -762,6 +769,7 @@ def interpolate_missing_poses(input_frames, threshold=.2, video_file=None, figur
     return frame_series
 
 
+@timed('modify.trim_empty_frames_start_end')
 def trim_empty_frames_start_end(input_frames, figure_type='figures'):
     # To be used with interpolate_missing_poses, assumes SINGLE PERSON sequence
     
@@ -791,6 +799,7 @@ def trim_empty_frames_start_end(input_frames, figure_type='figures'):
     return input_frames[first_nonempty_frame:last_nonempty_frame+1]
     
 
+@timed('modify.interpolate_missing_coords')
 def interpolate_missing_coords(input_frames, threshold=.5, flip_figures=False, check_bbox=False, all_visible=True, overlap_threshold=.7, video_file=None, figure_type='figures'):
     # Most matrix comparison methods do not allow for empty rows/colums.
     # Given a series of poses, fill in each missing point by taking the average of
@@ -802,15 +811,17 @@ def interpolate_missing_coords(input_frames, threshold=.5, flip_figures=False, c
     frame_series = copy.deepcopy(input_frames)
 
     max_figures, total_time, total_figures = count_figures_and_time(frame_series, figure_type)
-    print("MAX FIGURES",max_figures,"TOTAL FIGURES",total_figures)
+    logger.info("Max figures %d, total figures %d", max_figures, total_figures)
 
     frame_search_limit = int(round(float(len(frame_series)) / total_time))
-    print(len(frame_series),"FRAMES OVER",total_time,"SECONDS","FPS ROUNDED TO",frame_search_limit)
+    logger.info("%d frames over %s seconds, FPS rounded to %d", len(frame_series), total_time, frame_search_limit)
 
+    progress = Progress(len(input_frames), 'Interpolating missing coordinates')
     for i, frame_info in enumerate(input_frames):
+        progress.update()
 
         if figure_type not in frame_info:
-            print("NO FIGURES IN",figure_type,"FOR FRAME",i)
+            logger.debug("No %s for frame %d", figure_type, i)
             frame_series[i][figure_type] = []
             continue
         for f in range(len(frame_info[figure_type])):
@@ -820,7 +831,7 @@ def interpolate_missing_coords(input_frames, threshold=.5, flip_figures=False, c
 
             new_coords = np.copy(frame_info[figure_type][f].data)
             if new_coords.shape[0] != TOTAL_COORDS:
-                print("TRUNCATED FIGURE IN FRAME",i,"FIGURE",f,"NUMBER OF COORDS",new_coords.shape[0])
+                logger.debug("Truncated figure in frame %d, figure %d, number of coords %d", i, f, new_coords.shape[0])
 
             bbox = get_bbox(frame_info[figure_type][f].data)
         
@@ -835,7 +846,8 @@ def interpolate_missing_coords(input_frames, threshold=.5, flip_figures=False, c
                     missing_coords += 1
             figure_confidence = float(sum(confidence_values)) / float(len(confidence_values))
             if (figure_confidence < threshold) or (missing_coords > TOTAL_COORDS / 2):
-                print("FRAME",i,"FIGURE",f,"CONFIDENCE",figure_confidence,"MISSING",missing_coords,"COORDS, REMOVING")
+                logger.debug("Frame %d figure %d confidence %.3f missing %d coords, removing", i, f, figure_confidence, missing_coords)
+                count('modify.removed_figures')
 
                 frame_series[i][figure_type][f].data = np.array([])
                 continue
@@ -969,6 +981,7 @@ def interpolate_missing_coords(input_frames, threshold=.5, flip_figures=False, c
             frame_series[i]['rectified_figures'] = flip_detections(frame_series[i][figure_type], flip_y=False, rectify_x=True)
 
         frame_series[i]['zeroified_figures'] = zeroify_detections(frame_series[i][figure_type])
+    progress.close()
 
     return frame_series
 
@@ -1005,13 +1018,13 @@ def add_poseflow_figures(input_detections, json_path):
     # NOTE: The image IDs must be sorted properly (not done in original PoseFlow)
     tracked_poses = 0
     image_ids = []
-    print("SORTING IMAGE IDS AND GETTING TOTAL TRACKED FIGURES")
+    logger.info("Sorting image IDs and getting total tracked figures")
     for image_id in pf_data:
         image_ids.append(image_id)
         for figure in pf_data[image_id]:
             if 'idx' in figure:
                 tracked_poses = max(int(figure['idx'])-1,tracked_poses)
-    print("TOTAL TRACKED POSES",tracked_poses+1)
+    logger.info("Total tracked poses %d", tracked_poses+1)
     #for image_id in pf_data:
     for image_id in sorted(image_ids):
         poses_series[i]['aligned_figures'] = []
@@ -1027,7 +1040,7 @@ def add_poseflow_figures(input_detections, json_path):
                 score = figure['scores']
                 keypoints = figure['keypoints']
                 aligned_keypoints = []
-                print("Adding keypoints for figure number",p,"ID is",figure['idx'])
+                logger.debug("Adding keypoints for figure number %d, ID is %s", p, figure['idx'])
                 for k in range(0,len(keypoints),3):
                     aligned_keypoints.append([keypoints[k], keypoints[k+1], keypoints[k+2]])
             else:
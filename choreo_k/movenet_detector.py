@@ -5,16 +5,15 @@ __all__ = ['display_img_array', 'Detection', 'Detector']
 
 # %% ../nbs/00_movenet_detector.ipynb 4
 import os
+import time
 from pathlib import Path
 
 import cv2
 # Some modules to display an animation using imageio.
 import imageio
-from IPython.display import HTML, display
 # Import matplotlib libraries
 from matplotlib import pyplot as plt
 from matplotlib.collections import LineCollection
-import matplotlib.patches as patches
 import numpy as np
 #from PIL import Image
 import tensorflow as tf
@@ -23,10 +22,15 @@ import tensorflow_hub as hub
 
 from io import BytesIO
 import PIL
-from IPython.display import display, Image, clear_output
+
+from choreo_k.paint import KEYPOINT_EDGE_INDS_TO_COLOR, paint_poses, blank_image, canvas_array, ImageWriter
+from choreo_k.instrument import timer, count
+from choreo_k.progress import Progress, logger
 
 
 def display_img_array(ima):
+    # IPython is only needed for notebook display, so headless runs don't require it
+    from IPython.display import display, Image
     im = PIL.Image.fromarray(ima)
     bio = BytesIO()
     im.save(bio, format='png')
@@ -48,30 +52,83 @@ class Detector:
         input_size: The input resolution of the model
         model_names: Shorthand dict of pose detection models that should be available
                      locally, with their local folder name and download URLs as values
+        tflite_model_names: The same for the TFLite versions of the models, which
+                            must be downloaded beforehand (see init_model)
+        backend: 'saved_model' (TensorFlow) or 'tflite' (TFLite interpreter)
     """
     
     model_names = { "movenet_singlepose_thunder": ["movenet_singlepose_thunder_4", "https://tfhub.dev/google/movenet/singlepose/thunder/4"],
                     "movenet_multipose_lightning": ["movenet_multipose_lightning_1", "https://tfhub.dev/google/movenet/multipose/lightning/1"]
                   }
+
+    tflite_model_names = { "movenet_singlepose_thunder": ["movenet_singlepose_thunder_float16_4.tflite", "https://tfhub.dev/google/lite-model/movenet/singlepose/thunder/tflite/float16/4?lite-format=tflite"],
+                           "movenet_singlepose_thunder_int8": ["movenet_singlepose_thunder_int8_4.tflite", "https://tfhub.dev/google/lite-model/movenet/singlepose/thunder/tflite/int8/4?lite-format=tflite"],
+                           "movenet_singlepose_lightning": ["movenet_singlepose_lightning_float16_4.tflite", "https://tfhub.dev/google/lite-model/movenet/singlepose/lightning/tflite/float16/4?lite-format=tflite"],
+                           "movenet_singlepose_lightning_int8": ["movenet_singlepose_lightning_int8_4.tflite", "https://tfhub.dev/google/lite-model/movenet/singlepose/lightning/tflite/int8/4?lite-format=tflite"],
+                           "movenet_multipose_lightning": ["movenet_multipose_lightning_float16_1.tflite", "https://tfhub.dev/google/lite-model/movenet/multipose/lightning/tflite/float16/1?lite-format=tflite"]
+                         }
+
+    BACKENDS = ['saved_model', 'tflite']
     
     
     def __init__(self):
         self.input_size = 256
-        print("Models available for loading via init_model(model_name=):\n" + "\n".join(list(self.model_names.keys())))
-        
-        
-    def init_model(self, model_url=None, model_name="movenet_singlepose_thunder"):
-        if model_url is not None:
-            print("Loading model at", model_url)
+        self.backend = 'saved_model'
+        logger.info("Models available for loading via init_model(model_name=):\n%s", "\n".join(list(self.model_names.keys())))
+        logger.info("TFLite models available for loading via init_model(model_name=, backend='tflite'):\n%s", "\n".join(list(self.tflite_model_names.keys())))
+        
+        
+    def init_model(self, model_url=None, model_name="movenet_singlepose_thunder", backend='saved_model', model_path=None, num_threads=None):
+        """ Loads a MoveNet model. With backend='saved_model', the TensorFlow
+            SavedModel is loaded from model_url, or from its local folder (see
+            model_names) if that exists, or else downloaded from TF Hub.
+            With backend='tflite', the TFLite model is run by the TFLite
+            interpreter, which uses the XNNPACK delegate on the CPU and is
+            usually several times faster there. The model is read from
+            model_path, or from its file (see tflite_model_names) in the
+            current folder; it is never downloaded. num_threads is the number
+            of CPU threads for the interpreter (default: all of them).
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError("Backend must be one of " + ", ".join(self.BACKENDS))
+        self.backend = backend
+        if backend == 'tflite':
+            self.__init_tflite_model__(model_name, model_path, num_threads)
+        elif model_url is not None:
+            logger.info("Loading model at %s", model_url)
             self.module = hub.load(model_url)
         else:
             if Path(self.model_names[model_name][0]).exists():
-                print("Loading", model_name, "from", self.model_names[model_name][0] + "/")
+                logger.info("Loading %s from %s/", model_name, self.model_names[model_name][0])
                 self.module = tf.saved_model.load(self.model_names[model_name][0])
             else:
-                print("Downloading", model_name, "from", self.model_names[model_name][1])
+                logger.info("Downloading %s from %s", model_name, self.model_names[model_name][1])
                 self.module = hub.load(self.model_names[model_name][1])
 
+
+    def __init_tflite_model__(self, model_name, model_path=None, num_threads=None):
+        if model_path is None:
+            if model_name not in self.tflite_model_names:
+                raise ValueError("TFLite model must be one of " + ", ".join(self.tflite_model_names))
+            model_path = self.tflite_model_names[model_name][0]
+            if not Path(model_path).exists():
+                raise ValueError("TFLite model file " + model_path + " not found; download it from " + self.tflite_model_names[model_name][1])
+        # The standalone runtime is much smaller than TensorFlow, so use it if it's installed
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            Interpreter = tf.lite.Interpreter
+        logger.info("Loading TFLite model %s with %d threads", model_path, num_threads or os.cpu_count())
+        self.interpreter = Interpreter(model_path=str(model_path), num_threads=num_threads or os.cpu_count())
+        self.interpreter.allocate_tensors()
+        input_details = self.interpreter.get_input_details()[0]
+        # Single-pose models have a fixed input size (192 for lightning, 256 for thunder);
+        # the multi-pose model's is dynamic, and it is resized to input_size when it's run
+        if input_details['shape_signature'][1] > 0:
+            self.input_size = int(input_details['shape'][1])
+        else:
+            self.input_size = 256
+
                 
     # Dictionary that maps from joint names to keypoint indices.
     KEYPOINT_DICT = {
@@ -95,26 +152,7 @@ class Detector:
     }
 
     # Maps bones to a matplotlib color name.
-    KEYPOINT_EDGE_INDS_TO_COLOR = {
-        (0, 1): 'm',
-        (0, 2): 'c',
-        (1, 3): 'm',
-        (2, 4): 'c',
-        (0, 5): 'm',
-        (0, 6): 'c',
-        (5, 7): 'm',
-        (7, 9): 'm',
-        (6, 8): 'c',
-        (8, 10): 'c',
-        (5, 6): 'y',
-        (5, 11): 'm',
-        (6, 12): 'c',
-        (11, 12): 'y',
-        (11, 13): 'm',
-        (13, 15): 'm',
-        (12, 14): 'c',
-        (14, 16): 'c'
-    }
+    KEYPOINT_EDGE_INDS_TO_COLOR = KEYPOINT_EDGE_INDS_TO_COLOR
 
     # Confidence score to determine whether a keypoint prediction is reliable.
     MIN_CROP_KEYPOINT_SCORE = 0.2
@@ -198,14 +236,11 @@ class Detector:
     
     
     def draw_predictions_on_image(self, image, detections, pose_confidence_scores=[], blank_background=False):
-        
-        im = self.__decode_image__(image).numpy()
-        
-        image_height, image_width, _ = im.shape
-        
-        unitized_detections = [self.__unitize_keypoints__(detection.data, image_height, image_width) for detection in detections]
-        
-        return self.__draw_predictions_on_image__(im, unitized_detections, pose_confidence_scores, blank_background=blank_background)
+        """ Draws the detections on a (BGR) video frame or image array; returns an RGB array """
+
+        im = cv2.cvtColor(np.asarray(image, dtype=np.uint8), cv2.COLOR_BGR2RGB)
+
+        return self.__draw_predictions_on_image__(im, [detection.data for detection in detections], pose_confidence_scores, blank_background=blank_background)
 
     
     def __draw_predictions_on_image__(self, image, detections, pose_confidence_scores, crop_region=None, output_image_height=None, output_image_width=None, blank_background=False, confidence_threshold=0.1):
@@ -215,7 +250,7 @@ class Detector:
             image: A numpy array with shape [height, width, channel] representing the
             pixel values of the input image.
             detections: An array of numpy arrays of shape [17, 3] representing
-            the keypoint coordinates and scores returned from the MoveNet model.
+            the keypoint coordinates (in pixels) and scores returned from the MoveNet model.
             pose_confidence_scores: confidence score (0 to 1) of every detection.
             crop_region: A dictionary that defines the coordinates of the bounding box
             of the crop region in normalized coordinates (see the init_crop_region
@@ -229,95 +264,40 @@ class Detector:
             conform with the aspect ratio of the input image (see output_image_height).
 
         Returns:
-            A numpy array with shape [out_height, out_width, channel] representing the
+            A uint8 numpy array with shape [out_height, out_width, channel] representing the
             image overlaid with keypoint predictions.
         """
         height, width, _ = image.shape
         aspect_ratio = float(width) / height
 
-        height_crop_ratio = 1
-        width_crop_ratio = 1
-        height_offset = 0
-        width_offset = 0
+        crop_x = 0
+        crop_y = 0
 
         if output_image_height is not None:
             if output_image_width is None:
                 output_image_width = int(output_image_height * aspect_ratio)
 
-            height_offset = int(height / 2) - int(output_image_height / 2)
-            width_offset = int(width / 2) - int(output_image_width / 2)
-
-            height_crop_ratio = float(height) / output_image_height
-            width_crop_ratio = float(width) / output_image_width
+            crop_y = max(0, int(height / 2) - int(output_image_height / 2))
+            crop_x = max(0, int(width / 2) - int(output_image_width / 2))
 
-            crop_y = max(0, height_offset)
-            crop_x = max(0, width_offset)
-
-            #output_image_width = int(output_image_height / height * width)
-            # image_from_plot = cv2.resize(
-            #     image_from_plot, dsize=(output_image_width, output_image_height),
-            #     interpolation=cv2.INTER_CUBIC)
             image = image[crop_y:min(height, crop_y+output_image_height), crop_x:min(width, crop_x+output_image_width)]
             height, width, _ = image.shape
-            aspect_ratio = float(width) / height  
-
-        fig, ax = plt.subplots(figsize=(12 * aspect_ratio, 12))
-        # To remove the huge white borders
-        fig.tight_layout(pad=0)
-        ax.margins(0)
-        ax.set_yticklabels([])
-        ax.set_xticklabels([])
-        plt.axis('off')
 
         if blank_background:
-            image = np.zeros([height,width,3],dtype=np.uint8)
-            image.fill(255)
-
-        im = ax.imshow(image)
-        
-        for f, keypoint_scores_array in enumerate(detections):
-            
-            if len(pose_confidence_scores) <= f or pose_confidence_scores[f] < confidence_threshold:
-                continue
-            #else:
-            #    print("Drawing figure with confidence score",pose_confidence_scores[f])
-            
-            line_segments = LineCollection([], linewidths=(4), linestyle='solid')
-            ax.add_collection(line_segments)
-            # Turn off tick labels
-            scat = ax.scatter([], [], s=60, color='#FF1493', zorder=3)
-        
-            keypoints_with_scores = tf.expand_dims(tf.expand_dims(keypoint_scores_array, axis=0), axis=0)
-            
-            (keypoint_locs, keypoint_edges,
-            edge_colors) = self.__keypoints_and_edges_for_display__(
-                keypoints_with_scores, height, width, height_crop_ratio, width_crop_ratio, height_offset, width_offset)
+            image = blank_image(height, width)
+        else:
+            image = np.array(image, dtype=np.uint8)
 
-            line_segments.set_segments(keypoint_edges)
-            line_segments.set_color(edge_colors)
-            if keypoint_edges.shape[0]:
-                line_segments.set_segments(keypoint_edges)
-                line_segments.set_color(edge_colors)
-            if keypoint_locs.shape[0]:
-                scat.set_offsets(keypoint_locs)
+        paint_poses(image, detections, pose_confidence_scores, y_first=True, pose_threshold=confidence_threshold, offset=(crop_x, crop_y))
 
         if crop_region is not None:
             xmin = max(crop_region['x_min'] * width, 0.0)
             ymin = max(crop_region['y_min'] * height, 0.0)
-            rec_width = min(crop_region['x_max'], 0.99) * width - xmin
-            rec_height = min(crop_region['y_max'], 0.99) * height - ymin
-            rect = patches.Rectangle(
-                (xmin,ymin),rec_width,rec_height,
-                linewidth=1,edgecolor='b',facecolor='none')
-            ax.add_patch(rect)
+            xmax = min(crop_region['x_max'], 0.99) * width
+            ymax = min(crop_region['y_max'], 0.99) * height
+            cv2.rectangle(image, (int(xmin), int(ymin)), (int(xmax), int(ymax)), (0, 0, 255), 1)
 
-        fig.canvas.draw()
-        image_from_plot = np.frombuffer(fig.canvas.tostring_rgb(), dtype=np.uint8)
-        image_from_plot = image_from_plot.reshape(
-            fig.canvas.get_width_height()[::-1] + (3,))
-        plt.close(fig)
-
-        return image_from_plot
+        return image
 
     # Disabled for nbdev
     # def __to_gif__(self, images, fps):
@@ -338,6 +318,7 @@ class Detector:
 
         
     def __progress__(self, value, max=100):
+        from IPython.display import HTML
         return HTML("""
             <progress
                 value='{value}'
@@ -504,10 +485,12 @@ class Detector:
         model output to the original image coordinate system.
         """
         image_height, image_width, _ = image.shape
-        input_image = self.__crop_and_resize__(
-            tf.expand_dims(image, axis=0), crop_region, crop_size=crop_size)
+        with timer('movenet.preprocess'):
+            input_image = self.__crop_and_resize__(
+                tf.expand_dims(image, axis=0), crop_region, crop_size=crop_size)
         # Run model inference.
-        inference_output = self.__detect__(input_image)
+        with timer('movenet.detect'):
+            inference_output = self.__detect__(input_image)
         
         pose_confidence_scores = []
 
@@ -572,6 +555,9 @@ class Detector:
         A multi-dimensional float numpy array representing the predicted keypoint
         coordinates and scores for the pose(s) detected in the image
         """
+        if self.backend == 'tflite':
+            return self.__detect_tflite__(input_image)
+
         model = self.module.signatures['serving_default']
 
         # SavedModel format expects tensor type of int32.
@@ -582,6 +568,19 @@ class Detector:
         # Or a [1, 6, 56] tensor for multi pose (up to 6)
         return outputs['output_0'].numpy()
 
+
+
+    def __detect_tflite__(self, input_image):
+        input_details = self.interpreter.get_input_details()[0]
+        if tuple(input_details['shape']) != tuple(input_image.shape):
+            self.interpreter.resize_tensor_input(input_details['index'], list(input_image.shape), strict=False)
+            self.interpreter.allocate_tensors()
+        # The float16 and int8 models both take uint8 pixels
+        self.interpreter.set_tensor(input_details['index'], np.asarray(input_image).astype(input_details['dtype']))
+        self.interpreter.invoke()
+        # Same shapes as the SavedModel's output
+        return self.interpreter.get_tensor(self.interpreter.get_output_details()[0]['index'])
+
                                               
     def __visualize_pose__(self, keypoints_with_scores, return_plot_as_image=False):
     
@@ -632,13 +631,9 @@ class Detector:
         if keypoint_locs.shape[0]:
             scat.set_offsets(keypoint_locs)
 
-        fig.canvas.draw()
-
         if return_plot_as_image:
 
-            image_from_plot = np.frombuffer(fig.canvas.tostring_rgb(), dtype=np.uint8)
-            image_from_plot = image_from_plot.reshape(
-                fig.canvas.get_width_height()[::-1] + (3,))
+            image_from_plot = canvas_array(fig)
             plt.close(fig)
 
             return image_from_plot
@@ -694,13 +689,9 @@ class Detector:
         if keypoint_locs.shape[0]:
             scat.set_offsets(keypoint_locs)
 
-        fig.canvas.draw()
-
         if return_plot_as_image:
 
-            image_from_plot = np.frombuffer(fig.canvas.tostring_rgb(), dtype=np.uint8)
-            image_from_plot = image_from_plot.reshape(
-                fig.canvas.get_width_height()[::-1] + (3,))
+            image_from_plot = canvas_array(fig)
             plt.close(fig)
 
             return image_from_plot
@@ -716,23 +707,21 @@ class Detector:
         output_overlay = None
         
         if len(keypoints_with_scores[0][0]) > 0:
-            if unitize_keypoints:
-                # Convert back to unit positions (0-1) rather than pixel positions
-                for idx in range(17):
-                    visual_keypoints_with_scores[0, 0, idx, 0] = keypoints_with_scores[0, 0, idx, 0] / image_height
-                    visual_keypoints_with_scores[0, 0, idx, 1] = keypoints_with_scores[0, 0, idx, 1] / image_width
+            if not unitize_keypoints:
+                # Convert unit positions (0-1) to pixel positions for drawing
+                visual_keypoints_with_scores[0, 0, :, 0] *= image_height
+                visual_keypoints_with_scores[0, 0, :, 1] *= image_width
 
             keypoint_scores_array = visual_keypoints_with_scores[0][0]
 
             if rescale_keypoints:
-                max_dim = max(image_height, image_width)
                 display_image = tf.cast(tf.image.resize_with_pad(
                     display_image, image_height, image_width), dtype=tf.int32)
                 output_overlay = self.__draw_predictions_on_image__(
-                    np.squeeze(display_image.numpy(), axis=0), keypoint_scores_array, output_image_height=image_height, output_image_width=image_width)
+                    np.squeeze(display_image.numpy(), axis=0), [keypoint_scores_array], [1.0], output_image_height=image_height, output_image_width=image_width)
             else:
                 output_overlay = self.__draw_predictions_on_image__(
-                    image_tensor.numpy(), keypoint_scores_array, output_image_height=image_height, output_image_width=image_width)
+                    image_tensor.numpy(), [keypoint_scores_array], [1.0], output_image_height=image_height, output_image_width=image_width)
 
         plt.figure(figsize=(5, 5))
         if output_overlay is not None:
@@ -761,11 +750,8 @@ class Detector:
                 
     def __get_frame_data__(self, im, crop_region=None, timecode=None, frame_count=1, images_too=False):
         """This code is duplicated between detect_webcam and detect_video"""
-        image_tensor = self.__decode_image__(im)
-
-        # Resize and pad the image to keep the aspect ratio and fit the expected size.
-        display_image = tf.expand_dims(image_tensor, axis=0)
-        display_image = tf.cast(tf.image.resize_with_pad(display_image, self.input_size, self.input_size), dtype=tf.int32)
+        with timer('movenet.decode'):
+            image_tensor = self.__decode_image__(im)
 
         image_height, image_width, _ = image_tensor.shape
 
@@ -773,7 +759,10 @@ class Detector:
             crop_region = self.__init_crop_region__(image_height, image_width)
 
         keypoints_with_scores, pose_confidence_scores = self.__run_inference__(image_tensor, crop_region, crop_size=[self.input_size, self.input_size])
-        crop_region = self.__determine_crop_region__(keypoints_with_scores, image_height, image_width)
+        with timer('movenet.crop_region'):
+            crop_region = self.__determine_crop_region__(keypoints_with_scores, image_height, image_width)
+        count('frames')
+        count('figures', len(keypoints_with_scores[0]))
 
         detections = [Detection(detection) for detection in keypoints_with_scores[0]]
 
@@ -813,10 +802,31 @@ class Detector:
         return [keypoints_with_scores, pose_confidence_scores]
 
                                               
-    def detect_webcam(self, max_frames=0, images_too=False):
+    def __score_frame__(self, this_frame_data, scorer):
+        """ Score the most confident figure in a frame with a LivePoseScorer """
+        figures = this_frame_data['figures']
+        if not len(figures):
+            return None
+        confidences = this_frame_data['confidences']
+        figure_index = int(np.argmax(confidences)) if len(confidences) == len(figures) else 0
+        coords_and_scores = np.asarray(figures[figure_index].data)
+        return scorer.score(coords_and_scores)
+
+
+    def detect_webcam(self, max_frames=0, images_too=False, scorer=None, callback=None, display_interval=10):
+        """ Runs pose detection on webcam frames until max_frames (if set) or a
+            KeyboardInterrupt, and returns the list of frame pose data.
+            If `scorer` is given (a choreo_k.align.LivePoseScorer, built from a reference
+            sequence or from cluster averages), the most confident pose in each frame is
+            scored as it arrives and the result is stored in the frame's 'score'.
+            Each frame's 'latency' is the time in seconds from reading the frame to
+            having its poses (and score); `callback`, if given, is called with the
+            frame pose data as soon as it is ready. Detections are drawn every
+            `display_interval` frames (0 to turn off drawing, e.g., for lowest latency).
+        """
         cap = cv2.VideoCapture(0)
         video_framerate = cap.get(cv2.CAP_PROP_FPS)
-        print('video FPS:',video_framerate)
+        logger.info('Video FPS: %s', video_framerate)
         frame_duration = 1 / float(video_framerate)
 
         frame_count = 0.0
@@ -825,22 +835,40 @@ class Detector:
         
         crop_region = None
         pose_output = []
+        latencies = []
         
         try:
             while cap.isOpened():
 
-                ret_val, im = cap.read()
+                with timer('video.read'):
+                    ret_val, im = cap.read()
+                frame_start = time.perf_counter()
 
                 timecode = frame_count * frame_duration
                 frame_count += 1
             
                 if (max_frames and frames_processed >= max_frames):
-                    return pose_output
+                    break
+
+                if not ret_val:
+                    logger.warning("Could not read from the webcam")
+                    break
 
                 this_frame_data, crop_region = self.__get_frame_data__(im, crop_region, timecode, frame_count, images_too)
+
+                if scorer is not None:
+                    with timer('webcam.score'):
+                        this_frame_data['score'] = self.__score_frame__(this_frame_data, scorer)
+
+                this_frame_data['latency'] = time.perf_counter() - frame_start
+                latencies.append(this_frame_data['latency'])
+
+                if callback is not None:
+                    callback(this_frame_data)
                     
                 # Periodically display detections during capture
-                if frame_count % 10 == 0:
+                if display_interval and frame_count % display_interval == 0:
+                    from IPython.display import clear_output
                     clear_output(wait=True)
                     image_plot = self.draw_predictions_on_image(im, this_frame_data['figures'], this_frame_data['confidences'])
                     display_img_array(image_plot)
@@ -852,15 +880,19 @@ class Detector:
                 frames_processed += 1
         
         except KeyboardInterrupt:
-            print("Capture stopped")
+            logger.info("Capture stopped")
             
         cap.release()
         plt.close('all')
+
+        if latencies:
+            logger.info("Per-frame latency: mean %.1f ms, 95th percentile %.1f ms (frame duration %.1f ms)",
+                        float(np.mean(latencies))*1000, float(np.percentile(latencies, 95))*1000, frame_duration*1000)
                 
         return pose_output
         
     
-    def detect_video(self, video_file, start_seconds=0.0, end_seconds=0.0, max_frames=0, seconds_to_skip=0.0, images_too=False, write_images=False, output_images_path='video_folder'):
+    def detect_video(self, video_file, start_seconds=0.0, end_seconds=0.0, max_frames=0, seconds_to_skip=0.0, images_too=False, write_images=False, output_images_path='video_folder', render_workers=0, image_format='png', image_quality=None):
         """ Given a video file, extracts video frames as images at `seconds_to_skip` intervals,
             from `start_seconds` to `end_seconds`, and runs `__detect_one_or_more_images__()` on each.
             Returns a list of frame pose data items, which are dictionaries with the following elements:
@@ -870,16 +902,20 @@ class Detector:
               <OPTIONAL> 'image': <a PIL image object for the frame>
             }
             `write_images`, if true, causes the extracted frame images to be written to a folder
-            specified by `output_images_path`, with the naming scheme `image00001.png`
+            specified by `output_images_path`, with the naming scheme `image00001.png`.
+            `image_format` may also be 'jpeg' or 'webp'; `image_quality` is the PNG compression
+            level (0-9) or JPEG/WebP quality (1-100). The images are drawn, encoded and saved
+            in the background, so detection doesn't wait for them; with `render_workers` > 0,
+            the drawing and encoding are done in that many separate processes.
         """
         
         cap = cv2.VideoCapture(video_file)
 
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        print('total frames in video:',total_frames)
+        logger.info('Total frames in video: %d', total_frames)
 
         video_framerate = cap.get(cv2.CAP_PROP_FPS)
-        print('video FPS:',video_framerate)
+        logger.info('Video FPS: %s', video_framerate)
         frame_duration = 1 / float(video_framerate)
 
         frame_count = 0.0
@@ -897,46 +933,52 @@ class Detector:
                 file_path = os.path.join(output_images_path, filename)
                 if os.path.isfile(file_path) or os.path.islink(file_path):
                     os.unlink(file_path)
+            image_writer = ImageWriter(output_images_path, image_format=image_format, quality=image_quality, processes=render_workers,
+                                       y_first=True, pose_threshold=0.1, bgr=True)
 
-        bar = display(self.__progress__(0, total_frames-1), display_id=True)
-        while cap.isOpened() and (frame_count < total_frames):
-            ret_val, im = cap.read()
+        progress = Progress(total_frames, 'Detecting poses in ' + os.path.basename(video_file))
+        # Flush the queued images and stop any render workers even if detection fails
+        try:
+            while cap.isOpened() and (frame_count < total_frames):
+                with timer('video.read'):
+                    ret_val, im = cap.read()
 
-            timecode = frame_count * frame_duration
-            frame_count += 1
+                timecode = frame_count * frame_duration
+                frame_count += 1
 
-            bar.update(self.__progress__(frame_count, total_frames-1))
+                progress.update()
 
-            if (end_seconds and timecode > end_seconds) or (max_frames and frames_processed >= max_frames):
-                return pose_output
+                if (end_seconds and timecode > end_seconds) or (max_frames and frames_processed >= max_frames):
+                    break
 
-            if timecode < start_seconds:
-                frames_processed += 1
-                continue
+                if timecode < start_seconds:
+                    frames_processed += 1
+                    continue
 
-            if im is None:
-                # Might want to retry here
-                # print("Missed a frame, continuing...")
-                # For now, we'll count a missed frame as a processed frame
-                continue
+                if im is None:
+                    # Might want to retry here
+                    # print("Missed a frame, continuing...")
+                    # For now, we'll count a missed frame as a processed frame
+                    continue
 
-            if seconds_to_skip and timecode < skip_until:
-                continue
-            else:
-                skip_until += seconds_to_skip
+                if seconds_to_skip and timecode < skip_until:
+                    continue
+                else:
+                    skip_until += seconds_to_skip
 
-            frame_id = int(round(cap.get(1)))
+                frame_id = int(round(cap.get(1)))
 
-            this_frame_data, crop_region = self.__get_frame_data__(im, crop_region, timecode, frame_count, images_too)
+                this_frame_data, crop_region = self.__get_frame_data__(im, crop_region, timecode, frame_count, images_too)
             
+                if write_images:
+                    with timer('write_images'):
+                        image_writer.write(frames_processed + 1, im, this_frame_data['figures'], this_frame_data['confidences'])
+
+                pose_output.append(this_frame_data)
+                frames_processed += 1
+        finally:
             if write_images:
-                output_image = self.draw_predictions_on_image(im, this_frame_data['figures'], this_frame_data['confidences'])
-                # Image doesn't necessarily come in as RGB(A)!
-                #rgbim = cv2.cvtColor(output_image, cv2.COLOR_BGR2RGBA)
-                pil_image = PIL.Image.fromarray(output_image)
-                pil_image.save(os.path.join(output_images_path, 'image' + str(int(frames_processed + 1)).zfill(5) + '.png'), 'PNG')
-
-            pose_output.append(this_frame_data)
-            frames_processed += 1
+                image_writer.close()
+            progress.close()
 
         return pose_output
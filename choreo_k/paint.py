@@ -0,0 +1,313 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/06_paint.ipynb.
+
+# %% auto 0
+__all__ = ['KEYPOINT_EDGE_INDS_TO_COLOR', 'COLOR_NAMES', 'KEYPOINT_COLOR', 'FIGURE_COLORS', 'EDGE_GROUPS', 'IMAGE_FORMATS',
+           'edge_color_groups', 'paint_poses', 'blank_image', 'canvas_array', 'render_frames', 'ParallelRenderer',
+           'image_encoding', 'ImageWriter']
+
+# %% ../nbs/06_paint.ipynb 3
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+
+# Maps bones to a matplotlib color name (as in the MoveNet tutorials):
+# magenta for the left side of the body, cyan for the right, yellow across
+KEYPOINT_EDGE_INDS_TO_COLOR = {
+    (0, 1): 'm',
+    (0, 2): 'c',
+    (1, 3): 'm',
+    (2, 4): 'c',
+    (0, 5): 'm',
+    (0, 6): 'c',
+    (5, 7): 'm',
+    (7, 9): 'm',
+    (6, 8): 'c',
+    (8, 10): 'c',
+    (5, 6): 'y',
+    (5, 11): 'm',
+    (6, 12): 'c',
+    (11, 12): 'y',
+    (11, 13): 'm',
+    (13, 15): 'm',
+    (12, 14): 'c',
+    (14, 16): 'c'
+}
+
+# RGB values of the matplotlib color names above
+COLOR_NAMES = {'m': (191, 0, 191), 'c': (0, 191, 191), 'y': (191, 191, 0), 'k': (0, 0, 0), 'w': (255, 255, 255),
+               'r': (255, 0, 0), 'g': (0, 128, 0), 'b': (0, 0, 255)}
+
+KEYPOINT_COLOR = (255, 20, 147) # '#FF1493'
+
+# One color per figure (RGB), for telling dancers apart
+FIGURE_COLORS = [(31, 119, 180), (255, 127, 14), (44, 160, 44), (214, 39, 40), (148, 103, 189),
+                 (140, 86, 75), (227, 119, 194), (127, 127, 127), (188, 189, 34), (23, 190, 207)]
+
+
+def edge_color_groups(edge_colors=KEYPOINT_EDGE_INDS_TO_COLOR):
+    """ Groups the edges by color, as [[RGB color, (edges, 2) keypoint index array], ...],
+        so that all of a figure's edges of one color can be drawn with one call
+    """
+    groups = {}
+    for edge, color in edge_colors.items():
+        groups.setdefault(color, []).append(edge)
+    return [[COLOR_NAMES.get(color, color), np.array(edges)] for color, edges in groups.items()]
+
+EDGE_GROUPS = edge_color_groups()
+
+
+def paint_poses(image, figures, pose_confidence_scores=None, y_first=False, keypoint_threshold=0.0, pose_threshold=0.0,
+                offset=(0, 0), line_width=4, marker_radius=5, color_by_figure=False, bgr=False, edge_groups=EDGE_GROUPS):
+    """ Draws skeletons straight onto a uint8 image array (in place; it is also
+        returned), instead of rendering and rasterizing a matplotlib figure.
+        figures are detections (anything with a .data attribute) or (17, 3)
+        arrays of keypoint coordinates in image pixels plus confidences: [x, y, c]
+        (openpifpaf), or [y, x, c] if y_first (MoveNet). Keypoints with confidence
+        <= keypoint_threshold are left out, as are whole figures whose pose
+        confidence score is < pose_threshold. offset (x, y) is subtracted from the
+        keypoint positions, e.g., if the image is a crop of the original frame.
+        Edges are colored as in KEYPOINT_EDGE_INDS_TO_COLOR or, if color_by_figure,
+        in one FIGURE_COLORS color per figure. Colors are RGB; set bgr=True when
+        drawing on images in OpenCV's BGR channel order.
+    """
+    def channels(color):
+        return tuple(int(c) for c in (color[::-1] if bgr else color))
+
+    keypoint_color = channels(KEYPOINT_COLOR)
+
+    for f, figure in enumerate(figures):
+        data = np.asarray(figure.data if hasattr(figure, 'data') else figure)
+        if data.shape[0] == 0:
+            continue
+        if pose_confidence_scores is not None and (len(pose_confidence_scores) <= f or pose_confidence_scores[f] < pose_threshold):
+            continue
+
+        xy = data[:,[1,0]] if y_first else data[:,:2]
+        visible = (data[:,2] > keypoint_threshold) & np.isfinite(xy).all(axis=1)
+        points = np.zeros(xy.shape, dtype=np.int32)
+        points[visible] = np.round(xy[visible] - offset)
+
+        for color, edges in edge_groups:
+            segments = points[edges[visible[edges].all(axis=1)]]
+            if len(segments):
+                line_color = channels(FIGURE_COLORS[f % len(FIGURE_COLORS)] if color_by_figure else color)
+                cv2.polylines(image, list(segments), False, line_color, line_width, cv2.LINE_AA)
+
+        for x, y in points[visible]:
+            cv2.circle(image, (int(x), int(y)), marker_radius, keypoint_color, -1, cv2.LINE_AA)
+
+    return image
+
+
+def blank_image(height, width, color=(255, 255, 255)):
+    """ A plain uint8 image to draw poses on when there is no background """
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = color
+    return image
+
+
+def canvas_array(fig, alpha=False):
+    """ Draws a matplotlib figure and returns its pixels as a (height, width, 4)
+        RGBA, or (height, width, 3) RGB, NumPy view of the Agg canvas buffer,
+        without copying it. The view shows the canvas's current contents, so copy
+        it if the figure will be drawn again and the old image is still needed.
+    """
+    fig.canvas.draw()
+    rgba = np.asarray(fig.canvas.buffer_rgba())
+    return rgba if alpha else rgba[:,:,:3]
+
+
+def render_frames(batch, paint_options={}, encoding=None, encode_params=()):
+    """ Rendering task for one batch of [frame index, image, figures,
+        pose_confidence_scores] items: paints the poses onto each image and, if an
+        encoding (e.g., '.png') is given, encodes it with cv2.imencode().
+        Returns [[frame index, image or encoded buffer], ...].
+    """
+    rendered = []
+    for index, image, figures, pose_confidence_scores in batch:
+        image = paint_poses(image, figures, pose_confidence_scores, **paint_options)
+        if encoding is not None:
+            success, image = cv2.imencode(encoding, image, list(encode_params))
+            if not success:
+                raise ValueError("Could not encode frame " + str(index) + " as " + encoding)
+        rendered.append([index, image])
+    return rendered
+
+
+class ParallelRenderer:
+    """ Paints poses onto frames in a pool of worker processes and passes the
+        results, in frame order, to sink(frame index, image or encoded buffer),
+        e.g., a cv2.VideoWriter's write or a function that saves image files.
+        Frames are sent to the workers in batches of batch_size; once
+        max_pending batches are in flight, submit() waits for the oldest one, so
+        memory use stays bounded however fast the frames arrive. workers=0 renders
+        in the calling process instead. Use as a context manager, or call close()
+        to finish rendering and writing the remaining frames. The workers are
+        started with 'spawn', so scripts that use it need a __main__ guard.
+        paint_options are passed to paint_poses().
+    """
+
+    def __init__(self, sink, workers=None, batch_size=8, max_pending=None, encoding=None, encode_params=(), **paint_options):
+        self.sink = sink
+        self.workers = os.cpu_count() if workers is None else workers
+        self.batch_size = batch_size
+        self.max_pending = max(1, 2 * self.workers) if max_pending is None else max_pending
+        self.task_options = {'paint_options': paint_options, 'encoding': encoding, 'encode_params': encode_params}
+        self.executor = None
+        if self.workers > 0:
+            # Each worker is one process; keep OpenCV from starting more threads in each.
+            # The detectors' frameworks don't survive being forked, so use fresh processes
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=cv2.setNumThreads, initargs=(1,))
+        self.batch = []
+        self.pending = deque()
+        self.frames_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, index, image, figures, pose_confidence_scores=None):
+        """ Queue a frame for rendering; figures may be detections or (17, 3) arrays """
+        figures = [np.asarray(figure.data if hasattr(figure, 'data') else figure) for figure in figures]
+        if self.executor is None:
+            # Don't paint over the caller's frame (workers get their own copies)
+            image = image.copy()
+        self.batch.append([index, image, figures, pose_confidence_scores])
+        if len(self.batch) >= self.batch_size:
+            self.__dispatch__()
+
+    def __dispatch__(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        if self.executor is None:
+            self.__write__(render_frames(batch, **self.task_options))
+            return
+        while len(self.pending) >= self.max_pending:
+            self.__write__(self.pending.popleft().result())
+        self.pending.append(self.executor.submit(render_frames, batch, **self.task_options))
+        # Write whatever is already finished, without waiting
+        while self.pending and self.pending[0].done():
+            self.__write__(self.pending.popleft().result())
+
+    def __write__(self, rendered):
+        for index, output in rendered:
+            self.sink(index, output)
+            self.frames_written += 1
+
+    def close(self):
+        """ Render and write all remaining frames, then stop the workers """
+        try:
+            self.__dispatch__()
+            while self.pending:
+                self.__write__(self.pending.popleft().result())
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
+
+
+# Image file formats: [file extension, OpenCV encoding parameter for the quality setting]
+IMAGE_FORMATS = {'png': ['.png', cv2.IMWRITE_PNG_COMPRESSION],
+                 'jpeg': ['.jpg', cv2.IMWRITE_JPEG_QUALITY],
+                 'jpg': ['.jpg', cv2.IMWRITE_JPEG_QUALITY],
+                 'webp': ['.webp', cv2.IMWRITE_WEBP_QUALITY]}
+
+def image_encoding(image_format='png', quality=None):
+    """ Returns [file extension, cv2.imencode() parameters] for an image format in
+        IMAGE_FORMATS. quality is the zlib compression level (0-9) for PNG and the
+        quality (1-100) for JPEG and WebP; if None, OpenCV's default is used.
+    """
+    if image_format.lower() not in IMAGE_FORMATS:
+        raise ValueError("Image format must be one of " + ", ".join(IMAGE_FORMATS.keys()))
+    extension, parameter = IMAGE_FORMATS[image_format.lower()]
+    return [extension, [] if quality is None else [parameter, int(quality)]]
+
+
+class ImageWriter:
+    """ Saves (pose overlay) images to output_path as image00001.png etc. on
+        background threads, so that the caller, e.g., a pose detection loop,
+        doesn't wait on painting, encoding or disk I/O. At most max_queued images
+        wait to be written; beyond that, write() blocks until there is room.
+        If processes > 0, the poses are instead painted and encoded in that many
+        worker processes (see ParallelRenderer) and the threads only write the
+        files. paint_options are passed to paint_poses(). Call close() (or use
+        as a context manager) to wait for every image to be written; any error
+        raised while writing is re-raised then.
+    """
+
+    def __init__(self, output_path, image_format='png', quality=None, threads=2, max_queued=16, processes=0, **paint_options):
+        self.output_path = output_path
+        self.extension, self.encode_params = image_encoding(image_format, quality)
+        self.paint_options = paint_options
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.errors = []
+        self.threads = [threading.Thread(target=self.__work__, daemon=True) for t in range(max(1, threads))]
+        for thread in self.threads:
+            thread.start()
+        self.renderer = None
+        if processes:
+            self.renderer = ParallelRenderer(lambda index, encoded: self.queue.put([index, encoded, True, None, None]), workers=processes,
+                                             encoding=self.extension, encode_params=self.encode_params, **paint_options)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def filename(self, index):
+        return os.path.join(self.output_path, 'image' + str(int(index)).zfill(5) + self.extension)
+
+    def write(self, index, image, figures=None, pose_confidence_scores=None):
+        """ Queue an image to be saved as filename(index), with the figures painted on it (if given) """
+        if self.errors:
+            raise self.errors[0]
+        if self.renderer is not None and figures is not None:
+            self.renderer.submit(index, image, figures, pose_confidence_scores)
+        else:
+            self.queue.put([index, image, False, figures, pose_confidence_scores])
+
+    def __work__(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                index, data, encoded, figures, pose_confidence_scores = item
+                if not encoded:
+                    if figures is not None:
+                        data = paint_poses(np.array(data, dtype=np.uint8), figures, pose_confidence_scores, **self.paint_options)
+                    success, data = cv2.imencode(self.extension, data, self.encode_params)
+                    if not success:
+                        raise ValueError("Could not encode image " + str(index) + " as " + self.extension)
+                data.tofile(self.filename(index))
+            except Exception as e:
+                self.errors.append(e)
+            finally:
+                self.queue.task_done()
+
+    def close(self):
+        """ Wait until all queued images have been written, then stop the threads """
+        try:
+            if self.renderer is not None:
+                self.renderer.close()
+                self.renderer = None
+        finally:
+            for thread in self.threads:
+                self.queue.put(None)
+            for thread in self.threads:
+                thread.join()
+            self.threads = []
+        if self.errors:
+            raise self.errors[0]
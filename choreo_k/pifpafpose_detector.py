@@ -1,7 +1,7 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/00_pifpafpose_detector.ipynb.
 
 # %% auto 0
-__all__ = ['Detector']
+__all__ = ['OnnxModel', 'Detector']
 
 # %% ../nbs/00_pifpafpose_detector.ipynb 4
 import torch
@@ -14,31 +14,127 @@ import PIL
 import io
 import numpy as np
 
+from choreo_k.paint import paint_poses, ImageWriter
+from choreo_k.instrument import timer, count
+from choreo_k.progress import Progress, logger
+
 #%matplotlib inline
 
 openpifpaf.show.Canvas.show = True
 openpifpaf.show.Canvas.image_min_dpi = 200
 
+class OnnxModel:
+    """Runs an openpifpaf network exported to ONNX (see Detector.export_onnx) with
+    ONNX Runtime, in place of the PyTorch model in an openpifpaf.Predictor, so
+    that openpifpaf's own preprocessing and CIF/CAF decoding are still used.
+    
+    Attributes:  
+      session: ONNX Runtime inference session  
+      head_metas: The head metadata of the original PyTorch model  
+    """
+    
+    def __init__(self, model_path, head_metas, num_threads=None, device=torch.device('cpu')):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        # 0 lets ONNX Runtime use all of the (physical) cores
+        options.intra_op_num_threads = num_threads or 0
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = ['CPUExecutionProvider']
+        if device.type == 'cuda' and 'CUDAExecutionProvider' in onnxruntime.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+        self.session = onnxruntime.InferenceSession(str(model_path), sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.head_metas = head_metas
+
+    def __call__(self, image_batch, *args, **kwargs):
+        outputs = self.session.run(None, {self.input_name: image_batch.cpu().numpy()})
+        # The decoder expects the heads' fields as tensors
+        return [torch.from_numpy(output) for output in outputs]
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+
 class Detector:
     """Given a still image (or video frame), finds poses.
     
     Attributes:  
       device: PyTorch computing resource (GPU or CPU)  
-      net: Pose detection neural network model  
-      processor: Pose detection image processor  
+      predictor: openpifpaf Predictor that runs the model and decodes its output  
+      backend: 'torch' (PyTorch) or 'onnx' (ONNX Runtime, for the network only)  
     """
     
-    def __init__(self):
-        try:
-            self.device = torch.device('cuda')  # if cuda is available
-        except:
-            self.device = torch.device('cpu')
+    BACKENDS = ['torch', 'onnx']
+    
+    def __init__(self, device=None):
+        # torch.device('cuda') succeeds even without a GPU, so check for one
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = torch.device(device)
+        self.backend = 'torch'
 
-    def init_model(self, model_url=None, model_name="resnet50", decoder="cifcaf"):
+    def init_model(self, model_url=None, model_name="resnet50", decoder="cifcaf", backend='torch', model_path=None, num_threads=None):
+        """ Loads an openpifpaf model (checkpoint). With backend='onnx', the network
+            is run by ONNX Runtime from the ONNX file at model_path (default:
+            <model_name>.onnx in the current folder, which is exported from the
+            checkpoint if it doesn't exist yet), which is usually faster on the
+            CPU and uses less memory than PyTorch; the decoding is the same.
+            num_threads is the number of CPU threads for inference (default: all).
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError("Backend must be one of " + ", ".join(self.BACKENDS))
         #self.predictor = openpifpaf.Predictor(checkpoint='shufflenetv2k30-wholebody')
         #self.predictor = openpifpaf.Predictor(checkpoint='shufflenetv2k30')
         self.decoder = decoder # other decoder option="posesimilarity"
-        self.predictor = openpifpaf.Predictor(checkpoint=model_name)
+        self.backend = backend
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+        # The Predictor moves the model to its device while it's being constructed, so
+        # set that first. ONNX Runtime only needs the PyTorch model on the CPU, for the export.
+        # The device is a class setting, so put it back for any other Predictors
+        # (this one keeps its device as an instance attribute)
+        predictor_device = torch.device('cpu') if backend == 'onnx' else self.device
+        default_device = getattr(openpifpaf.Predictor, 'device', None)
+        openpifpaf.Predictor.device = predictor_device
+        try:
+            self.predictor = openpifpaf.Predictor(checkpoint=model_name)
+        finally:
+            openpifpaf.Predictor.device = default_device
+        self.predictor.device = predictor_device
+        if backend == 'onnx':
+            if model_path is None:
+                model_path = model_name + ".onnx"
+            if not os.path.exists(model_path):
+                self.export_onnx(model_path)
+            logger.info("Loading ONNX model %s", model_path)
+            self.predictor.model = OnnxModel(model_path, self.predictor.model_cpu.head_metas, num_threads=num_threads, device=self.device)
+
+    def export_onnx(self, model_path, opset_version=11):
+        """ Exports the loaded model's network to an ONNX file, with a dynamic batch
+            size and image size, for init_model(backend='onnx').
+        """
+        model = self.predictor.model_cpu
+        model.eval()
+        # Trace on the CPU, like the example input (and then put the model back)
+        model_device = next(model.parameters()).device
+        model.cpu()
+        output_names = [head_meta.name for head_meta in model.head_metas]
+        dynamic_axes = {'input_batch': {0: 'batch', 2: 'height', 3: 'width'}}
+        for name in output_names:
+            dynamic_axes[name] = {0: 'batch', 3: 'field_height', 4: 'field_width'}
+        logger.info("Exporting the model to %s", model_path)
+        # Write to a temporary file first, so other processes never load a partial one
+        temporary_path = str(model_path) + '.partial'
+        with torch.no_grad():
+            torch.onnx.export(model, torch.zeros((1, 3, 385, 513)), temporary_path, input_names=['input_batch'],
+                              output_names=output_names, dynamic_axes=dynamic_axes, opset_version=opset_version)
+        model.to(model_device)
+        os.replace(temporary_path, model_path)
 
     def detect_image(self, image_path, viz=False):
         """ Applies the pose detection model to a single image file. Returns detections. """
@@ -102,9 +198,15 @@ class Detector:
     
     def overlay_poses(self, image_array, figures_frame, show=False, source_figure='figures', show_axis=False, savepath=""):
         return self.plot_poses(figures_frame[source_figure], image_array, show=show, show_axis=show_axis, savepath=savepath)
+
+    def draw_poses(self, image_array, detections, keypoint_threshold=0.0, bgr=True):
+        """ Draws the detections onto a copy of an image array (by default, a BGR video
+            frame) with OpenCV; much faster than plot_poses(), which uses matplotlib
+        """
+        return paint_poses(np.array(image_array, dtype=np.uint8), detections, keypoint_threshold=keypoint_threshold, bgr=bgr)
     
     
-    def detect_video(self, video_file, start_seconds=0.0, end_seconds=0.0, max_frames=0, seconds_to_skip=0.0, images_too=False, write_images=False, output_images_path='video_folder'):
+    def detect_video(self, video_file, start_seconds=0.0, end_seconds=0.0, max_frames=0, seconds_to_skip=0.0, images_too=False, write_images=False, output_images_path='video_folder', render_workers=0, image_format='png', image_quality=None):
         """ Given a video file, extracts video frames as images at `seconds_to_skip` intervals,
             from `start_seconds` to `end_seconds`, and runs `__detect_one_or_more_images__()` on each.
             Returns a list of frame pose data items, which are dictionaries with the following elements:
@@ -114,7 +216,11 @@ class Detector:
               <OPTIONAL> 'image': <a PIL image object for the frame>
             }
             `write_images`, if true, causes the extracted frame images to be written to a folder
-            specified by `output_images_path`, with the naming scheme `image00001.png`
+            specified by `output_images_path`, with the naming scheme `image00001.png`.
+            `image_format` may also be 'jpeg' or 'webp'; `image_quality` is the PNG compression
+            level (0-9) or JPEG/WebP quality (1-100). The images are drawn, encoded and saved
+            in the background, so detection doesn't wait for them; with `render_workers` > 0,
+            the drawing and encoding are done in that many separate processes.
         """
         
         GC_INTERVAL = 1000
@@ -122,10 +228,10 @@ class Detector:
         cap = cv2.VideoCapture(video_file)
 
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        print('total frames in video:',total_frames)
+        logger.info('Total frames in video: %d', total_frames)
 
         video_framerate = cap.get(cv2.CAP_PROP_FPS)
-        print('video FPS:',video_framerate)
+        logger.info('Video FPS: %s', video_framerate)
         frame_duration = 1 / float(video_framerate)
 
         frame_count = 0.0
@@ -142,54 +248,67 @@ class Detector:
                 file_path = os.path.join(output_images_path, filename)
                 if os.path.isfile(file_path) or os.path.islink(file_path):
                     os.unlink(file_path)
+            image_writer = ImageWriter(output_images_path, image_format=image_format, quality=image_quality, processes=render_workers,
+                                       bgr=True)
+
+        progress = Progress(total_frames, 'Detecting poses in ' + os.path.basename(video_file))
+        # Flush the queued images and stop any render workers even if detection fails
+        try:
+            while cap.isOpened() and (frame_count < total_frames):
+                with timer('video.read'):
+                    ret_val, im = cap.read()
 
-        bar = display(self.__progress__(0, total_frames-1), display_id=True)
-        while cap.isOpened() and (frame_count < total_frames):
-            ret_val, im = cap.read()
+                timecode = frame_count * frame_duration
+                frame_count += 1
 
-            timecode = frame_count * frame_duration
-            frame_count += 1
+                progress.update()
 
-            bar.update(self.__progress__(frame_count, total_frames-1))
+                if (end_seconds and timecode > end_seconds) or (max_frames and frames_processed >= max_frames):
+                    break
 
-            if (end_seconds and timecode > end_seconds) or (max_frames and frames_processed >= max_frames):
-                return pose_output
+                if timecode < start_seconds:
+                    continue
 
-            if timecode < start_seconds:
-                continue
+                if im is None:
+                    # Might want to retry here
+                    # print("Missed a frame, continuing...")
+                    # For now, we'll count a missed frame as a processed frame
+                    continue
 
-            if im is None:
-                # Might want to retry here
-                # print("Missed a frame, continuing...")
-                # For now, we'll count a missed frame as a processed frame
-                continue
+                if seconds_to_skip and timecode < skip_until:
+                    continue
+                else:
+                    skip_until += seconds_to_skip
 
-            if seconds_to_skip and timecode < skip_until:
-                continue
-            else:
-                skip_until += seconds_to_skip
+                im_height, im_width, im_channels = im.shape
 
-            im_height, im_width, im_channels = im.shape
+                frame_id = int(round(cap.get(1)))
 
-            frame_id = int(round(cap.get(1)))
+                # Image doesn't necessarily come in as RGB(A)!
+                with timer('pifpaf.preprocess'):
+                    rgbim = cv2.cvtColor(im, cv2.COLOR_BGR2RGBA)
+                    pil_image = PIL.Image.fromarray(rgbim)
 
-            # Image doesn't necessarily come in as RGB(A)!
-            rgbim = cv2.cvtColor(im, cv2.COLOR_BGR2RGBA)
-            pil_image = PIL.Image.fromarray(rgbim)
+                with timer('pifpaf.detect'):
+                    detections = self.__detect_pil_image__(pil_image)
+                count('frames')
+                count('figures', len(detections))
 
-            detections = self.__detect_pil_image__(pil_image)
+                logger.debug("Frame %d of %d at %.2fs: %d figures", frame_count, total_frames, timecode, len(detections))
 
-            print("Frame",frame_count,"of",total_frames,round(timecode,2),"figures",len(detections))
+                this_frame_data = {'frame_id': frame_count, 'time': timecode, 'figures': detections} #, 'flipped_figures': flipped_detections, 'zeroified_figures': zeroified_detections}
+                if images_too:
+                    this_frame_data['image'] = rgbim
+                if write_images:
+                    with timer('write_images'):
+                        image_writer.write(frames_processed + 1, im, detections)
+                    del im, rgbim, pil_image
 
-            this_frame_data = {'frame_id': frame_count, 'time': timecode, 'figures': detections} #, 'flipped_figures': flipped_detections, 'zeroified_figures': zeroified_detections}
-            if images_too:
-                this_frame_data['image'] = rgbim
+                pose_output.append(this_frame_data)
+                frames_processed += 1
+        finally:
             if write_images:
-                savepath = os.path.join(output_images_path, 'image' + str(int(frames_processed + 1)).zfill(5) + '.png')
-                self.overlay_poses(im, this_frame_data, source_figure='figures', savepath=savepath)
-                del im, rgbim, pil_image
-
-            pose_output.append(this_frame_data)
-            frames_processed += 1
+                image_writer.close()
+            progress.close()
 
         return pose_output
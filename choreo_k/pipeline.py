@@ -0,0 +1,428 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/11_pipeline.ipynb.
+
+# %% auto 0
+__all__ = ['PIPELINE_VERSION', 'VIDEO_EXTENSIONS', 'DETECTORS', 'DETECTOR_BACKENDS', 'PIPELINE_STAGES', 'find_videos',
+           'video_outputs', 'pipeline_config', 'video_signature', 'read_summary', 'is_up_to_date', 'load_detector',
+           'pixel_coordinates', 'analyze_poses', 'process_video', 'run_pipeline', 'index_outputs', 'print_report',
+           'main']
+
+# %% ../nbs/11_pipeline.ipynb 3
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from choreo_k.modify import TOTAL_COORDS, interpolate_missing_coords
+from choreo_k.analyze import get_feature_vectors, movements_time_series, compare_multiple, cluster_poses, CLUSTER_METHODS
+from choreo_k.matrixify import FLOAT_DTYPES
+from choreo_k.store import save_poses, load_poses
+from choreo_k.benchmark import run_benchmarks, compare_benchmarks, precision_report
+from choreo_k.search import PoseIndex, load_index
+from choreo_k.progress import Progress, logger, set_log_level
+
+
+# Headless batch processing of a folder of videos. Each video gets its own output
+# folder (mirroring the input folder's layout) holding:
+#   poses/         the raw detections, as a pose store (see choreo_k.store)
+#   analysis.npz   pose features, movements, inter-dancer similarities, clusters
+#   summary.json   the settings, status and statistics of the latest run; a video
+#                  is only considered done once its summary says so
+
+# Version 2: MoveNet keypoints are no longer rescaled (they were already pixels)
+PIPELINE_VERSION = 2
+
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv', '.m4v', '.webm', '.mpg', '.mpeg']
+
+DETECTORS = ['movenet', 'pifpaf']
+# Inference backends of each detector; the first is the default
+DETECTOR_BACKENDS = {'movenet': ['saved_model', 'tflite'], 'pifpaf': ['torch', 'onnx']}
+
+PIPELINE_STAGES = ['detect', 'interpolate', 'features', 'movement', 'similarity', 'clustering']
+
+
+def find_videos(input_path, extensions=VIDEO_EXTENSIONS, recursive=True):
+    """ The video files in a folder (and its subfolders, if recursive), sorted;
+        input_path can also be a single video file.
+    """
+    if os.path.isfile(input_path):
+        return [input_path]
+    videos = []
+    for folder, subfolders, files in os.walk(input_path):
+        subfolders.sort()
+        videos.extend(os.path.join(folder, name) for name in sorted(files) if os.path.splitext(name)[1].lower() in extensions)
+        if not recursive:
+            break
+    return videos
+
+
+def video_outputs(video_file, input_path, output_path):
+    """ Paths of the per-video outputs, in a folder of output_path named for the
+        video's location relative to input_path
+    """
+    if os.path.isfile(input_path):
+        input_path = os.path.dirname(input_path)
+    relative = os.path.splitext(os.path.relpath(video_file, input_path))[0]
+    folder = os.path.join(output_path, relative)
+    return {'folder': folder,
+            'poses': os.path.join(folder, 'poses'),
+            'analysis': os.path.join(folder, 'analysis.npz'),
+            'summary': os.path.join(folder, 'summary.json')}
+
+
+def pipeline_config(detector='movenet', model_name=None, backend=None, model_path=None, threshold=.5, cluster_method='kmeans',
+                    min_samples=50, n_clusters=50, dtype='float32', num_threads=None):
+    """ The settings that determine a video's outputs, split into those that
+        affect the detections and those that only affect the analysis, so that
+        changing the analysis settings doesn't rerun the pose detection.
+        dtype is the precision of the features and the saved results (see
+        matrixify.FEATURE_DTYPE). The 'runtime' settings, like the detector's
+        number of CPU threads (num_threads), don't affect the outputs.
+    """
+    if detector not in DETECTORS:
+        raise ValueError("Detector must be one of " + ", ".join(DETECTORS))
+    if backend is None:
+        backend = DETECTOR_BACKENDS[detector][0]
+    if backend not in DETECTOR_BACKENDS[detector]:
+        raise ValueError("The " + detector + " backend must be one of " + ", ".join(DETECTOR_BACKENDS[detector]))
+    if cluster_method not in CLUSTER_METHODS:
+        raise ValueError("Clustering method must be one of " + ", ".join(CLUSTER_METHODS))
+    if np.dtype(dtype).name not in FLOAT_DTYPES:
+        raise ValueError("dtype must be one of " + ", ".join(FLOAT_DTYPES))
+    return {'version': PIPELINE_VERSION,
+            'detect': {'detector': detector, 'model_name': model_name, 'backend': backend, 'model_path': model_path},
+            'analyze': {'threshold': threshold, 'cluster_method': cluster_method, 'min_samples': min_samples, 'n_clusters': n_clusters,
+                        'dtype': np.dtype(dtype).name},
+            'runtime': {'num_threads': num_threads}}
+
+
+def video_signature(video_file):
+    stat = os.stat(video_file)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def read_summary(summary_file):
+    if not os.path.exists(summary_file):
+        return None
+    try:
+        with open(summary_file) as json_file:
+            return json.load(json_file)
+    except ValueError:
+        return None
+
+
+def is_up_to_date(video_file, outputs, config, stage='analyze'):
+    """ Whether a video's outputs from an earlier run can be reused: the run must
+        have finished, the video must not have changed since, and the settings
+        (for the detections only, if stage='detect') must be the same.
+    """
+    summary = read_summary(outputs['summary'])
+    if summary is None or not summary.get('detected') or summary.get('video_signature') != video_signature(video_file):
+        return False
+    # Summaries from before the backends were added used the default ones
+    detect_config = dict({'backend': DETECTOR_BACKENDS[config['detect']['detector']][0], 'model_path': None}, **summary['config']['detect'])
+    if summary['config']['version'] != config['version'] or detect_config != config['detect']:
+        return False
+    if stage == 'detect':
+        return os.path.exists(os.path.join(outputs['poses'], 'header.json'))
+    return summary['status'] == 'ok' and summary['config']['analyze'] == config['analyze'] and os.path.exists(outputs['analysis'])
+
+
+# Each worker process loads its pose detection model once and reuses it
+__detectors__ = {}
+
+def load_detector(detector='movenet', model_name=None, backend=None, model_path=None, num_threads=None):
+    """ A (cached) pose detector with its model loaded. The detector modules are
+        imported here, so that only the chosen one's framework is needed.
+    """
+    key = (detector, model_name, backend, model_path, num_threads)
+    if key not in __detectors__:
+        if detector == 'movenet':
+            from choreo_k.movenet_detector import Detector
+        else:
+            from choreo_k.pifpafpose_detector import Detector
+        pose_detector = Detector()
+        # Only pass the options that were set, so each detector's own defaults apply
+        model_options = {'model_name': model_name, 'backend': backend, 'model_path': model_path, 'num_threads': num_threads}
+        pose_detector.init_model(**{option: value for option, value in model_options.items() if value is not None})
+        __detectors__[key] = pose_detector
+    return __detectors__[key]
+
+
+def pixel_coordinates(pose_data, figure_type='figures'):
+    """ MoveNet gives [y, x, confidence] keypoints (already scaled to pixels by
+        the detector); reorders them (in place) to the [x, y, confidence] order
+        that the modify and analyze functions expect. Frames without the
+        y_first flag are unchanged.
+    """
+    for frame in pose_data:
+        if not frame.get('y_first', False):
+            continue
+        for figure in frame.get(figure_type, []):
+            data = np.asarray(figure.data, dtype=float)
+            if data.shape[0] == TOTAL_COORDS:
+                figure.data = data[:,[1,0,2]]
+        frame['y_first'] = False
+    return pose_data
+
+
+def analyze_poses(pose_data, threshold=.5, cluster_method='kmeans', min_samples=50, n_clusters=50, dtype='float32', stage_seconds=None):
+    """ The analysis stages of the pipeline, for one video's pose series. Returns
+        [arrays, statistics]: the arrays to save in analysis.npz (in the given
+        dtype, except for the times, labels and descriptors) and a dict of
+        summary statistics. Stage times are added to stage_seconds, if given.
+    """
+    stage_seconds = {} if stage_seconds is None else stage_seconds
+    def timed_stage(stage, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        stage_seconds[stage] = stage_seconds.get(stage, 0) + time.perf_counter() - start
+        return result
+
+    # interpolate_missing_coords() also adds the flipped and zeroified figures
+    frames = timed_stage('interpolate', interpolate_missing_coords, pose_data, threshold=threshold)
+
+    features, descriptors = timed_stage('features', get_feature_vectors, frames, 'zeroified_figures', dtype=dtype)
+    movements, frame_times, max_figures = timed_stage('movement', movements_time_series, frames, figure_type='flipped_figures')
+    similarity_means, similarity_stdevs = timed_stage('similarity', compare_multiple, frames, figure_type='flipped_figures', dtype=dtype)
+
+    # Too few poses to cluster: every pose is noise
+    labels = np.full(len(descriptors), -1)
+    enough_poses = len(descriptors) >= (n_clusters if cluster_method == 'kmeans' else min_samples)
+    if enough_poses:
+        labels, descriptors = timed_stage('clustering', cluster_poses, frames, 'zeroified_figures', min_samples=min_samples,
+                                          method=cluster_method, n_clusters=n_clusters, n_jobs=1, dtype=dtype)
+    labels = np.asarray(labels)
+
+    arrays = {'features': np.asarray(features, dtype=dtype).reshape(-1, TOTAL_COORDS*(TOTAL_COORDS-1)//2),
+              'descriptors': np.asarray(descriptors, dtype=np.int64).reshape(-1, 2),
+              'labels': labels,
+              'frame_times': np.asarray(frame_times, dtype=float),
+              'movements': np.asarray(movements, dtype=dtype),
+              'similarity_means': np.asarray(similarity_means, dtype=dtype),
+              'similarity_stdevs': np.asarray(similarity_stdevs, dtype=dtype)}
+    statistics = {'frames': len(frames),
+                  'max_figures': int(max_figures),
+                  'poses': len(arrays['descriptors']),
+                  'clusters': int(len(np.unique(labels[labels >= 0]))),
+                  'clustered_poses': int((labels >= 0).sum()),
+                  'mean_movement': None if np.isnan(movements).all() else float(np.nanmean(movements))}
+    return [arrays, statistics]
+
+
+def process_video(video_file, input_path, output_path, config, force=False):
+    """ Runs the whole pipeline on one video (reusing up-to-date outputs unless
+        force=True) and returns its summary. Errors are caught and reported in
+        the summary, so that one bad video doesn't stop a batch.
+    """
+    outputs = video_outputs(video_file, input_path, output_path)
+    if not force and is_up_to_date(video_file, outputs, config):
+        summary = read_summary(outputs['summary'])
+        summary['status'] = 'skipped'
+        return summary
+
+    start = time.perf_counter()
+    stage_seconds = {}
+    summary = {'video': video_file,
+               'output_folder': outputs['folder'],
+               'video_signature': video_signature(video_file),
+               'config': config,
+               'created': datetime.datetime.now().isoformat(timespec='seconds'),
+               'detected': False}
+    try:
+        os.makedirs(outputs['folder'], exist_ok=True)
+        if not force and is_up_to_date(video_file, outputs, config, stage='detect'):
+            logger.info("Reusing the detections for %s", video_file)
+            pose_data = load_poses(outputs['poses'])
+            summary['detected'] = True
+        else:
+            logger.info("Detecting poses in %s", video_file)
+            # An interrupted run must not leave a summary vouching for partial detections
+            if os.path.exists(outputs['summary']):
+                os.remove(outputs['summary'])
+            detect_start = time.perf_counter()
+            pose_detector = load_detector(**config['detect'], **config.get('runtime', {}))
+            pose_data = pixel_coordinates(pose_detector.detect_video(video_file))
+            save_poses(pose_data, outputs['poses'])
+            stage_seconds['detect'] = time.perf_counter() - detect_start
+            summary['detected'] = True
+
+        arrays, statistics = analyze_poses(pose_data, stage_seconds=stage_seconds, **config['analyze'])
+        # Write to a temporary file first, so a partial analysis is never left behind
+        temporary_file = outputs['analysis'][:-len('.npz')] + '.partial.npz'
+        np.savez_compressed(temporary_file, **arrays)
+        os.replace(temporary_file, outputs['analysis'])
+
+        summary.update(statistics)
+        summary['status'] = 'ok'
+    except Exception as error:
+        summary['status'] = 'error'
+        summary['error'] = repr(error)
+        summary['traceback'] = traceback.format_exc()
+        logger.error("Failed to process %s: %r", video_file, error)
+
+    summary['stage_seconds'] = stage_seconds
+    summary['seconds'] = time.perf_counter() - start
+    # A failed run's summary still records whether its detections can be reused
+    if os.path.isdir(outputs['folder']):
+        with open(outputs['summary'], 'w') as json_file:
+            json.dump(summary, json_file, indent=1)
+    return summary
+
+
+def run_pipeline(input_path, output_path, workers=1, force=False, report_file=None, **config_options):
+    """ Processes every video in input_path (see find_videos), writing the per-video
+        outputs to output_path. With workers > 1, the videos are processed in that
+        many separate processes (each loading its own model). Returns the report,
+        a dict with the summary of each video, and also writes it to report_file
+        (default: pipeline_report.json in output_path).
+    """
+    config = pipeline_config(**config_options)
+    if workers > 1 and config['runtime']['num_threads'] is None:
+        # Share the CPUs between the workers rather than have each one use them all
+        config['runtime']['num_threads'] = max(1, (os.cpu_count() or 1) // workers)
+    videos = find_videos(input_path)
+    os.makedirs(output_path, exist_ok=True)
+    logger.info("Processing %d videos with %d workers", len(videos), workers)
+
+    start = time.perf_counter()
+    summaries = []
+    progress = Progress(len(videos), 'Processing videos')
+    if workers > 1 and len(videos) > 1:
+        # The deep learning frameworks don't survive being forked, so use fresh processes
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(process_video, video_file, input_path, output_path, config, force) for video_file in videos]
+            for future in as_completed(futures):
+                summaries.append(future.result())
+                progress.update(status=summaries[-1]['status'])
+    else:
+        for video_file in videos:
+            summaries.append(process_video(video_file, input_path, output_path, config, force))
+            progress.update(status=summaries[-1]['status'])
+    progress.close()
+
+    summaries.sort(key=lambda summary: summary['video'])
+    statuses = [summary['status'] for summary in summaries]
+    report = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+              'input_path': input_path,
+              'output_path': output_path,
+              'config': config,
+              'workers': workers,
+              'seconds': time.perf_counter() - start,
+              'processed': statuses.count('ok'),
+              'skipped': statuses.count('skipped'),
+              'failed': statuses.count('error'),
+              'videos': summaries}
+    with open(os.path.join(output_path, 'pipeline_report.json') if report_file is None else report_file, 'w') as json_file:
+        json.dump(report, json_file, indent=1)
+    return report
+
+
+def index_outputs(output_path, index_path, n_lists=None, threshold=0.0):
+    """ Adds the detections of every video in a pipeline output folder to the
+        pose search index at index_path (creating it if needed), skipping the
+        videos it already holds, and saves it. If n_lists is given, the index is
+        (re)trained with that many lists; an index that was trained before puts
+        the new poses into its existing lists. Returns the index.
+    """
+    existing = os.path.exists(os.path.join(index_path, 'header.json'))
+    index = load_index(index_path) if existing else PoseIndex()
+    for folder, subfolders, files in os.walk(output_path):
+        subfolders.sort()
+        if os.path.basename(folder) != 'poses' or 'header.json' not in files:
+            continue
+        video = os.path.relpath(os.path.dirname(folder), output_path)
+        if video in index.videos:
+            continue
+        logger.info("Indexing %s: %d poses", video, index.add_store(folder, video, threshold=threshold))
+    if n_lists is not None:
+        index.train(n_lists)
+    index.save(index_path)
+    return index
+
+
+def print_report(report):
+    """ Prints a pipeline report as a table of the videos, then the totals """
+    for summary in report['videos']:
+        if summary['status'] == 'error':
+            print(summary['status'].upper().ljust(8), summary['video'], summary['error'])
+        else:
+            print(summary['status'].upper().ljust(8), summary['video'], summary.get('frames'), "frames",
+                  summary.get('poses'), "poses", summary.get('clusters'), "clusters", round(summary.get('seconds', 0), 1), "s")
+    print(len(report['videos']), "videos:", report['processed'], "processed,", report['skipped'], "skipped,",
+          report['failed'], "failed in", round(report['seconds'], 1), "s")
+
+
+def main(argv=None):
+    """ The choreo_k command: `choreo_k run` for the batch pipeline, `choreo_k
+        index` to build a pose search index from its outputs, `choreo_k
+        benchmark` for the benchmarks. Returns the exit status (1 if any video failed).
+    """
+    parser = argparse.ArgumentParser(prog='choreo_k', description='Pose detection and analysis for choreography videos')
+    parser.add_argument('--log-level', default='INFO', help='DEBUG, INFO, WARNING or ERROR')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Detect and analyze the poses in a folder of videos')
+    run.add_argument('input_path', help='Video file, or folder of videos (searched recursively)')
+    run.add_argument('output_path', help='Folder for the per-video outputs and the report')
+    run.add_argument('--workers', type=int, default=1, help='Number of videos to process at once')
+    run.add_argument('--detector', default='movenet', choices=DETECTORS)
+    run.add_argument('--model-name', default=None, help="Detector model (default: the detector's own)")
+    run.add_argument('--backend', default=None, help='Inference backend: saved_model or tflite (movenet), torch or onnx (pifpaf); default: the first')
+    run.add_argument('--model-path', default=None, help='Local model file for the tflite and onnx backends')
+    run.add_argument('--threads', type=int, default=None, help='CPU threads per worker for inference (default: all)')
+    run.add_argument('--threshold', type=float, default=.5, help='Confidence threshold for keypoint interpolation')
+    run.add_argument('--cluster-method', default='kmeans', choices=CLUSTER_METHODS)
+    run.add_argument('--min-samples', type=int, default=50)
+    run.add_argument('--clusters', type=int, default=50, help='Number of clusters (kmeans)')
+    run.add_argument('--dtype', default='float32', choices=FLOAT_DTYPES, help='Precision of the features and saved results')
+    run.add_argument('--force', action='store_true', help='Reprocess videos even if their outputs are up to date')
+    run.add_argument('--report', default=None, help='Report file (default: pipeline_report.json in output_path)')
+
+    index = commands.add_parser('index', help="Add the poses in a run's outputs to a pose search index")
+    index.add_argument('output_path', help="Output folder of one or more 'choreo_k run's")
+    index.add_argument('index_path', help='Index folder (created if needed)')
+    index.add_argument('--lists', type=int, default=None, help='(Re)train the index with this many inverted lists')
+    index.add_argument('--threshold', type=float, default=0.0, help='Minimum mean keypoint confidence of indexed poses')
+
+    benchmark = commands.add_parser('benchmark', help='Time the analysis functions on synthetic pose data')
+    benchmark.add_argument('names', nargs='*', help='Benchmarks to run (default: all)')
+    benchmark.add_argument('--repeats', type=int, default=3)
+    benchmark.add_argument('--output', default=None, help='JSON file for the results')
+    benchmark.add_argument('--baseline', default=None, help='Earlier results JSON file to compare with')
+    benchmark.add_argument('--precision', action='store_true', help='Report the accuracy of float32/float16 features instead')
+
+    args = parser.parse_args(argv)
+    set_log_level(args.log_level.upper(), stream=sys.stderr)
+
+    if args.command == 'index':
+        index = index_outputs(args.output_path, args.index_path, n_lists=args.lists, threshold=args.threshold)
+        print(len(index), "poses from", len(index.videos), "videos in", args.index_path)
+        return 0
+
+    if args.command == 'benchmark' and args.precision:
+        precision_report(output_file=args.output)
+        return 0
+
+    if args.command == 'benchmark':
+        report = run_benchmarks(args.names or None, repeats=args.repeats, output_file=args.output)
+        if args.baseline is not None:
+            compare_benchmarks(args.baseline, report)
+        return 0
+
+    report = run_pipeline(args.input_path, args.output_path, workers=args.workers, force=args.force, report_file=args.report,
+                          detector=args.detector, model_name=args.model_name, backend=args.backend, model_path=args.model_path,
+                          num_threads=args.threads, threshold=args.threshold,
+                          cluster_method=args.cluster_method, min_samples=args.min_samples, n_clusters=args.clusters, dtype=args.dtype)
+    print_report(report)
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/10_progress.ipynb.
+
+# %% auto 0
+__all__ = ['logger', 'progress_callbacks', 'set_log_level', 'in_notebook', 'Progress']
+
+# %% ../nbs/10_progress.ipynb 3
+import logging
+import sys
+import time
+
+
+# Detailed (per-frame, per-figure) messages are logged to this at DEBUG level.
+# Nothing below WARNING is shown unless set_log_level() is called.
+logger = logging.getLogger('choreo_k')
+logger.addHandler(logging.NullHandler())
+
+def set_log_level(level='INFO', stream=None):
+    """ Show choreo_k's log messages of at least `level` (e.g., 'DEBUG' for the
+        per-frame details) on stream (default: stdout)
+    """
+    if not any(getattr(handler, 'choreo_k_handler', False) for handler in logger.handlers):
+        handler = logging.StreamHandler(sys.stdout if stream is None else stream)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s', '%H:%M:%S'))
+        handler.choreo_k_handler = True
+        logger.addHandler(handler)
+    logger.setLevel(level)
+
+
+def in_notebook():
+    """ True when running in a Jupyter kernel """
+    if 'IPython' not in sys.modules:
+        return False
+    shell = sys.modules['IPython'].get_ipython()
+    return shell is not None and 'IPKernelApp' in shell.config
+
+
+# Functions called as callback(state) with every progress report (see Progress)
+progress_callbacks = []
+
+
+class Progress:
+    """ Progress reporting for long loops that is rate-limited to one report every
+        `interval` seconds (plus one at the end), however often update() is
+        called. In a notebook, it updates a single HTML progress bar; elsewhere it
+        rewrites one line on stderr (or logs a line, if stderr isn't a terminal).
+        Each report is also passed as a dict (description, count, total, elapsed,
+        rate and any keyword arguments given to update()) to `callback` and the
+        functions in progress_callbacks, e.g., for job monitoring.
+        Set Progress.enabled = False to turn off the displays (callbacks still run).
+    """
+
+    enabled = True
+    interval = 1.0
+
+    def __init__(self, total=None, description='', interval=None, callback=None):
+        self.total = total
+        self.description = description
+        self.interval = Progress.interval if interval is None else interval
+        self.callback = callback
+        self.count = 0
+        self.start = time.monotonic()
+        self.last_report = None
+        self.last_count = None
+        self.display_handle = None
+        self.notebook = Progress.enabled and in_notebook()
+        self.terminal = hasattr(sys.stderr, 'isatty') and sys.stderr.isatty()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def update(self, n=1, **info):
+        self.count += n
+        now = time.monotonic()
+        if self.last_report is None or now - self.last_report >= self.interval or self.count == self.total:
+            self.__report__(now, info)
+
+    def state(self, now, info):
+        elapsed = now - self.start
+        state = {'description': self.description, 'count': self.count, 'total': self.total,
+                 'elapsed': elapsed, 'rate': self.count / elapsed if elapsed > 0 else 0.0}
+        state.update(info)
+        return state
+
+    def __report__(self, now, info, final=False):
+        self.last_report = now
+        self.last_count = self.count
+        state = self.state(now, info)
+        for callback in ([self.callback] if self.callback is not None else []) + progress_callbacks:
+            callback(state)
+        if not Progress.enabled:
+            return
+
+        of_total = "" if not self.total else f"/{self.total} ({100 * self.count / self.total:.0f}%)"
+        message = f"{self.description}: {self.count}{of_total} {state['rate']:.1f}/s"
+        if self.total and 0 < self.count < self.total and state['rate'] > 0:
+            message += f", {(self.total - self.count) / state['rate']:.0f}s left"
+
+        if self.notebook:
+            from IPython.display import HTML, display
+            html = HTML(f"<progress value='{self.count}' max='{self.total or max(self.count, 1)}' style='width: 50%'></progress> {message}")
+            if self.display_handle is None:
+                self.display_handle = display(html, display_id=True)
+            else:
+                self.display_handle.update(html)
+        elif self.terminal:
+            sys.stderr.write("\r" + message + ("\n" if final else ""))
+            sys.stderr.flush()
+        else:
+            logger.info(message)
+
+    def close(self):
+        """ Make the final report, unless the last one was already up to date """
+        if self.last_count != self.count:
+            self.__report__(time.monotonic(), {}, final=True)
+        elif self.terminal and Progress.enabled and not self.notebook:
+            sys.stderr.write("\n")
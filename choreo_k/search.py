@@ -0,0 +1,380 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/12_search.ipynb.
+
+# %% auto 0
+__all__ = ['INDEX_FORMAT', 'INDEX_VERSION', 'INDEX_FIELDS', 'FEATURE_LENGTH', 'pose_features', 'descriptor_keys', 'top_matches',
+           'PoseIndex', 'load_index']
+
+# %% ../nbs/12_search.ipynb 3
+import json
+import os
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+from choreo_k.modify import TOTAL_COORDS
+from choreo_k.matrixify import matrixify_poses, stack_poses, standardize_pose_matrices
+from choreo_k.store import PoseStore
+
+
+# A pose search index holds one vector per pose: its condensed distance matrix
+# (as from matrixify_poses), standardized so that the dot product of two vectors
+# is the Pearson (Mantel) correlation of the two poses. Each pose is described by
+# [video, frame, figure], where video indexes the index's list of video names and
+# frame is the pose's position in its video's pose series.
+#
+# Searches are exact (a chunked matrix product over all of the vectors) until the
+# index is trained, after which they are approximate: the vectors are partitioned
+# into n_lists inverted lists by their nearest k-means centroid, and a query only
+# scores the vectors in the n_probe lists with the closest centroids.
+#
+# Saved indexes are folders of .npy files plus a header.json, like pose stores.
+
+INDEX_FORMAT = 'choreo_k.pose_index'
+INDEX_VERSION = 1
+INDEX_FIELDS = ['vectors', 'descriptors', 'times', 'list_ids']
+FEATURE_LENGTH = TOTAL_COORDS * (TOTAL_COORDS - 1) // 2
+
+
+def pose_features(poses):
+    """ Search vectors for poses shaped (..., TOTAL_COORDS, 2+), as float32 rows of
+        FEATURE_LENGTH. Poses with missing keypoints get NaN rows.
+    """
+    return standardize_pose_matrices(matrixify_poses(poses, dtype=np.float32), np.float32)
+
+
+def descriptor_keys(descriptors):
+    """ Packs [video, frame, figure] descriptors into single sortable integers,
+        ordered by video, then figure, then frame, so that key + n is the same
+        figure n frames later
+    """
+    descriptors = np.asarray(descriptors, dtype=np.int64).reshape(-1, 3)
+    return (descriptors[:,0] << 40) | (descriptors[:,2] << 32) | descriptors[:,1]
+
+
+def top_matches(scores, k):
+    """ Column indices of the k highest scores in each row, best first (NaNs last) """
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((len(scores), 0), dtype=np.int64)
+    top = np.argpartition(-scores, k-1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1)
+
+
+class PoseIndex:
+    """ Similarity search over the poses of many videos (see the notes above).
+        n_lists is the number of inverted lists that train() will use by default.
+    """
+
+    def __init__(self, n_lists=256):
+        self.n_lists = n_lists
+        self.videos = []
+        self.centroids = None
+        self.size = 0
+        self.__data__ = {'vectors': np.zeros((0, FEATURE_LENGTH), dtype=np.float32),
+                         'descriptors': np.zeros((0, 3), dtype=np.int64),
+                         'times': np.zeros(0),
+                         'list_ids': np.zeros(0, dtype=np.int32)}
+        self.__lookups__ = {}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def vectors(self):
+        return self.__data__['vectors'][:self.size]
+
+    @property
+    def descriptors(self):
+        return self.__data__['descriptors'][:self.size]
+
+    @property
+    def times(self):
+        return self.__data__['times'][:self.size]
+
+    @property
+    def list_ids(self):
+        return self.__data__['list_ids'][:self.size]
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def __reserve__(self, count):
+        """ Grows the arrays (to at least double their size) if count more poses won't fit.
+            Arrays loaded with mmap are copied into memory the first time.
+        """
+        capacity = len(self.__data__['vectors'])
+        if self.size + count <= capacity and all(array.flags.writeable for array in self.__data__.values()):
+            return
+        capacity = max(2 * capacity, self.size + count, 1024)
+        for field, array in self.__data__.items():
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self.__data__[field] = grown
+
+    def video_id(self, video):
+        """ The index of a video name in self.videos, adding it if it's new """
+        if video not in self.videos:
+            self.videos.append(video)
+        return self.videos.index(video)
+
+    def add(self, poses, video, frames, figures=None, times=None):
+        """ Adds poses (keypoint arrays shaped (n, TOTAL_COORDS, 2+), or search
+            vectors from pose_features()) from one video, with their frame
+            positions and figure indices (default 0) and times (default NaN).
+            Poses with missing keypoints are skipped. Returns the number added.
+        """
+        poses = np.asarray(poses)
+        vectors = poses.astype(np.float32) if poses.shape[-1] == FEATURE_LENGTH else pose_features(poses)
+        vectors = vectors.reshape(-1, FEATURE_LENGTH)
+        count = len(vectors)
+        figures = np.zeros(count, dtype=np.int64) if figures is None else figures
+        times = np.full(count, np.nan) if times is None else times
+        descriptors = np.column_stack([np.full(count, self.video_id(video)), frames, figures]).astype(np.int64)
+        times = np.asarray(times, dtype=float)
+
+        present = ~np.isnan(vectors).any(axis=1)
+        vectors, descriptors, times = vectors[present], descriptors[present], times[present]
+
+        self.__reserve__(len(vectors))
+        stop = self.size + len(vectors)
+        self.__data__['vectors'][self.size:stop] = vectors
+        self.__data__['descriptors'][self.size:stop] = descriptors
+        self.__data__['times'][self.size:stop] = times
+        if self.trained:
+            self.__data__['list_ids'][self.size:stop] = self.__assign__(vectors)
+        self.size = stop
+        self.__lookups__ = {}
+        return len(vectors)
+
+    def add_pose_series(self, pose_series, video, figure_type='figures', threshold=0.0, chunk_size=10000):
+        """ Adds every figure of a pose series (e.g., from detect_video) whose mean
+            keypoint confidence is above threshold. Returns the number added.
+        """
+        added = 0
+        for start in range(0, len(pose_series), chunk_size):
+            chunk = pose_series[start:start+chunk_size]
+            added += self.__add_stacked__(stack_poses(chunk, figure_type), video, start,
+                                          [frame.get('time', np.nan) for frame in chunk], threshold)
+        return added
+
+    def add_store(self, path, video=None, threshold=0.0, chunk_size=100000):
+        """ Adds the poses of a pose store (see choreo_k.store) a chunk at a time,
+            under the video name `video` (default: the store's path)
+        """
+        store = PoseStore(path)
+        added = 0
+        for start in range(0, len(store), chunk_size):
+            added += self.__add_stacked__(np.asarray(store.keypoints[start:start+chunk_size], dtype=float),
+                                          path if video is None else video, start, store.times[start:start+chunk_size], threshold)
+        return added
+
+    def __add_stacked__(self, poses, video, start, times, threshold):
+        # Missing figures have NaN confidences, which are never above the threshold
+        frames, figures = np.nonzero(poses[...,2].mean(axis=-1) > threshold)
+        return self.add(pose_features(poses[frames, figures]), video, start + frames, figures, np.asarray(times, dtype=float)[frames])
+
+    def train(self, n_lists=None, sample_size=100000, seed=0):
+        """ Partitions the vectors into n_lists (default: self.n_lists) inverted
+            lists, using k-means on a sample of sample_size of them. Poses added
+            afterwards go into the list of their nearest centroid, so the index
+            only needs to be retrained if the poses change character.
+        """
+        self.n_lists = self.n_lists if n_lists is None else n_lists
+        if self.size < self.n_lists:
+            raise ValueError("At least " + str(self.n_lists) + " poses are needed to train " + str(self.n_lists) + " lists")
+        rng = np.random.default_rng(seed)
+        sample = self.vectors[np.sort(rng.choice(self.size, min(sample_size, self.size), replace=False))]
+        kmeans = MiniBatchKMeans(n_clusters=self.n_lists, batch_size=4096, n_init=3, random_state=seed).fit(sample)
+        # The vectors have unit length, so the centroids are too (spherical k-means)
+        centroids = kmeans.cluster_centers_
+        self.centroids = (centroids / np.linalg.norm(centroids, axis=1, keepdims=True)).astype(np.float32)
+        self.__reserve__(0)
+        self.__data__['list_ids'][:self.size] = self.__assign__(self.vectors)
+        self.__lookups__ = {}
+
+    def __assign__(self, vectors, chunk_size=100000):
+        list_ids = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            list_ids[start:start+chunk_size] = np.argmax(vectors[start:start+chunk_size] @ self.centroids.T, axis=1)
+        return list_ids
+
+    def __lookup__(self, name):
+        """ Derived arrays, rebuilt after the index changes: 'lists' holds the rows
+            sorted by list and each list's offset, 'keys' the sorted descriptor keys
+        """
+        if name not in self.__lookups__:
+            if name == 'lists':
+                order = np.argsort(self.list_ids, kind='stable')
+                offsets = np.searchsorted(self.list_ids[order], np.arange(self.n_lists + 1))
+                self.__lookups__[name] = [order, offsets]
+            else:
+                keys = descriptor_keys(self.descriptors)
+                order = np.argsort(keys, kind='stable')
+                self.__lookups__[name] = [keys[order], order]
+        return self.__lookups__[name]
+
+    def __rows__(self, keys):
+        """ The rows with the given descriptor keys, -1 where there is none """
+        sorted_keys, order = self.__lookup__('keys')
+        positions = np.minimum(np.searchsorted(sorted_keys, keys), max(len(sorted_keys) - 1, 0))
+        if len(sorted_keys) == 0:
+            return np.full(len(keys), -1)
+        return np.where(sorted_keys[positions] == keys, order[positions], -1)
+
+    def __queries__(self, poses):
+        poses = np.asarray(poses)
+        if poses.shape[-1] == FEATURE_LENGTH:
+            return poses.astype(np.float32).reshape(-1, FEATURE_LENGTH)
+        return pose_features(poses.reshape((-1,) + poses.shape[-2:]))
+
+    def __candidates__(self, query, n_probe):
+        """ Rows in the n_probe lists whose centroids are closest to the query """
+        order, offsets = self.__lookup__('lists')
+        lists = top_matches((self.centroids @ query)[np.newaxis], n_probe)[0]
+        return np.concatenate([order[offsets[l]:offsets[l+1]] for l in lists])
+
+    def search(self, poses, k=10, n_probe=8, exact=False, chunk_size=262144):
+        """ The k poses most similar to each query pose (a keypoint array shaped
+            (TOTAL_COORDS, 2+), or a stack of them, or search vectors). The search
+            is exact if the index isn't trained or exact=True; otherwise it scores
+            the poses in n_probe lists per query.
+            Returns [correlations, descriptors], shaped (queries, k) and
+            (queries, k, 3), or (k) and (k, 3) for a single pose; missing results
+            have NaN correlations and -1 descriptors.
+        """
+        single = np.asarray(poses).ndim == (1 if np.asarray(poses).shape[-1] == FEATURE_LENGTH else 2)
+        queries = np.nan_to_num(self.__queries__(poses))
+        correlations = np.full((len(queries), k), np.nan, dtype=np.float32)
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+
+        if exact or not self.trained:
+            for start in range(0, self.size, chunk_size):
+                chunk_scores = queries @ self.vectors[start:start+chunk_size].T
+                chunk_rows = top_matches(chunk_scores, k) + start
+                merged_rows = np.concatenate([rows, chunk_rows], axis=1)
+                merged_scores = np.concatenate([correlations, np.take_along_axis(chunk_scores, chunk_rows - start, axis=1)], axis=1)
+                best = top_matches(merged_scores, k)
+                rows = np.take_along_axis(merged_rows, best, axis=1)
+                correlations = np.take_along_axis(merged_scores, best, axis=1)
+        else:
+            for q, query in enumerate(queries):
+                candidates = self.__candidates__(query, n_probe)
+                scores = self.vectors[candidates] @ query
+                best = top_matches(scores[np.newaxis], k)[0]
+                rows[q, :len(best)] = candidates[best]
+                correlations[q, :len(best)] = scores[best]
+
+        correlations[rows < 0] = np.nan
+        descriptors = np.full(rows.shape + (3,), -1, dtype=np.int64)
+        descriptors[rows >= 0] = self.descriptors[rows[rows >= 0]]
+        if single:
+            return [correlations[0], descriptors[0]]
+        return [correlations, descriptors]
+
+    def search_sequence(self, poses, k=10, n_probe=8, exact=False, min_coverage=.5, candidates_per_pose=None):
+        """ The k stretches of the indexed videos that best match a short sequence
+            of poses (keypoint arrays shaped (frames, TOTAL_COORDS, 2+), or search
+            vectors), frame for frame. A stretch's score is the mean correlation of
+            its poses with the query's, over the frames in which the same figure is
+            present (at least min_coverage of them). Overlapping matches of the
+            same figure are suppressed in favor of the best one.
+            Unless the search is exact, the stretches considered are those starting
+            at (the position of) one of each query pose's best matches.
+            Returns [scores, descriptors] of the stretches' first poses.
+        """
+        queries = self.__queries__(poses)
+        length = len(queries)
+        present = ~np.isnan(queries).any(axis=1)
+
+        if exact or not self.trained:
+            start_keys = descriptor_keys(self.descriptors)
+        else:
+            candidates_per_pose = 4 * k if candidates_per_pose is None else candidates_per_pose
+            start_keys = []
+            for offset in np.nonzero(present)[0]:
+                _, matches = self.search(queries[offset], candidates_per_pose, n_probe)
+                # Stretches can't start before the beginning of a video
+                matches = matches[(matches[:,0] >= 0) & (matches[:,1] >= offset)]
+                start_keys.append(descriptor_keys(matches) - offset)
+            start_keys = np.unique(np.concatenate(start_keys)) if start_keys else np.zeros(0, dtype=np.int64)
+
+        totals = np.zeros(len(start_keys))
+        counts = np.zeros(len(start_keys), dtype=int)
+        for offset in np.nonzero(present)[0]:
+            rows = self.__rows__(start_keys + offset)
+            found = rows >= 0
+            totals[found] += self.vectors[rows[found]] @ queries[offset]
+            counts += found
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores = np.where(counts >= max(min_coverage * present.sum(), 1), totals / counts, np.nan)
+
+        # Best first, keeping only stretches that don't overlap a better one
+        video_figures = start_keys >> 32
+        frames = start_keys & 0xFFFFFFFF
+        kept = []
+        for s in np.argsort(-np.nan_to_num(scores, nan=-np.inf), kind='stable'):
+            if len(kept) == k or np.isnan(scores[s]):
+                break
+            if not any(video_figures[s] == video_figures[t] and abs(frames[s] - frames[t]) < length for t in kept):
+                kept.append(s)
+
+        result_scores = np.full(k, np.nan)
+        result_descriptors = np.full((k, 3), -1, dtype=np.int64)
+        kept = np.array(kept, dtype=int)
+        result_scores[:len(kept)] = scores[kept]
+        result_descriptors[:len(kept)] = np.column_stack([start_keys[kept] >> 40, frames[kept], video_figures[kept] & 0xFF])
+        return [result_scores, result_descriptors]
+
+    def describe(self, descriptors):
+        """ The video name, frame position, figure and time of search results """
+        keys = descriptor_keys(descriptors)
+        rows = self.__rows__(keys) if self.size else np.full(len(keys), -1)
+        return [{'video': self.videos[video], 'frame': int(frame), 'figure': int(figure), 'time': float(self.times[row]) if row >= 0 else None}
+                for (video, frame, figure), row in zip(np.asarray(descriptors).reshape(-1, 3), rows) if video >= 0]
+
+    def save(self, path):
+        """ Writes the index to a folder. Each file is written under a temporary
+            name and then moved into place, so an index can be saved over the
+            (memory-mapped) files it was loaded from.
+        """
+        os.makedirs(path, exist_ok=True)
+        arrays = {field: getattr(self, field) for field in INDEX_FIELDS}
+        if self.trained:
+            arrays['centroids'] = self.centroids
+        for field, array in arrays.items():
+            temporary_file = os.path.join(path, field + '.partial.npy')
+            np.save(temporary_file, array)
+            os.replace(temporary_file, os.path.join(path, field + '.npy'))
+        header = {'format': INDEX_FORMAT,
+                  'version': INDEX_VERSION,
+                  'size': self.size,
+                  'n_lists': self.n_lists,
+                  'trained': self.trained,
+                  'videos': self.videos}
+        with open(os.path.join(path, 'header.json'), 'w') as header_file:
+            json.dump(header, header_file, indent=1)
+        return path
+
+
+def load_index(path, mmap=True):
+    """ Opens an index written by PoseIndex.save(). With mmap=True the arrays are
+        memory-mapped rather than read into memory; they are copied into memory
+        if more poses are added.
+    """
+    with open(os.path.join(path, 'header.json')) as header_file:
+        header = json.load(header_file)
+    if header.get('format') != INDEX_FORMAT:
+        raise ValueError(path + " is not a pose index")
+    if header['version'] > INDEX_VERSION:
+        raise ValueError("Pose index version " + str(header['version']) + " is newer than this code supports")
+    index = PoseIndex(header['n_lists'])
+    index.videos = header['videos']
+    index.size = header['size']
+    for field in INDEX_FIELDS:
+        index.__data__[field] = np.load(os.path.join(path, field + '.npy'), mmap_mode='r' if mmap else None)
+    if header['trained']:
+        index.centroids = np.load(os.path.join(path, 'centroids.npy'))
+    return index
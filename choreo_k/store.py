@@ -0,0 +1,164 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/07_store.ipynb.
+
+# %% auto 0
+__all__ = ['STORE_FORMAT', 'STORE_VERSION', 'STORE_FIELDS', 'StoredFigure', 'figure_confidences', 'save_poses', 'PoseStore',
+           'load_poses']
+
+# %% ../nbs/07_store.ipynb 3
+import json
+import os
+
+import numpy as np
+
+from choreo_k.modify import TOTAL_COORDS
+from choreo_k.matrixify import stack_poses
+
+
+STORE_FORMAT = 'choreo_k-poses'
+STORE_VERSION = 1
+STORE_FIELDS = ['keypoints', 'figure_counts', 'confidences', 'times', 'frame_ids']
+
+
+class StoredFigure:
+    """ Stand-in for an openpifpaf Annotation or MoveNet Detection when poses are
+        read back from a store: the (17, 3) keypoint data and the pose score
+    """
+    def __init__(self, data, score=np.nan):
+        self.data = data
+        self.score = score
+
+
+def figure_confidences(frame, figure_type='figures', max_figures=None):
+    """ The pose confidence score of each figure in a frame: MoveNet frames list
+        them as 'confidences', openpifpaf annotations have a .score
+    """
+    figures = frame.get(figure_type, [])[:max_figures]
+    confidences = list(frame.get('confidences', []))
+    for figure in figures[len(confidences):]:
+        score = getattr(figure, 'score', np.nan)
+        # Older openpifpaf versions have score() as a method
+        confidences.append(score() if callable(score) else score)
+    return [float(confidence) for confidence in confidences[:len(figures)]]
+
+
+def save_poses(pose_data, path, figure_type='figures', dtype=np.float32, chunk_size=10000):
+    """ Writes the figure_type figures of a pose series (e.g., from detect_video)
+        to a pose store folder at path (see the format above), chunk_size frames
+        at a time so that the whole keypoint array is never held in memory.
+        The keypoints and confidences are stored as dtype; float16 halves the
+        size again, but only resolves pixel coordinates to 1 pixel above 1024.
+    """
+    os.makedirs(path, exist_ok=True)
+    # A store is only complete once it has a header, so remove the old one before
+    # overwriting its arrays; an interrupted save then can't be mistaken for a store
+    if os.path.exists(os.path.join(path, 'header.json')):
+        os.remove(os.path.join(path, 'header.json'))
+
+    total_frames = len(pose_data)
+    figure_counts = np.array([len(frame.get(figure_type, [])) for frame in pose_data], dtype=np.int32)
+    max_figures = int(figure_counts.max(initial=0))
+
+    shapes = {'keypoints': [(total_frames, max_figures, TOTAL_COORDS, 3), dtype],
+              'figure_counts': [(total_frames,), np.int32],
+              'confidences': [(total_frames, max_figures), dtype],
+              'times': [(total_frames,), np.float64],
+              'frame_ids': [(total_frames,), np.int64]}
+    arrays = {field: np.lib.format.open_memmap(os.path.join(path, field + '.npy'), mode='w+', dtype=field_dtype, shape=shape)
+              for field, [shape, field_dtype] in shapes.items()}
+
+    arrays['figure_counts'][:] = figure_counts
+    arrays['times'][:] = [np.nan if frame.get('time') is None else frame['time'] for frame in pose_data]
+    arrays['frame_ids'][:] = [frame.get('frame_id', f) for f, frame in enumerate(pose_data)]
+    for start in range(0, total_frames, chunk_size):
+        chunk = pose_data[start:start+chunk_size]
+        arrays['keypoints'][start:start+len(chunk)] = stack_poses(chunk, figure_type, max_figures)
+        confidences = np.full((len(chunk), max_figures), np.nan)
+        for f, frame in enumerate(chunk):
+            scores = figure_confidences(frame, figure_type, max_figures)
+            confidences[f, :len(scores)] = scores
+        arrays['confidences'][start:start+len(chunk)] = confidences
+    for array in arrays.values():
+        array.flush()
+
+    # The image size is the same for every frame of a video
+    sized_frame = next((frame for frame in pose_data if 'image_height' in frame), {})
+    header = {'format': STORE_FORMAT,
+              'version': STORE_VERSION,
+              'figure_type': figure_type,
+              'total_frames': total_frames,
+              'max_figures': max_figures,
+              'y_first': bool(next((frame['y_first'] for frame in pose_data if 'y_first' in frame), False)),
+              'image_height': None if 'image_height' not in sized_frame else int(sized_frame['image_height']),
+              'image_width': None if 'image_width' not in sized_frame else int(sized_frame['image_width']),
+              'fields': {field: {'shape': list(shape), 'dtype': np.dtype(field_dtype).str} for field, [shape, field_dtype] in shapes.items()}}
+    temporary_file = os.path.join(path, 'header.partial.json')
+    with open(temporary_file, 'w') as header_file:
+        json.dump(header, header_file, indent=1)
+    os.replace(temporary_file, os.path.join(path, 'header.json'))
+
+    return path
+
+
+class PoseStore:
+    """ A pose store folder (see save_poses()), opened for reading. Its fields
+        (keypoints, figure_counts, confidences, times, frame_ids) are memory-mapped
+        arrays, so slicing them only reads the requested frames from disk.
+    """
+
+    def __init__(self, path, mmap=True):
+        with open(os.path.join(path, 'header.json')) as header_file:
+            self.header = json.load(header_file)
+        if self.header.get('format') != STORE_FORMAT:
+            raise ValueError(path + " is not a pose store")
+        if self.header['version'] > STORE_VERSION:
+            raise ValueError("Pose store version " + str(self.header['version']) + " is newer than this code supports")
+        self.path = path
+        for field in STORE_FIELDS:
+            setattr(self, field, np.load(os.path.join(path, field + '.npy'), mmap_mode='r' if mmap else None))
+        self.figure_type = self.header['figure_type']
+        self.y_first = self.header['y_first']
+
+    def __len__(self):
+        return self.header['total_frames']
+
+    def frame_range(self, start_seconds=0.0, end_seconds=None):
+        """ [start, stop) frame indices of the frames within a time range """
+        start = int(np.searchsorted(self.times, start_seconds, side='left'))
+        stop = len(self) if end_seconds is None else int(np.searchsorted(self.times, end_seconds, side='right'))
+        return [start, stop]
+
+    def time_range(self, start_seconds=0.0, end_seconds=None):
+        """ The keypoints of the frames within a time range, as a memory-mapped
+            (frames, max_figures, 17, 3) view, plus their times
+        """
+        start, stop = self.frame_range(start_seconds, end_seconds)
+        return [self.keypoints[start:stop], self.times[start:stop]]
+
+    def to_pose_data(self, start=0, stop=None):
+        """ Rebuild frames [start, stop) as the usual list of frame dictionaries,
+            with StoredFigure objects as their figures, for the analysis functions
+            that expect them
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        # Copies, since the analysis functions modify the figures' data in place
+        keypoints = np.array(self.keypoints[start:stop])
+        confidences = np.array(self.confidences[start:stop])
+        pose_data = []
+        for f in range(stop - start):
+            figures = []
+            for p in range(self.figure_counts[start+f]):
+                data = keypoints[f, p]
+                figures.append(StoredFigure(np.zeros((0, 3)) if np.isnan(data).all() else data, float(confidences[f, p])))
+            frame = {'frame_id': int(self.frame_ids[start+f]), 'time': float(self.times[start+f]), self.figure_type: figures,
+                     'confidences': confidences[f, :len(figures)].tolist(), 'y_first': self.y_first}
+            if self.header['image_height'] is not None:
+                frame['image_height'] = self.header['image_height']
+                frame['image_width'] = self.header['image_width']
+            pose_data.append(frame)
+        return pose_data
+
+
+def load_poses(path, start_seconds=0.0, end_seconds=None):
+    """ Read (a time range of) a pose store back into a list of frame dictionaries """
+    store = PoseStore(path)
+    return store.to_pose_data(*store.frame_range(start_seconds, end_seconds))
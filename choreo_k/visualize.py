@@ -1,8 +1,10 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/03_visualize.ipynb.
 
 # %% auto 0
-__all__ = ['GC_INTERVAL', 'MIN_MOVE', 'MAX_MOVE', 'plot_poses', 'plot_delaunay', 'fig2img', 'excerpt_pose', 'overlay_poses',
-           'overlay_video', 'draw_figure', 'viz_dist_matrices']
+__all__ = ['GC_INTERVAL', 'SKELETON_LINKS', 'MAX_FRAMES_TO_GRAB', 'MIN_MOVE', 'MAX_MOVE', 'plot_poses', 'plot_delaunay',
+           'fig2img', 'excerpt_pose', 'pose_bbox', 'contact_sheet', 'excerpt_poses', 'overlay_poses', 'get_video_stats',
+           'read_video_frames', 'draw_poses', 'write_overlay_video', 'overlay_video', 'draw_figure',
+           'viz_dist_matrices']
 
 # %% ../nbs/03_visualize.ipynb 3
 import openpifpaf
@@ -12,11 +14,15 @@ from PIL import Image
 import matplotlib.pyplot as plt
 import cv2
 import os
+import gc
 #from IPython.display import display
 #from skbio.stats.distance import mantel
 from scipy.spatial import Delaunay
 from scipy.spatial.distance import squareform
 
+from choreo_k.paint import paint_poses, canvas_array, ParallelRenderer
+from choreo_k.progress import logger
+
 #from choreo_k.modify import zeroify_detections, flip_detections, shift_figure
 # Distance matrix-based comparison tests
 #from choreo_k.matrixify import get_pose_matrix
@@ -98,27 +104,20 @@ def plot_delaunay(figure, image=None, show=True, show_axis=True):
     return plt.gcf()
 
 
-# From http://www.icare.univ-lille1.fr/tutorials/convert_a_matplotlib_figure
 def fig2img(fig2, w=8, h=8, dpi=72):
+    """ Renders a matplotlib figure as a PIL RGBA image that shares the memory of
+        the figure's Agg canvas buffer (see canvas_array()), rather than copying it
+    """
 
     fig2.dpi=dpi
     fig2.set_size_inches(w, h)
     fig2.tight_layout()
     fig2.gca().set_anchor('NE')
 
-    fig2.canvas.draw()
-
-    # Get the RGBA buffer from the figure
-    w,h = fig2.canvas.get_width_height()
-    buf = np.frombuffer(fig2.canvas.tostring_argb(), dtype=np.uint8)
-    buf.shape = (w,h,4)
+    buf = canvas_array(fig2, alpha=True)
 
-    # canvas.tostring_argb give pixmap in ARGB mode. Roll the ALPHA channel to have it in RGBA mode
-    buf = np.roll(buf, 3, axis=2)
-
-    # put the figure pixmap into a numpy array
-    w, h, d = buf.shape
-    im = Image.frombytes("RGBA", (w,h), buf)
+    # buf has shape (height, width, 4), while PIL sizes are (width, height)
+    im = Image.frombuffer("RGBA", (buf.shape[1], buf.shape[0]), buf, "raw", "RGBA", 0, 1)
     return im
 
 
@@ -149,7 +148,7 @@ def excerpt_pose(video_file, frame_poses, figure_index=0, show=False, plot_type=
   frameno = int(round(timecode * video_framerate))
       
   if frameno > total_frames:
-    print(frameno,"IS GREATER THAN TOTAL FRAMES IN VIDEO:",total_frames)
+    logger.warning("Frame %d is greater than the total frames in the video: %d", frameno, total_frames)
     return None
 
   cap.set(cv2.CAP_PROP_POS_FRAMES, frameno)
@@ -168,6 +167,93 @@ def excerpt_pose(video_file, frame_poses, figure_index=0, show=False, plot_type=
   return fig
 
 
+def pose_bbox(coords_and_confidence, margin=.2, width=None, height=None, y_first=False):
+    """ [xmin, ymin, xmax, ymax] around a figure's visible keypoints, grown by the
+        same margin as get_bbox(), and widened to at least width x height if given
+    """
+    xy = coords_and_confidence[:,[1,0]] if y_first else coords_and_confidence[:,:2]
+    xy = xy[(coords_and_confidence[:,2] > 0) & np.isfinite(xy).all(axis=1)]
+    if len(xy) == 0:
+        return None
+    (xmin, ymin), (xmax, ymax) = xy.min(axis=0), xy.max(axis=0)
+    marg = int(round(np.sqrt((xmax - xmin) * (ymax - ymin) * (1 + margin)) * margin))
+    xmin, ymin, xmax, ymax = xmin - marg, ymin - marg, xmax + marg, ymax + marg
+    if width is not None and height is not None:
+        dx = max((width - (xmax - xmin)) / 2, 0)
+        dy = max((height - (ymax - ymin)) / 2, 0)
+        xmin, ymin, xmax, ymax = xmin - dx, ymin - dy, xmax + dx, ymax + dy
+    return [int(np.floor(xmin)), int(np.floor(ymin)), int(np.ceil(xmax)), int(np.ceil(ymax))]
+
+
+def contact_sheet(images, columns=8, cell_width=160, cell_height=240, background=(255, 255, 255)):
+    """ Tiles images (e.g., from excerpt_poses()) into a grid, each one scaled to
+        fit a cell_width x cell_height cell; None entries leave their cell blank
+    """
+    rows = max(1, int(np.ceil(len(images) / columns)))
+    sheet = np.empty((rows * cell_height, columns * cell_width, 3), dtype=np.uint8)
+    sheet[:] = background
+    for i, image in enumerate(images):
+        if image is None or image.size == 0:
+            continue
+        scale = min(cell_width / image.shape[1], cell_height / image.shape[0])
+        w, h = max(1, int(image.shape[1] * scale)), max(1, int(image.shape[0] * scale))
+        resized = cv2.resize(image, (w, h), interpolation=cv2.INTER_AREA)
+        y = (i // columns) * cell_height + (cell_height - h) // 2
+        x = (i % columns) * cell_width + (cell_width - w) // 2
+        sheet[y:y+h, x:x+w] = resized
+    return sheet
+
+
+def excerpt_poses(video_file, pose_series, descriptors, source_figure='figures', margin=.2, width=None, height=None, draw=True, sheet=False, columns=8, cell_width=160, cell_height=240):
+    """ Batch version of excerpt_pose(): for each [frame index, figure index]
+        descriptor (as returned by get_feature_vectors()), crops the figure out of
+        its video frame and (if draw) paints its pose on the crop. The needed
+        frames are sorted and decoded once each, in order, from a single capture,
+        however many figures are taken from each one.
+        Returns a list of RGB image arrays in the order of the descriptors (None
+        for figures that are missing or outside the video), or, if sheet=True, a
+        single contact sheet image of all of them (see contact_sheet()).
+    """
+    cap = cv2.VideoCapture(video_file)
+    video_framerate = cap.get(cv2.CAP_PROP_FPS)
+
+    # Group the descriptors by the video frame they come from
+    frame_figures = {}
+    for d, [frame_index, figure_index] in enumerate(descriptors):
+        frameno = int(round(pose_series[frame_index]['time'] * video_framerate))
+        frame_figures.setdefault(frameno, []).append([d, frame_index, figure_index])
+
+    excerpts = [None] * len(descriptors)
+    for frameno, im in read_video_frames(cap, sorted(frame_figures.keys())):
+        if im is None:
+            logger.warning("Could not read frame %d of %s", frameno, video_file)
+            continue
+        image_height, image_width, _ = im.shape
+        for d, frame_index, figure_index in frame_figures[frameno]:
+            frame_poses = pose_series[frame_index]
+            figures = frame_poses.get(source_figure, [])
+            if figure_index >= len(figures) or figures[figure_index].data.shape[0] == 0:
+                continue
+            y_first = frame_poses.get('y_first', False)
+            bbox = pose_bbox(figures[figure_index].data, margin, width, height, y_first)
+            if bbox is None:
+                continue
+            xmin, ymin = max(bbox[0], 0), max(bbox[1], 0)
+            xmax, ymax = min(bbox[2], image_width), min(bbox[3], image_height)
+            if xmax <= xmin or ymax <= ymin:
+                continue
+            excerpt = im[ymin:ymax, xmin:xmax].copy()
+            if draw:
+                paint_poses(excerpt, [figures[figure_index]], y_first=y_first, offset=(xmin, ymin), line_width=2, marker_radius=3, bgr=True)
+            excerpts[d] = cv2.cvtColor(excerpt, cv2.COLOR_BGR2RGB)
+
+    cap.release()
+
+    if sheet:
+        return contact_sheet(excerpts, columns, cell_width, cell_height)
+    return excerpts
+
+
 # Overlay all detected poses in a single frame on the full image
 # (For multi-dancer videos)
 def overlay_poses(pil_image, figures_frame, show=False, plot_type='pose', source_figure='figures', show_axis=False, savepath=""):
@@ -182,6 +268,95 @@ def overlay_poses(pil_image, figures_frame, show=False, plot_type='pose', source
 
 GC_INTERVAL = 1000
 
+# Keypoint connections of the COCO 17-keypoint skeleton (used by both detectors)
+SKELETON_LINKS = [[0, 1], [0, 2], [1, 2], [1, 3], [2, 4], [3, 5], [4, 6], [5, 6],
+                  [5, 7], [6, 8], [7, 9], [8, 10], [5, 11], [6, 12], [11, 12],
+                  [11, 13], [12, 14], [13, 15], [14, 16]]
+
+# Decoding up to this many unneeded frames is usually cheaper than a seek
+MAX_FRAMES_TO_GRAB = 50
+
+def get_video_stats(video_file):
+    """ Returns [frames per second, total frames] of a video file """
+    cap = cv2.VideoCapture(video_file)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return [fps, total_frames]
+
+
+def read_video_frames(cap, frame_numbers):
+    """ Yields [frame number, image] for each of the (ascending) frame numbers,
+        decoding the video sequentially and skipping unneeded frames with grab()
+        rather than seeking to every frame. Seeks only for big jumps (or
+        backwards). image is None if the frame could not be read.
+    """
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    for frameno in frame_numbers:
+        if frameno < position or frameno - position > MAX_FRAMES_TO_GRAB:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frameno)
+            position = frameno
+        while position < frameno:
+            cap.grab()
+            position += 1
+        ret_val, im = cap.read()
+        position += 1
+        yield [frameno, im if ret_val else None]
+
+
+def draw_poses(image, figures, thickness=3, radius=4, threshold=0.0, y_first=False):
+    """ Draws pose skeletons directly onto a (BGR) video frame array (in place,
+        and returns it), without going through a matplotlib canvas, with one
+        color per figure. Keypoints with confidence <= threshold are left out.
+        See choreo_k.paint.paint_poses() for more options.
+    """
+    return paint_poses(image, figures, y_first=y_first, keypoint_threshold=threshold, line_width=thickness,
+                       marker_radius=radius, color_by_figure=True, bgr=True)
+
+
+def write_overlay_video(video_file, pose_data, output_file, source_figure='figures', start_frame=0, fps=None, codec='mp4v', threshold=0.0, workers=0):
+    """ Renders the poses in pose_data onto the frames of the video they were
+        detected in and writes the result straight to output_file as an encoded
+        video, in one sequential pass with no temporary images. By default the
+        output framerate is the video's, divided by the typical spacing of the
+        pose frames (e.g., if they were detected with seconds_to_skip).
+        Set workers to draw the frames in that many processes (None for one per
+        CPU core); they are still written in order. Since every frame has to be
+        copied to a worker, this only pays off with several cores to spare.
+        Returns the number of frames written.
+    """
+    cap = cv2.VideoCapture(video_file)
+
+    video_framerate = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    pose_frames = pose_data[start_frame:len(pose_data)]
+    frame_numbers = [int(round(figures_frame['time'] * video_framerate)) for figures_frame in pose_frames]
+    if fps is None:
+        fps = video_framerate / max(np.median(np.diff(frame_numbers)), 1) if len(frame_numbers) > 1 else video_framerate
+
+    writer = cv2.VideoWriter(output_file, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+    if not writer.isOpened():
+        cap.release()
+        raise ValueError("Could not open " + output_file + " for writing with codec " + codec)
+
+    y_first = len(pose_frames) > 0 and pose_frames[0].get('y_first', False)
+    renderer = ParallelRenderer(lambda frameno, frame: writer.write(frame), workers=workers, y_first=y_first, keypoint_threshold=threshold,
+                                line_width=3, marker_radius=4, color_by_figure=True, bgr=True)
+    with renderer:
+        for figures_frame, [frameno, im] in zip(pose_frames, read_video_frames(cap, frame_numbers)):
+            if im is None:
+                logger.warning("Could not read frame %d of %s", frameno, video_file)
+                break
+            renderer.submit(frameno, im, figures_frame[source_figure])
+
+    writer.release()
+    cap.release()
+
+    return renderer.frames_written
+
+
 def overlay_video(video_file, pose_data, plot_type='pose', source_figure='figures', show_axis=False, savedir="", start_frame=0):
     """ Set savedir to a folder where a whole bunch of images from the video, with
         pose overlays drawn on them, will be stored. These can be turned into
@@ -189,23 +364,25 @@ def overlay_video(video_file, pose_data, plot_type='pose', source_figure='figure
         !ffmpeg -y -framerate $FPS -pattern_type glob -i 'savedir/*.png' -strict '-2' -c:v libx264 -vf "fps=$FPS" -pix_fmt yuv420p poses_video.mp4
         Note that both occurrences of $FPS should be replaced with the framerate of
         the video, which can be obtained from get_video_stats(video_filename)
+        This draws each frame with matplotlib; write_overlay_video() is much faster
+        and writes the video directly.
     """
     cap = cv2.VideoCapture(video_file)
 
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     video_framerate = cap.get(cv2.CAP_PROP_FPS)
 
-    for figures_frame in pose_data[start_frame:len(pose_data)]:
+    pose_frames = pose_data[start_frame:len(pose_data)]
+    frame_numbers = [int(round(figures_frame['time'] * video_framerate)) for figures_frame in pose_frames]
 
-        timecode = figures_frame['time']
-        frameno = int(round(timecode * video_framerate))
+    for figures_frame, [frameno, im] in zip(pose_frames, read_video_frames(cap, frame_numbers)):
 
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frameno)
-        ret_val, im = cap.read()
+        if im is None:
+            break
 
         # Image doesn't necessarily come in as RGB(A)!
         rgbim = cv2.cvtColor(im, cv2.COLOR_BGR2RGBA)
-        pil_image = PIL.Image.fromarray(rgbim)
+        pil_image = Image.fromarray(rgbim)
 
         savepath = os.path.join(savedir, 'image' + str(frameno+1).zfill(5) + '.png')
 
@@ -222,14 +399,14 @@ def overlay_video(video_file, pose_data, plot_type='pose', source_figure='figure
     
         del fig
 
+    cap.release()
+
 MIN_MOVE = 200
 MAX_MOVE = 1200
 
 def draw_figure(point_weights=None, show=True):
     """ Scale keypoint radii by how much they moved in a video """
-    links = [[0, 1], [0, 2], [1, 2], [1, 3], [2, 4], [3, 5], [4, 6], [5, 6],
-           [5, 7], [6, 8], [7, 9], [8, 10], [5, 11], [6, 12], [11, 12],
-           [11, 13], [12, 14], [13, 15], [14, 16]]
+    links = SKELETON_LINKS
     coords = [[160, 510],
             [175, 525],
             [145, 525],
@@ -304,4 +481,3 @@ def viz_dist_matrices(p1, p2, figure_type='flipped_figures'):
     plt.figure()
     plt.xticks(np.arange(17))
     plt.bar(range(17), movers)
-    print(movers.shape)